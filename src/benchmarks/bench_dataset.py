@@ -0,0 +1,68 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "crawlers"))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "excel_processor"))
+
+from bench_table_write import TEMPLATE
+from fixtures import make_offer_page
+from page_parser import PageParser
+from product_table import StreamingProductTable
+import variant_dataset
+from variant_dataset import VariantDataset, VariantDatasetWriter
+
+N_ROWS = 100_000
+SKUS_PER_OFFER = 20
+
+def reparse(pages: list, output: str):
+    """ Without a dataset: every page is parsed again to export the workbook. """
+    parser = PageParser(fetch_description=False, compact=True)
+    table = StreamingProductTable(TEMPLATE)
+    for page in pages:
+        table.append_rows(parser.parse(page))
+    table.save(output)
+    table.close()
+
+def from_dataset(path: str, output: str):
+    table = StreamingProductTable(TEMPLATE)
+    table.append_dataset(path)
+    table.save(output)
+    table.close()
+
+if __name__ == "__main__":
+    # Typical pages: the product data plus ~1 MB of markup, as served by 1688
+    pages = [make_offer_page(SKUS_PER_OFFER)] * (N_ROWS // SKUS_PER_OFFER)
+    parser = PageParser(fetch_description=False, compact=True)
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()) as log:
+        output = os.path.join(tmp, "out.xlsx")
+        timings = {}
+        # Without pyarrow, only the JSON lines fallback can be measured
+        extensions = (".arrow", ".parquet", ".jsonl") if variant_dataset._pyarrow() is not None else (".jsonl",)
+        for extension in extensions:
+            path = os.path.join(tmp, "variants" + extension)
+            started = time.perf_counter()
+            with VariantDatasetWriter(path) as dataset:
+                for offer_id, page in enumerate(pages):
+                    dataset.write(str(offer_id), parser.parse(page))
+            timings[f"parse + save dataset ({dataset.format})"] = time.perf_counter() - started
+            started = time.perf_counter()
+            with VariantDataset(path) as source:
+                for _ in source.iter_rows():
+                    pass
+            timings[f"read rows from dataset ({dataset.format})"] = time.perf_counter() - started
+            started = time.perf_counter()
+            from_dataset(path, output)
+            timings[f"workbook from dataset ({dataset.format})"] = time.perf_counter() - started
+            timings[f"dataset size ({dataset.format}), MB"] = os.path.getsize(path) / 2**20
+        started = time.perf_counter()
+        reparse(pages, output)
+        timings["workbook from pages"] = time.perf_counter() - started
+    print(log.getvalue(), end="")
+    print(f"{'step, ' + str(N_ROWS) + ' rows':<44}{'seconds':>10}")
+    for name, value in timings.items():
+        print(f"{name:<44}{value:>10.2f}")
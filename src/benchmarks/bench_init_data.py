@@ -0,0 +1,43 @@
+import contextlib
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "crawlers"))
+
+from bs4 import BeautifulSoup
+from fixtures import load_recorded_pages, make_offer_page
+from page_parser import PageParser
+
+def measure(func, page, repeat: int = 5):
+    """ Return the best wall time and the peak traced memory of `func(page)`. """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(page)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    func(page)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+if __name__ == "__main__":
+    parser = PageParser()
+    soup_path = lambda page: parser._extract_init_data_from_soup(BeautifulSoup(page, "lxml"))
+    pages = {
+        "recorded (no __INIT_DATA)": load_recorded_pages()[0],
+        "typical, 1 MB": make_offer_page(20, 1_000_000),
+        "large, 5 MB": make_offer_page(200, 5_000_000),
+    }
+    print(f"{'page':<28}{'soup ms':>10}{'fast ms':>10}{'soup MB':>10}{'fast MB':>10}")
+    with contextlib.redirect_stdout(io.StringIO()) as quiet:
+        results = []
+        for name, page in pages.items():
+            soup_time, soup_peak = measure(soup_path, page)
+            fast_time, fast_peak = measure(parser._extract_init_data, page)
+            results.append((name, soup_time, fast_time, soup_peak, fast_peak))
+    for name, soup_time, fast_time, soup_peak, fast_peak in results:
+        print(f"{name:<28}{soup_time * 1000:>10.1f}{fast_time * 1000:>10.1f}{soup_peak / 2**20:>10.1f}{fast_peak / 2**20:>10.1f}")
@@ -0,0 +1,45 @@
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "crawlers"))
+
+from fixtures import make_offer_page
+from metrics import metrics
+from page_parser import PageParser
+
+N_PAGES = 2000
+ROUNDS = 5
+
+def parse_seconds(parser: PageParser, pages: list) -> dict:
+    """ Best wall time to parse `pages` with metrics off and on, alternating to even out noise. """
+    best = {False: float("inf"), True: float("inf")}
+    for _ in range(ROUNDS):
+        for enabled in best:
+            metrics.enabled = enabled
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                for page in pages:
+                    parser.parse(page)
+            best[enabled] = min(best[enabled], time.perf_counter() - started)
+    metrics.enabled = False
+    return best
+
+if __name__ == "__main__":
+    # Parsing is the hottest instrumented path: compare it with metrics off and on
+    page = make_offer_page(20, padding_bytes=0)
+    pages = [page] * N_PAGES
+    parser = PageParser(fetch_description=False, compact=True)
+    print(f"{'metrics':<10}{'ms / page':>12}")
+    results = parse_seconds(parser, pages)
+    for enabled, seconds in results.items():
+        print(f"{'on' if enabled else 'off':<10}{seconds / N_PAGES * 1000:>12.4f}")
+
+    started = time.perf_counter()
+    for _ in range(1_000_000):
+        with metrics.timer("noop"):
+            pass
+    print(f"disabled timer: {(time.perf_counter() - started) * 1000:.0f} ns per use")
+    print(f"overhead when enabled: {results[True] / results[False] - 1:+.1%}")
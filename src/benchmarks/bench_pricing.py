@@ -0,0 +1,49 @@
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "excel_processor"))
+
+import pricing
+from pricing import CountryPricing, PricingEngine, SOURCE_PRICE_KEY
+
+N_SKUS = 100_000
+RATES = {"base": "USD", "rates": {"CNY": 7.12}}
+COUNTRIES = [
+    CountryPricing("Colombia", [(0, 1.0), (10, 0.6), (50, 0.4)], fee_rate=0.13, fixed_fee=1.0),
+    CountryPricing("Brazil", [(0, 1.0), (10, 0.6), (50, 0.4)], fee_rate=0.16, fixed_fee=1.2),
+    CountryPricing("Chile", [(0, 0.8)], fee_rate=0.14),
+    CountryPricing("Mexico", [(0, 0.8)], fee_rate=0.15),
+    CountryPricing("Mexico Fulfillment", [(0, 0.8)], fee_rate=0.15, fixed_fee=2.5),
+]
+
+def per_row(costs: list) -> dict:
+    """ The naive way: evaluate every country's rules SKU by SKU. """
+    prices = {f"({c.country}) Price in US$": [] for c in COUNTRIES}
+    for cost in costs:
+        usd = cost / RATES["rates"]["CNY"]
+        for c in COUNTRIES:
+            markup = [m for minimum, m in c.markup_tiers if usd >= minimum][-1]
+            prices[f"({c.country}) Price in US$"].append(round((usd * (1 + markup) + c.fixed_fee) / (1 - c.fee_rate), 2))
+    return prices
+
+def best_of(func, *args, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+if __name__ == "__main__":
+    random.seed(0)
+    costs = [round(random.uniform(1, 800), 2) for _ in range(N_SKUS)]
+    engine = PricingEngine(RATES, COUNTRIES)
+    print(f"{'method':<24}{'seconds / 100k SKUs':>22}")
+    print(f"{'per row':<24}{best_of(per_row, costs):>22.3f}")
+    print(f"{'engine (numpy)' if pricing.numpy is not None else 'engine (pure Python)':<24}{best_of(engine.price_costs, costs):>22.3f}")
+    if pricing.numpy is not None:
+        numpy, pricing.numpy = pricing.numpy, None
+        print(f"{'engine (pure Python)':<24}{best_of(engine.price_costs, costs):>22.3f}")
+        pricing.numpy = numpy
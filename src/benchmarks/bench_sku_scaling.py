@@ -0,0 +1,28 @@
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "crawlers"))
+
+from fixtures import make_offer_page
+from page_parser import PageParser
+
+def best_of(func, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+if __name__ == "__main__":
+    # Parse time should grow linearly with the SKU count: the per-SKU cost must stay flat
+    parser = PageParser()
+    print(f"{'SKUs':>6}{'parse ms':>12}{'us / SKU':>12}")
+    for n_skus in (50, 100, 250, 500, 1000):
+        page = make_offer_page(n_skus, padding_bytes=0)
+        with contextlib.redirect_stdout(io.StringIO()):
+            elapsed = best_of(lambda: parser.parse(page))
+        print(f"{n_skus:>6}{elapsed * 1000:>12.2f}{elapsed / n_skus * 1e6:>12.1f}")
@@ -0,0 +1,73 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import openpyxl
+from openpyxl.workbook.defined_name import DefinedName
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from test_split import split_excel_skip_hidden
+
+N_SHEETS = 50
+N_HIDDEN = 5
+
+def make_workbook(path: str, n_sheets: int = N_SHEETS, n_rows: int = 100, n_cols: int = 12):
+    """ Build a synthetic category template: many sheets sharing strings and styles, a few hidden. """
+    workbook = openpyxl.Workbook()
+    workbook.remove(workbook.active)
+    for i in range(n_sheets):
+        sheet = workbook.create_sheet(f"Category {i}")
+        sheet.append([f"Column {c}" for c in range(n_cols)])
+        for r in range(n_rows):
+            sheet.append([f"Value {(r * c) % 97}" if c % 2 else r * c + 0.5 for c in range(n_cols)])
+        if i >= n_sheets - N_HIDDEN:
+            sheet.sheet_state = "hidden"
+        sheet.defined_names["Header"] = DefinedName("Header", attr_text=f"'Category {i}'!$A$1:$L$1")
+    workbook.save(path)
+
+def split_by_reloading(file_path: str, output_dir: str):
+    """ The previous implementation: reload the whole workbook for every visible sheet. """
+    source_workbook = openpyxl.load_workbook(file_path)
+    visible = [name for name in source_workbook.sheetnames if source_workbook[name].sheet_state == "visible"]
+    source_workbook.close()
+    for sheet_to_keep in visible:
+        wb_copy = openpyxl.load_workbook(file_path)
+        for sheet_name in list(wb_copy.sheetnames):
+            if sheet_name != sheet_to_keep:
+                wb_copy.remove(wb_copy[sheet_name])
+        wb_copy.save(os.path.join(output_dir, f"{sheet_to_keep}.xlsx"))
+        wb_copy.close()
+
+def check_outputs(output_dir: str):
+    """ Every visible sheet must come out alone, with its values, and openable by openpyxl. """
+    outputs = sorted(os.listdir(output_dir))
+    assert len(outputs) == N_SHEETS - N_HIDDEN, outputs
+    for name in (outputs[0], outputs[-1]):
+        workbook = openpyxl.load_workbook(os.path.join(output_dir, name))
+        assert workbook.sheetnames == [name[:-len(".xlsx")]], workbook.sheetnames
+        sheet = workbook.active
+        assert sheet["A1"].value == "Column 0" and sheet.max_row == 101
+        assert "Header" in sheet.defined_names
+
+def timed(func, *args) -> float:
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        func(*args)
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "template.xlsx")
+        make_workbook(source)
+        print(f"{N_SHEETS}-sheet workbook ({N_HIDDEN} hidden), {os.path.getsize(source) / 2**20:.1f} MB")
+        results = {}
+        for name, func in (("reload per sheet", split_by_reloading), ("zip parts", split_excel_skip_hidden)):
+            output_dir = os.path.join(tmp, name.replace(" ", "_"))
+            os.mkdir(output_dir)
+            results[name] = timed(func, source, output_dir)
+            check_outputs(output_dir)
+            print(f"{name:<20}{results[name]:>8.2f} s")
+        print(f"speedup: {results['reload per sheet'] / results['zip parts']:.0f}x")
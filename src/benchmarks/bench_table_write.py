@@ -0,0 +1,65 @@
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "excel_processor"))
+
+from product_table import ProductTable, StreamingProductTable
+
+TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "Costumes.xlsx")
+
+def make_variant(i: int) -> dict:
+    return {
+        "Title": f"Halloween costume cosplay set {i // 10}", "SKU": f"SKU-{i}", "Color": f"Color {i % 10}",
+        "Photos": ", ".join(f"https://cbu01.alicdn.com/img/ibank/O1CN01{j:06d}.jpg" for j in range(8)),
+        "Universal product code": "6901234567890", "Stock": 100 + i, "(Colombia) Price in US$": 12.5,
+        "(Colombia) Listing type": "Classic", "Description": "<p>Product description</p>" * 20,
+        "Warranty type": "No warranty", "Brand": "ACME", "Gender": "Gender neutral", "Composition": "100% polyester",
+        "Package gross weight": 250, "Package weight unit": "g", "Package length": 30, "Package width": 20,
+        "Package height": 5, "Package length, width and height unit": "cm",
+    }
+
+# A small pool of prebuilt rows, so the timings measure the writers and not the fixtures
+VARIANTS = [make_variant(i) for i in range(100)]
+
+def write_cells(n_rows: int, output: str):
+    table = ProductTable(TEMPLATE)
+    for i in range(n_rows):
+        row = table.acquire_new_row()
+        for name, value in VARIANTS[i % len(VARIANTS)].items():
+            table.write_cell(row, name, value)
+    table.save(output)
+
+def append_rows(n_rows: int, output: str):
+    table = ProductTable(TEMPLATE)
+    table.append_rows(VARIANTS[i % len(VARIANTS)] for i in range(n_rows))
+    table.save(output)
+
+def write_streaming(n_rows: int, output: str):
+    table = StreamingProductTable(TEMPLATE)
+    table.append_rows(VARIANTS[i % len(VARIANTS)] for i in range(n_rows))
+    table.save(output)
+    table.close()
+
+def run(writer, n_rows: int, output: str) -> tuple:
+    start = time.perf_counter()
+    writer(n_rows, output)
+    elapsed = time.perf_counter() - start
+    # Memory is traced in a separate run, tracemalloc distorts the timings
+    tracemalloc.start()
+    writer(n_rows, output)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+if __name__ == "__main__":
+    writers = {"write_cell": write_cells, "append_rows": append_rows, "streaming": write_streaming}
+    print(f"{'writer':<12}{'rows':>8}{'seconds':>10}{'rows/s':>10}{'peak MB':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, "out.xlsx")
+        for n_rows in (1_000, 10_000):
+            for name, writer in writers.items():
+                elapsed, peak = run(writer, n_rows, output)
+                print(f"{name:<12}{n_rows:>8}{elapsed:>10.2f}{n_rows / elapsed:>10.0f}{peak / 2**20:>10.1f}")
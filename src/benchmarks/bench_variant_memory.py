@@ -0,0 +1,36 @@
+import contextlib
+import io
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "crawlers"))
+
+from fixtures import make_offer_page
+from page_parser import PageParser
+
+N_VARIANTS = 10_000
+SKUS_PER_PAGE = 50
+
+def held_bytes(parser: PageParser, pages: list) -> int:
+    """ Memory still allocated by the parsed variants of `pages` once parsing is over. """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    with contextlib.redirect_stdout(io.StringIO()):
+        parsed = [parser.parse(page) for page in pages]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert sum(len(variants) for variants in parsed) == N_VARIANTS
+    return after - before
+
+if __name__ == "__main__":
+    # Variants are held between parse and write: measure what 10k of them cost in memory
+    page = make_offer_page(SKUS_PER_PAGE, padding_bytes=0)
+    pages = [page] * (N_VARIANTS // SKUS_PER_PAGE)
+    print(f"{'representation':<16}{'MB / 10k variants':>20}")
+    results = {}
+    for name, compact in (("dicts", False), ("VariantBatch", True)):
+        parser = PageParser(fetch_description=False, compact=compact)
+        results[name] = held_bytes(parser, pages)
+        print(f"{name:<16}{results[name] / 2**20:>20.2f}")
+    print(f"reduction: {1 - results['VariantBatch'] / results['dicts']:.0%}")
@@ -0,0 +1,110 @@
+import contextlib
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CRAWLERS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "crawlers")
+RECORDED_PAGES = [
+    os.path.join(CRAWLERS_DIR, "debug_871505026881.html"),
+    os.path.join(CRAWLERS_DIR, "debug_885695622817.html"),
+]
+
+# SKU count and markup padding of the synthetic pages the benchmark suite runs on.
+PAGE_SIZES = {
+    "small": (3, 100_000),
+    "typical": (20, 1_000_000),
+    "1000-sku": (1000, 1_000_000),
+}
+
+def make_init_data(n_skus: int = 20) -> dict:
+    """ Build a synthetic `window.__INIT_DATA` object shaped like a 1688 industrial product page. """
+    skus = [
+        {"skuId": 5000000 + i, "name": f"Color {i}&gt;Size {i % 5}", "props": [{"name": "颜色", "value": f"颜色{i}"}]}
+        for i in range(n_skus)
+    ]
+    sku_map = [
+        {"skuId": 5000000 + i, "price": f"{10 + i % 50}.{i % 100:02d}", "canBookCount": str(100 + i)}
+        for i in range(n_skus)
+    ]
+    piece_weights = [
+        {"skuId": 5000000 + i, "weight": "250.0", "length": "30.0", "width": "20.0", "height": "5.0"}
+        for i in range(n_skus)
+    ]
+    modules = {
+        "title": {"componentType": "@ali/tdmod-od-pc-offer-title", "data": {"title": "Halloween costume cosplay set"}},
+        "pic": {"componentType": "@ali/tdmod-pc-od-main-pic", "data": {"mainImage": [
+            {"fullPathImageURI": f"https://cbu01.alicdn.com/img/ibank/O1CN01{i:06d}.jpg"} for i in range(8)
+        ]}},
+        "attr": {"componentType": "@ali/tdmod-od-pc-attribute-new", "data": [
+            {"name": "品牌", "value": "ACME"}, {"name": "成分及含量", "value": "100% polyester"},
+            {"name": "商品条形码", "value": "6901234567890"},
+        ]},
+        "cross": {"componentType": "@ali/tdmod-od-pc-offer-cross", "data": {"pieceWeightScale": {"pieceWeightScaleInfo": piece_weights}}},
+        "sku": {"componentType": "@ali/tdmod-gyp-pc-sku-selection", "data": {"modelSelectionInfo": {"data": skus}}},
+        "price": {"componentType": "@ali/tdmod-od-pc-offer-price", "data": {"finalPriceModel": {"tradeWithoutPromotion": {"skuMap": sku_map}}}},
+    }
+    # Real pages carry dozens of unrelated modules around the ones we read
+    for i in range(40):
+        modules[f"filler{i}"] = {"componentType": f"@ali/tdmod-filler-{i}", "data": {"items": list(range(50))}}
+    return {"data": modules, "globalData": {"tempModel": {"offerTitle": "Halloween costume cosplay set"}}}
+
+def make_offer_page(n_skus: int = 20, padding_bytes: int = 1_000_000) -> str:
+    """ Build a synthetic offer page: an `__INIT_DATA` script surrounded by `padding_bytes` of markup. """
+    filler = '<div class="od-pc-layout"><span class="text">商品详情 product detail</span></div>\n'
+    padding = filler * (padding_bytes // len(filler.encode("utf-8")) // 2)
+    return (
+        "<!DOCTYPE html><html><head><meta charset=\"utf-8\">"
+        "<script>window.__GLOBAL_CONFIG = {\"env\": \"prod\"};</script></head><body>"
+        + padding
+        + "<script>window.__INIT_DATA = " + json.dumps(make_init_data(n_skus), ensure_ascii=False) + ";</script>"
+        + padding
+        + "</body></html>"
+    )
+
+def load_recorded_pages() -> list:
+    pages = []
+    for path in RECORDED_PAGES:
+        with open(path, encoding="utf-8") as f:
+            pages.append(f.read())
+    return pages
+
+def make_sized_pages() -> dict:
+    """ One synthetic page per entry of `PAGE_SIZES`. """
+    return {name: make_offer_page(n_skus, padding_bytes) for name, (n_skus, padding_bytes) in PAGE_SIZES.items()}
+
+@contextlib.contextmanager
+def stub_server(pages: list):
+    """
+    Serve offer pages from a local HTTP server, so the crawler can be measured without network.
+
+    Any path ending in `/<offer ID>` returns one of `pages`, picked by the numeric offer ID.
+
+    Yields:
+        callable: Builds the URL of an offer ID on the stub, to replace `WebCrawler._build_url`.
+    """
+    bodies = [page.encode("utf-8") for page in pages]
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real site
+
+        def do_GET(self):
+            offer_id = self.path.rsplit("/", 1)[-1]
+            body = bodies[int(offer_id) % len(bodies)] if offer_id.isdigit() else b""
+            self.send_response(200 if body else 404)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield lambda offer_id: f"http://127.0.0.1:{server.server_port}/offer/{offer_id}"
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,274 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BENCH_DIR, "..")
+sys.path.insert(0, os.path.join(SRC_DIR, "crawlers"))
+sys.path.insert(0, os.path.join(SRC_DIR, "excel_processor"))
+sys.path.insert(0, SRC_DIR)
+
+from bench_table_write import TEMPLATE, VARIANTS
+from crawler_1688 import AsyncWebCrawler
+from fixtures import load_recorded_pages, make_sized_pages, stub_server
+from page_parser import PageParser
+from product_table import ProductTable, StreamingProductTable
+from rate_limiter import RateLimiter
+
+BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+# Quick runs use smaller workloads, so their results are only comparable with each other.
+QUICK_BASELINE = os.path.join(BENCH_DIR, "baseline.quick.json")
+
+# Direction of a metric: whether a larger value is an improvement or a regression.
+HIGHER = "higher"
+LOWER = "lower"
+
+def _record(results: dict, name: str, value: float, unit: str, better: str):
+    results[name] = {"value": round(value, 4), "unit": unit, "better": better}
+
+def _stub_crawler(build_url, max_per_host: int = 8) -> AsyncWebCrawler:
+    """ An `AsyncWebCrawler` sending its requests to the stub server, without pacing. """
+    crawler = AsyncWebCrawler(max_per_host=max_per_host, rate_limiter=RateLimiter())
+    crawler._build_url = build_url
+    return crawler
+
+def bench_fetch(results: dict, pages: dict, n_offers: int):
+    """ Pages and megabytes per second fetched by `AsyncWebCrawler.fetch_many` from the local stub. """
+    with stub_server([pages["typical"]]) as build_url:
+        crawler = _stub_crawler(build_url)
+
+        async def fetch_all() -> int:
+            received = 0
+            async for _, html in crawler.fetch_many(str(i) for i in range(n_offers)):
+                received += len(html.encode("utf-8"))
+            return received
+
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            received = asyncio.run(fetch_all())
+        elapsed = time.perf_counter() - started
+    _record(results, "fetch.pages_per_s", n_offers / elapsed, "pages/s", HIGHER)
+    _record(results, "fetch.mb_per_s", received / 2**20 / elapsed, "MB/s", HIGHER)
+
+def bench_parse(results: dict, pages: dict, repeat: int):
+    """ Median latency and peak traced memory of `PageParser.parse` per fixture page. """
+    parser = PageParser(fetch_description=False, compact=True)
+    # The recorded pages carry no __INIT_DATA: they measure the BeautifulSoup fallback
+    fixtures = dict(pages, recorded=load_recorded_pages()[0])
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name, page in fixtures.items():
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                parser.parse(page)
+                timings.append(time.perf_counter() - started)
+            # Memory is traced in a separate run, tracemalloc distorts the timings
+            tracemalloc.start()
+            parser.parse(page)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            _record(results, f"parse.{name}.ms", statistics.median(timings) * 1000, "ms", LOWER)
+            _record(results, f"parse.{name}.peak_mb", peak / 2**20, "MB", LOWER)
+
+def bench_write(results: dict, n_rows: int):
+    """ Rows per second appended and saved by both table writers, on the marketplace template. """
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, "out.xlsx")
+        for name, table_class in (("product_table", ProductTable), ("streaming", StreamingProductTable)):
+            started = time.perf_counter()
+            table = table_class(TEMPLATE)
+            table.append_rows(VARIANTS[i % len(VARIANTS)] for i in range(n_rows))
+            table.save(output)
+            elapsed = time.perf_counter() - started
+            if hasattr(table, "close"):
+                table.close()
+            _record(results, f"write.{name}.rows_per_s", n_rows / elapsed, "rows/s", HIGHER)
+
+def bench_end_to_end(results: dict, pages: dict, n_offers: int):
+    """ Variant rows per second through `run_pipeline`: fetch from the stub, parse, write. """
+    from pipeline import run_pipeline
+
+    with stub_server([pages["small"], pages["typical"]]) as build_url, tempfile.TemporaryDirectory() as tmp:
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            written = run_pipeline(
+                (str(i) for i in range(n_offers)), os.path.join(tmp, "out.xlsx"),
+                crawler=_stub_crawler(build_url), with_description=False
+            )
+        elapsed = time.perf_counter() - started
+    _record(results, "end_to_end.rows_per_s", written / elapsed, "rows/s", HIGHER)
+
+CLI = os.path.join(SRC_DIR, "ecommerce_crawler.py")
+
+# Import budget of each CLI command, in milliseconds on top of the bare interpreter's startup.
+# Unlike the baseline, which tracks this machine, budgets are absolute and always enforced.
+STARTUP_BUDGET_MS = {"help": 40, "split": 60, "parse": 100, "write": 60, "crawl": 500}
+
+# Dependencies a command may only import when it needs them: `crawl` is the only command
+# that fetches, parses through BeautifulSoup fallbacks and loads workbooks in openpyxl.
+HEAVY_MODULES = ("requests", "bs4", "lxml", "openpyxl")
+
+def _import_times(args: list, cwd: str) -> dict:
+    """ Cumulative import time of each top-level module imported by a Python run, in µs. """
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", *args], cwd=cwd, capture_output=True, text=True, check=True
+    ).stderr
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Names are indented by nesting level after one separating space
+        times[name[1:].rstrip()] = int(cumulative)
+    return times
+
+def bench_startup(results: dict, pages: dict, repeat: int):
+    """ Import time of each CLI command, from `python -X importtime`, and the heavy modules it loads.
+
+    Commands run on small fixture files, so that their real code paths are imported, not only
+    their `--help`. Modules the bare interpreter imports too (site, encodings) are not counted.
+    """
+    bare = {name for name in _import_times(["-c", "pass"], BENCH_DIR) if not name.startswith(" ")}
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, "page.html"), "w", encoding="utf-8") as f:
+            f.write(pages["typical"])
+        os.mkdir(os.path.join(tmp, "split"))
+        commands = {
+            "help": ["--help"],
+            "parse": ["parse", "page.html", "-o", "variants.jsonl"],
+            "write": ["write", "variants.jsonl", "out.xlsx", "--template", TEMPLATE],
+            "split": ["split", "out.xlsx", "split"],
+            "crawl": ["crawl", "--help"],
+        }
+        for command, args in commands.items():
+            totals = []
+            for _ in range(repeat):
+                times = _import_times([CLI, *args], tmp)
+                totals.append(sum(value for name, value in times.items() if not name.startswith(" ") and name not in bare))
+            heavy = {name.strip().split(".")[0] for name in times} & set(HEAVY_MODULES)
+            _record(results, f"startup.{command}.import_ms", statistics.median(totals) / 1000, "ms", LOWER)
+            _record(results, f"startup.{command}.heavy_modules", len(heavy), "modules", LOWER)
+
+def over_budget(results: dict) -> list:
+    """ The CLI commands importing more than their budget allows, see `STARTUP_BUDGET_MS`.
+
+    Returns:
+        list: Messages describing each violation.
+    """
+    violations = []
+    for command, budget in STARTUP_BUDGET_MS.items():
+        import_ms = results.get(f"startup.{command}.import_ms")
+        if import_ms is not None and import_ms["value"] > budget:
+            violations.append(f"'{command}' imports in {import_ms['value']:.0f} ms, over its {budget} ms budget")
+        heavy = results.get(f"startup.{command}.heavy_modules")
+        if heavy is not None and heavy["value"] and command != "crawl":
+            violations.append(f"'{command}' imports {heavy['value']:.0f} of {', '.join(HEAVY_MODULES)}")
+    return violations
+
+BENCHMARKS = ("fetch", "parse", "write", "end_to_end", "startup")
+
+def run(only=BENCHMARKS, quick: bool = False) -> dict:
+    """ Run the benchmarks named in `only`, smaller and faster with `quick`.
+
+    Returns:
+        dict: Metric name -> {"value", "unit", "better"}.
+    """
+    pages = make_sized_pages()
+    results = {}
+    if "fetch" in only:
+        bench_fetch(results, pages, n_offers=50 if quick else 200)
+    if "parse" in only:
+        bench_parse(results, pages, repeat=3 if quick else 10)
+    if "write" in only:
+        bench_write(results, n_rows=1_000 if quick else 5_000)
+    if "end_to_end" in only:
+        bench_end_to_end(results, pages, n_offers=20 if quick else 100)
+    if "startup" in only:
+        bench_startup(results, pages, repeat=1 if quick else 5)
+    return results
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """ The metrics that got worse than the baseline by more than `tolerance` (a fraction).
+
+    Returns:
+        list: `(name, baseline value, value, relative change)` tuples.
+    """
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None or not reference["value"]:
+            continue
+        change = result["value"] / reference["value"] - 1
+        worse = -change if result["better"] == HIGHER else change
+        if worse > tolerance:
+            regressions.append((name, reference["value"], result["value"], change))
+    return regressions
+
+def load_baseline(path: str, quick: bool) -> dict:
+    """ The results stored at `path`, empty if there are none or if they were measured with the
+    other workload size (`quick` or not), which would make every comparison meaningless. """
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("quick", False) != quick:
+        print(f"The baseline at '{path}' was measured {'with' if baseline.get('quick') else 'without'} --quick, not comparing.")
+        return {}
+    return baseline["results"]
+
+def _save_report(path: str, report: dict):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+        f.write("\n")
+
+def main(argv=None) -> int:
+    arg_parser = argparse.ArgumentParser(description="Offline performance benchmarks, checked against a stored baseline.")
+    arg_parser.add_argument("--only", default=",".join(BENCHMARKS), help=f"Comma-separated benchmarks among {', '.join(BENCHMARKS)}.")
+    arg_parser.add_argument("--quick", action="store_true", help="Smaller workloads, for a fast sanity check.")
+    arg_parser.add_argument("--baseline", default=None, help=f"Baseline results to compare with, by default '{BASELINE}', or '{QUICK_BASELINE}' with --quick.")
+    arg_parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline.")
+    arg_parser.add_argument("--tolerance", type=float, default=0.25, help="Relative slowdown flagged as a regression.")
+    arg_parser.add_argument("--json", default=None, help="Also write the results to this JSON file.")
+    args = arg_parser.parse_args(argv)
+
+    args.baseline = args.baseline or (QUICK_BASELINE if args.quick else BASELINE)
+    results = run(args.only.split(","), args.quick)
+    baseline = load_baseline(args.baseline, args.quick)
+
+    print(f"{'metric':<36}{'value':>12}{'baseline':>12}{'change':>9}  unit")
+    for name, result in results.items():
+        reference = baseline.get(name, {}).get("value")
+        change = f"{result['value'] / reference - 1:+.0%}" if reference else ""
+        reference = f"{reference:.4g}" if reference is not None else "-"
+        print(f"{name:<36}{result['value']:>12.4g}{reference:>12}{change:>9}  {result['unit']}")
+
+    report = {"machine": platform.node(), "python": platform.python_version(), "quick": args.quick, "results": results}
+    if args.json:
+        _save_report(args.json, report)
+    if args.save_baseline:
+        _save_report(args.baseline, report)
+        print(f"Saved the baseline to '{args.baseline}'.")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    for name, reference, value, change in regressions:
+        print(f"REGRESSION {name}: {reference:.4g} -> {value:.4g} ({change:+.0%})")
+    violations = over_budget(results)
+    for violation in violations:
+        print(f"OVER BUDGET {violation}")
+    if not baseline:
+        print(f"No comparable baseline at '{args.baseline}', run with --save-baseline to store one.")
+    return 1 if regressions or violations else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,64 +1,325 @@
+import asyncio
 import requests
 import random
-import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from html_cache import CacheEntry, HtmlCache
+from identity_pool import DEFAULT_USER_AGENTS, IdentityPool
+from metrics import BLOCK_CHECK, FETCH, metrics
+from platforms import DEFAULT_PLATFORM, Platform, registry
+from rate_limiter import AdaptiveRateLimiter, RateLimiter
 
 class WebCrawler:
-    def __init__(self):
-        self.session = requests.Session()
-        self.user_agents = [
-            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36',
-            'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:89.0) Gecko/20100101 Firefox/89.0',
-            'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.107 Safari/537.36',
-            'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.1.1 Safari/605.1.15'
-        ]
-        self.session.headers.update({
+    def __init__(
+        self,
+        rate_limiter: RateLimiter | None = None,
+        cache: HtmlCache | None = None,
+        offline: bool = False,
+        identity_pool: IdentityPool | None = None,
+        platform: str | Platform = DEFAULT_PLATFORM
+    ):
+        """
+        Args:
+            rate_limiter (RateLimiter): Paces the requests and adapts to blocking.
+                Defaults to an `AdaptiveRateLimiter`.
+            cache (HtmlCache): On-disk cache of fetched pages. Fresh entries are served without
+                network access and stale ones are revalidated with ETag / Last-Modified.
+            offline (bool): Replay mode. Serve pages from `cache` only, whatever their age,
+                and never touch the network.
+            identity_pool (IdentityPool): Spread requests over several identities (session,
+                cookies, User-Agent, proxy), resting the blocked ones. Without a pool, one
+                session is used with a random User-Agent per request.
+            platform (str | Platform): The marketplace to crawl, or its key in `platforms.registry`.
+        """
+        if offline and cache is None:
+            raise ValueError("Offline replay mode requires a cache.")
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter()
+        self.cache = cache
+        self.offline = offline
+        self.identity_pool = identity_pool
+        self.platform = registry.get(platform) if isinstance(platform, str) else platform
+        # Offers whose last fetch was refused (block page, 403 or 429), e.g. to report them as
+        # blocked and rest the identity that sent it. Server errors are failures, not blocks.
+        self.blocked = set()
+        self.user_agents = list(DEFAULT_USER_AGENTS)
+        self.session = self._new_session()
+
+    @staticmethod
+    def _new_session() -> requests.Session:
+        """Creates a session carrying the browser-like default headers."""
+        session = requests.Session()
+        session.headers.update({
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8',
             'Accept-Language': 'en-US,en;q=0.9,zh-CN;q=0.8,zh;q=0.7',
             'Accept-Encoding': 'gzip, deflate, br',
             'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1',
         })
-        
-    def fetch_html(self, offer_id: str) -> str | None:
+        return session
+
+    def _build_url(self, offer_id: str) -> str:
+        """Builds the detail page URL for a given offer ID."""
+        return self.platform.build_url(offer_id)
+
+    def _lookup_cache(self, offer_id: str) -> tuple:
         """
-        Fetches the HTML content for a given 1688 offer ID using enhanced techniques.
+        Looks an offer up in the cache before going to the network.
+
+        Returns:
+            tuple: `(html, entry)`. `html` is set when the page can be served without any request
+                (a fresh entry, or any entry in offline mode). Otherwise `entry` is the stale entry
+                to revalidate, or None on a cache miss.
+        """
+        if self.cache is None:
+            return None, None
+        entry = self.cache.get(offer_id)
+        if entry is not None and (self.offline or entry.is_fresh()):
+            print(f"Loaded product {offer_id} from cache.")
+            metrics.inc("cache_hits")
+            return entry.html, None
+        metrics.inc("cache_misses")
+        if self.offline:
+            print(f"Product {offer_id} is not cached, skipping it in offline mode.")
+        return None, entry
+
+    def _request(self, session: requests.Session, offer_id: str, cached: CacheEntry | None = None) -> str | None:
+        """
+        Performs a single fetch of an offer page on the given session, without any pacing.
 
         Args:
+            session (requests.Session): The session to send the request on.
             offer_id (str): The product's offer ID.
+            cached (CacheEntry): A stale cache entry to revalidate with a conditional request.
 
         Returns:
             str: The HTML content of the page, or None if an error occurs or if blocked.
         """
-        url = f"https://detail.1688.com/offer/{offer_id}.html"
-        
+        url = self._build_url(offer_id)
+        host = urlsplit(url).hostname
+
         # --- Enhancements ---
-        # 1. Rotate User-Agent for each request
-        self.session.headers['User-Agent'] = random.choice(self.user_agents)
+        # 1. Rotate User-Agent for each request, unless the session is an identity with its own
+        if self.identity_pool is None:
+            session.headers['User-Agent'] = random.choice(self.user_agents)
         # 2. Set a Referer to simulate navigation from the site's homepage
-        self.session.headers['Referer'] = 'https://www.1688.com/'
+        if self.platform.referer:
+            session.headers['Referer'] = self.platform.referer
 
         print(f"Fetching data from: {url}")
+        self.blocked.discard(offer_id)
         try:
             # 3. Use the session object to make the request (handles cookies automatically)
-            response = self.session.get(url, timeout=15)
+            headers = cached.revalidation_headers() if cached is not None else None
+            # Counted before sending, so timeouts and dropped connections (blocks too) are attempts
+            metrics.inc("requests")
+            with metrics.timer(FETCH):
+                response = session.get(url, timeout=15, headers=headers)
+            metrics.inc("bytes_received", len(response.content))
+            if response.status_code == 304 and cached is not None:
+                print(f"Product {offer_id} not modified, using cached page.")
+                metrics.inc("cache_revalidated")
+                self.cache.refresh(offer_id)
+                self.rate_limiter.record_success(host)
+                return cached.html
+            if response.status_code in (403, 429):
+                # Refused or throttled: let the rate limiter back off before failing
+                self.rate_limiter.record_block(host)
+                self.blocked.add(offer_id)
+                metrics.inc("blocks")
+            elif response.status_code >= 500:
+                # Overloaded: back off as well, but the identity is not to blame
+                self.rate_limiter.record_block(host)
+                metrics.inc("blocks")
             response.raise_for_status()
 
             # 4. Check for blocking page content even if status code is 200
-            if "unusual traffic" in response.text or "detected unusual traffic" in response.text:
+            with metrics.timer(BLOCK_CHECK):
+                is_block_page = self.platform.is_block_page(response.text)
+            if is_block_page:
+                metrics.inc("blocks")
                 print(f"Failed to fetch product {offer_id}: Blocked by anti-scraping mechanism.")
-                # Save the blocking page for debugging
-                with open(f"blocked_{offer_id}.html", "w", encoding="utf-8") as f:
-                    f.write(response.text)
+                self.rate_limiter.record_block(host)
+                self.blocked.add(offer_id)
                 return None
 
             print(f"Fetched product {offer_id} successfully.")
-            
-            # 5. Add a random delay to mimic human behavior
-            time.sleep(random.uniform(2, 5)) 
-            
+            self.rate_limiter.record_success(host)
+            if self.cache is not None:
+                self.cache.put(
+                    offer_id, response.text,
+                    etag=response.headers.get('ETag'), last_modified=response.headers.get('Last-Modified')
+                )
             return response.text
 
+        except (requests.Timeout, requests.ConnectionError) as e:
+            # Dropped connections and timeouts are how a site often sheds load: back off as for a block
+            print(f"Error fetching product {offer_id}: {e}")
+            metrics.inc("blocks")
+            self.rate_limiter.record_block(host)
+            return None
         except requests.RequestException as e:
             print(f"Error fetching product {offer_id}: {e}")
-            return None
\ No newline at end of file
+            return None
+
+    def fetch_html(self, offer_id: str) -> str | None:
+        """
+        Fetches the HTML content for a given 1688 offer ID using enhanced techniques.
+
+        Args:
+            offer_id (str): The product's offer ID.
+
+        Returns:
+            str: The HTML content of the page, or None if an error occurs or if blocked.
+        """
+        html, cached = self._lookup_cache(offer_id)
+        if html is not None or self.offline:
+            return html
+
+        host = urlsplit(self._build_url(offer_id)).hostname
+        if self.identity_pool is None:
+            # 5. Wait for the rate limiter instead of a fixed random delay
+            self.rate_limiter.acquire(host, id(self.session))
+            return self._request(self.session, offer_id, cached)
+
+        identity = self.identity_pool.acquire()
+        html = None
+        try:
+            self.rate_limiter.acquire(host, id(identity.session))
+            html = self._request(identity.session, offer_id, cached)
+        finally:
+            self.identity_pool.release(identity, self._outcome(offer_id, html))
+        return html
+
+    def _outcome(self, offer_id: str, html: str | None) -> bool | None:
+        """ Whether a fetch was blocked (True), succeeded (False) or failed otherwise (None). """
+        if offer_id in self.blocked:
+            return True
+        return False if html is not None else None
+
+
+class AsyncWebCrawler(WebCrawler):
+    """
+    Concurrent variant of `WebCrawler` built on asyncio.
+
+    Requests still go through `requests` sessions, run on a thread pool so the event loop
+    never blocks. Concurrency is bounded per host and requests are paced by the rate limiter
+    with `asyncio.sleep` instead of `time.sleep`.
+    """
+
+    def __init__(
+        self,
+        max_per_host: int = 4,
+        rate_limiter: RateLimiter | None = None,
+        cache: HtmlCache | None = None,
+        offline: bool = False,
+        identity_pool: IdentityPool | None = None,
+        platform: str | Platform = DEFAULT_PLATFORM
+    ):
+        """
+        Args:
+            max_per_host (int): Maximum number of in-flight requests to a single host.
+            rate_limiter (RateLimiter): Paces the requests and adapts to blocking.
+                Defaults to an `AdaptiveRateLimiter`.
+            cache (HtmlCache): On-disk cache of fetched pages, see `WebCrawler`.
+            offline (bool): Replay mode, serve pages from `cache` only.
+            identity_pool (IdentityPool): Identities to spread the requests over, see `WebCrawler`.
+            platform (str | Platform): The marketplace to crawl, see `WebCrawler`.
+        """
+        super().__init__(rate_limiter, cache, offline, identity_pool, platform)
+        self.max_per_host = max_per_host
+
+    async def _fetch(self, executor: ThreadPoolExecutor, session: requests.Session, offer_id: str, host_slots: dict) -> str | None:
+        """Fetches one offer while holding a concurrency slot of its host, from `host_slots`."""
+        loop = asyncio.get_running_loop()
+        # Cache reads decompress whole pages, keep them off the event loop too
+        html, cached = await loop.run_in_executor(executor, self._lookup_cache, offer_id)
+        if html is not None or self.offline:
+            return html
+
+        host = urlsplit(self._build_url(offer_id)).hostname
+        slots = host_slots.get(host)
+        if slots is None:
+            slots = host_slots[host] = asyncio.Semaphore(self.max_per_host)
+        async with slots:
+            if self.identity_pool is None:
+                await self.rate_limiter.acquire_async(host, id(session))
+                return await loop.run_in_executor(executor, self._request, session, offer_id, cached)
+
+            identity = await self.identity_pool.acquire_async()
+            html = None
+            try:
+                await self.rate_limiter.acquire_async(host, id(identity.session))
+                html = await loop.run_in_executor(executor, self._request, identity.session, offer_id, cached)
+            finally:
+                self.identity_pool.release(identity, self._outcome(offer_id, html))
+            return html
+
+    async def fetch_many(self, offer_ids, max_workers: int | None = None):
+        """
+        Fetches many offers concurrently and streams the results as they finish.
+
+        Offer IDs are consumed lazily, so `offer_ids` may be a generator over a very large
+        catalog; only a bounded number of them are held in memory at any time.
+
+        Args:
+            offer_ids (iterable): The offer IDs to fetch.
+            max_workers (int): Total number of concurrent fetches across all hosts.
+                Defaults to `max_per_host`.
+
+        Yields:
+            tuple: `(offer_id, html)` pairs in completion order. `html` is None when the
+                fetch failed or was blocked.
+        """
+        max_workers = max_workers or self.max_per_host
+        pending = asyncio.Queue(maxsize=max_workers * 2)
+        results = asyncio.Queue(maxsize=max_workers * 2)
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fetch")
+        # Semaphores belong to the running event loop: a new set per call, so the crawler can
+        # be reused from another `asyncio.run`
+        host_slots = {}
+
+        async def produce():
+            try:
+                for offer_id in offer_ids:
+                    await pending.put(offer_id)
+            finally:
+                for _ in range(max_workers):
+                    await pending.put(None)
+
+        async def work():
+            # Each worker owns its session: requests.Session is not safe to share across threads.
+            # With an identity pool, identities are lent out one request at a time instead.
+            session = self._new_session()
+            try:
+                while True:
+                    offer_id = await pending.get()
+                    if offer_id is None:
+                        break
+                    try:
+                        html = await self._fetch(executor, session, offer_id, host_slots)
+                    except Exception as e:
+                        # Reported as a failed fetch instead of silently losing the offer
+                        print(f"Error fetching product {offer_id}: {e!r}")
+                        html = None
+                    await results.put((offer_id, html))
+            finally:
+                session.close()
+                await results.put(None)
+
+        tasks = [asyncio.create_task(produce())]
+        tasks += [asyncio.create_task(work()) for _ in range(max_workers)]
+        try:
+            running = max_workers
+            while running:
+                item = await results.get()
+                if item is None:
+                    running -= 1
+                    continue
+                yield item
+            # Surface errors raised while iterating `offer_ids`, or by a worker itself.
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            executor.shutdown(wait=False)
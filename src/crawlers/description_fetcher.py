@@ -0,0 +1,159 @@
+import re
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from metrics import DESCRIPTION_FETCH, metrics
+
+# Key under which `PageParser` leaves the description URL when it does not fetch it itself.
+DESCRIPTION_URL_KEY = "_description_url"
+
+DESCRIPTION_NOT_FOUND = "Description not found."
+DESCRIPTION_FETCH_FAILED = "Could not fetch description."
+
+class DescriptionFetcher:
+    """
+    Fetches product descriptions as a separate, concurrent stage.
+
+    All downloads share one keep-alive connection pool. Requests for a `detailUrl` that is
+    already in flight are joined instead of sent twice, and successful results are kept in
+    an LRU cache.
+    """
+
+    def __init__(self, max_workers: int = 8, cache_size: int = 1024, timeout: float = 10):
+        """
+        Args:
+            max_workers (int): Number of concurrent downloads (and pooled connections).
+            cache_size (int): Number of descriptions kept in memory.
+            timeout (float): Timeout of a single download, in seconds.
+        """
+        self.max_workers = max_workers
+        self.cache_size = cache_size
+        self.timeout = timeout
+        self._setup()
+
+    def _setup(self):
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._in_flight = {}
+        # Session and threads are created on first use, so an unused fetcher costs nothing
+        self._session = None
+        self._executor = None
+
+    def __getstate__(self):
+        # Sessions, threads and locks cannot cross process boundaries (see PageParser.parse_many)
+        return {"max_workers": self.max_workers, "cache_size": self.cache_size, "timeout": self.timeout}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._setup()
+
+    def _ensure_started(self):
+        if self._executor is None:
+            # requests is only imported once a description is fetched
+            import requests
+            from requests.adapters import HTTPAdapter
+            self._session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.max_workers)
+            self._session.mount("https://", adapter)
+            self._session.mount("http://", adapter)
+            self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="description")
+
+    def _download(self, desc_url: str) -> str:
+        """Downloads and cleans one description."""
+        import requests
+        try:
+            with metrics.timer(DESCRIPTION_FETCH):
+                response = self._session.get("https:" + desc_url, timeout=self.timeout)
+            metrics.inc("description_requests")
+            metrics.inc("bytes_received", len(response.content))
+            desc_response = response.text
+            desc_html_raw = re.search(r'{"content":"(.*)"}', desc_response)
+            if desc_html_raw:
+                # Clean up escaped characters
+                return desc_html_raw.group(1).replace('\\"', '"').replace('\\/', '/')
+        except requests.RequestException as e:
+            print(f"Could not fetch description: {e}")
+        return DESCRIPTION_FETCH_FAILED
+
+    def _done(self, desc_url: str, future: Future):
+        with self._lock:
+            self._in_flight.pop(desc_url, None)
+            if not future.cancelled() and future.exception() is None and future.result() != DESCRIPTION_FETCH_FAILED:
+                self._cache[desc_url] = future.result()
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+    def submit(self, desc_url: str) -> Future:
+        """
+        Starts fetching a description in the background.
+
+        Args:
+            desc_url (str): The protocol-relative `detailUrl` of the description module.
+
+        Returns:
+            Future: Resolves to the cleaned description HTML.
+        """
+        with self._lock:
+            if desc_url in self._cache:
+                self._cache.move_to_end(desc_url)
+                future = Future()
+                future.set_result(self._cache[desc_url])
+                return future
+            future = self._in_flight.get(desc_url)
+            if future is not None:
+                return future
+            self._ensure_started()
+            future = self._executor.submit(self._download, desc_url)
+            self._in_flight[desc_url] = future
+        future.add_done_callback(lambda f: self._done(desc_url, f))
+        return future
+
+    def fetch(self, desc_url: str | None) -> str:
+        """Fetches a description, blocking until it is available."""
+        if not desc_url:
+            return DESCRIPTION_NOT_FOUND
+        return self.submit(desc_url).result()
+
+    def fill_descriptions(self, parsed_pages, lookahead: int = 16):
+        """
+        Pipeline stage resolving the descriptions left out by `PageParser(fetch_description=False)`.
+
+        Descriptions of the next `lookahead` pages are prefetched concurrently while earlier
+        pages are being handed on, so the stage only waits when the network is behind.
+
+        Args:
+            parsed_pages (iterable): `(key, variants)` pairs, as yielded by `PageParser.parse_many`.
+            lookahead (int): Number of pages whose descriptions are fetched ahead.
+
+        Yields:
+            tuple: The same `(key, variants)` pairs, in order, with `Description` filled in.
+        """
+        window = deque()
+        for key, variants in parsed_pages:
+            for desc_url in {v.get(DESCRIPTION_URL_KEY) for v in self._records(variants)}:
+                if desc_url:
+                    self.submit(desc_url)
+            window.append((key, variants))
+            if len(window) > lookahead:
+                yield self._fill(*window.popleft())
+        while window:
+            yield self._fill(*window.popleft())
+
+    @staticmethod
+    def _records(variants) -> list:
+        """ The dicts holding the description fields: the shared fields of a `VariantBatch`. """
+        shared = getattr(variants, "shared", None)
+        return [shared] if shared is not None else variants
+
+    def _fill(self, key, variants) -> tuple:
+        for variant in self._records(variants):
+            if DESCRIPTION_URL_KEY in variant:
+                variant["Description"] = self.fetch(variant.pop(DESCRIPTION_URL_KEY))
+        return key, variants
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._session.close()
+            self._executor = None
+            self._session = None
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+NEW = "new"
+CHANGED = "changed"
+REMOVED = "removed"
+
+def row_fingerprint(row: dict) -> str:
+    """ Hash of the values a variant writes (price, stock and every other field), internal keys aside. """
+    blob = json.dumps(row, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+def _public_fields(variant) -> dict:
+    """ The variant as a plain dict, without the `_`-prefixed keys the parser uses internally. """
+    return {key: value for key, value in variant.items() if not key.startswith("_")}
+
+class OfferDelta:
+    """ What changed in one offer since the previous run, and the state to store once written. """
+
+    def __init__(self, offer_id: str, fingerprint: str | None, delisted: bool = False):
+        self.offer_id = offer_id
+        self.fingerprint = fingerprint
+        # The offer is gone from the catalog: `commit` forgets it
+        self.delisted = delisted
+        self.changes = []  # (kind, row) pairs, kind being NEW, CHANGED or REMOVED
+        self.skus = {}  # SKU -> (fingerprint, row as JSON), the offer's SKUs as of this run
+
+    def rows(self, kind: str | None = None) -> list:
+        """ The rows of the changes of one kind, or of all of them. """
+        return [row for change, row in self.changes if kind is None or change == kind]
+
+class FingerprintStore:
+    """
+    Fingerprints of the offers and SKUs written by previous crawls, for incremental re-crawls.
+
+    Each offer keeps the hash of the page modules its variants were built from (see
+    `PageParser(fingerprint=True)`): when it has not changed, the offer is skipped before its
+    descriptions are fetched and its rows written. Each SKU keeps the hash of its row, and the
+    row itself, so a changed offer only yields its new and changed SKUs, plus the ones it no
+    longer lists. Like `JobStore`, the state lives in SQLite and is only updated (`commit`)
+    once the delta workbook is saved, so an interrupted run does not lose changes.
+    """
+
+    def __init__(self, path: str = "fingerprints.sqlite3"):
+        """
+        Args:
+            path (str): The path to the SQLite database file.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS offers (
+                offer_id TEXT PRIMARY KEY,
+                fingerprint TEXT,
+                seen_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS skus (
+                offer_id TEXT NOT NULL,
+                sku TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                row TEXT NOT NULL,
+                PRIMARY KEY (offer_id, sku)
+            );
+        """)
+        self._conn.commit()
+
+    def offer_fingerprint(self, offer_id: str) -> str | None:
+        """ The fingerprint stored for an offer, or None if it was never written. """
+        with self._lock:
+            row = self._conn.execute("SELECT fingerprint FROM offers WHERE offer_id = ?", (offer_id,)).fetchone()
+        return row[0] if row else None
+
+    def is_unchanged(self, offer_id: str, fingerprint: str | None) -> bool:
+        return fingerprint is not None and fingerprint == self.offer_fingerprint(offer_id)
+
+    def _stored_skus(self, offer_id: str) -> dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT sku, fingerprint, row FROM skus WHERE offer_id = ?", (offer_id,)).fetchall()
+        return {sku: (fingerprint, row) for sku, fingerprint, row in rows}
+
+    @staticmethod
+    def _removed_row(row_json: str) -> dict:
+        """ A SKU the offer no longer lists is written with no stock, which takes it off sale. """
+        row = json.loads(row_json)
+        row["Stock"] = 0
+        return row
+
+    def diff(self, offer_id: str, fingerprint: str | None, variants) -> OfferDelta:
+        """ Compare the freshly parsed variants of an offer with the stored SKUs.
+
+        Args:
+            offer_id (str): The offer the variants belong to.
+            fingerprint (str): The offer fingerprint to store, see `PageParser(fingerprint=True)`.
+            variants: The offer's variants, dicts or a `VariantBatch`.
+
+        Returns:
+            OfferDelta: The new, changed and removed SKUs, in the offer's order, removed last.
+        """
+        delta = OfferDelta(offer_id, fingerprint)
+        stored = self._stored_skus(offer_id)
+        occurrences = {}
+        for variant in variants:
+            row = _public_fields(variant)
+            sku = str(row.get("SKU"))
+            # SKU names are not guaranteed unique: tell the duplicates apart by rank
+            rank = occurrences[sku] = occurrences.get(sku, 0) + 1
+            if rank > 1:
+                sku = f"{sku}#{rank}"
+            digest = row_fingerprint(row)
+            previous = stored.get(sku)
+            if previous is None:
+                delta.changes.append((NEW, row))
+            elif previous[0] != digest:
+                delta.changes.append((CHANGED, row))
+            delta.skus[sku] = (digest, json.dumps(row, ensure_ascii=False, default=str))
+        for sku, (_, row_json) in stored.items():
+            if sku not in delta.skus:
+                delta.changes.append((REMOVED, self._removed_row(row_json)))
+        return delta
+
+    def removed_offers(self, seen) -> list:
+        """ Deltas removing every SKU of the stored offers that are not in `seen`.
+
+        Only meaningful after a run over the whole catalog: an offer missing from it has been
+        delisted.
+        """
+        with self._lock:
+            offer_ids = [row[0] for row in self._conn.execute("SELECT offer_id FROM offers")]
+        seen = set(seen)
+        deltas = []
+        for offer_id in offer_ids:
+            if offer_id in seen:
+                continue
+            delta = OfferDelta(offer_id, None, delisted=True)
+            for _, row_json in self._stored_skus(offer_id).values():
+                delta.changes.append((REMOVED, self._removed_row(row_json)))
+            deltas.append(delta)
+        return deltas
+
+    def commit(self, deltas, seen=()):
+        """ Store the state of the written offers, forget the delisted ones, and record when the
+        unchanged offers in `seen` were last seen. """
+        now = time.time()
+        with self._lock, self._conn:
+            for delta in deltas:
+                self._conn.execute("DELETE FROM skus WHERE offer_id = ?", (delta.offer_id,))
+                if delta.delisted:
+                    self._conn.execute("DELETE FROM offers WHERE offer_id = ?", (delta.offer_id,))
+                    continue
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO offers (offer_id, fingerprint, seen_at) VALUES (?, ?, ?)",
+                    (delta.offer_id, delta.fingerprint, now)
+                )
+                self._conn.executemany(
+                    "INSERT INTO skus (offer_id, sku, fingerprint, row) VALUES (?, ?, ?, ?)",
+                    [(delta.offer_id, sku, digest, row) for sku, (digest, row) in delta.skus.items()]
+                )
+            self._conn.executemany("UPDATE offers SET seen_at = ? WHERE offer_id = ?", [(now, offer_id) for offer_id in seen])
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
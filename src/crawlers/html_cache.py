@@ -0,0 +1,173 @@
+import hashlib
+import sqlite3
+import threading
+import time
+import zlib
+
+class CacheEntry:
+    def __init__(self, offer_id: str, html: str, etag: str | None, last_modified: str | None, fetched_at: float, ttl: float):
+        self.offer_id = offer_id
+        self.html = html
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at
+        self.ttl = ttl
+
+    def is_fresh(self, now: float | None = None) -> bool:
+        """ Whether the entry is still within its TTL. """
+        now = time.time() if now is None else now
+        return now - self.fetched_at < self.ttl
+
+    def revalidation_headers(self) -> dict:
+        """ Conditional request headers allowing the server to answer 304 Not Modified. """
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class HtmlCache:
+    """
+    A persistent, compressed on-disk cache of offer pages backed by SQLite.
+
+    Page bodies are stored zlib-compressed and content-addressed by their SHA-256, so identical
+    pages (e.g. the same block page served for many offers) are stored once. Each offer ID points
+    to a body together with its ETag / Last-Modified validators, fetch time and TTL. When the
+    compressed size exceeds `max_bytes`, the least recently used entries are evicted.
+
+    Hits only note their access time in memory: the notes are written in one batch along with
+    the next `put` or `refresh`, when `flush_every` of them are pending, and on `close`.
+    """
+
+    def __init__(
+        self,
+        path: str = "html_cache.sqlite3",
+        ttl: float = 24 * 3600,
+        max_bytes: int = 512 * 1024 * 1024,
+        flush_every: int = 1000
+    ):
+        """
+        Args:
+            path (str): The path to the SQLite database file.
+            ttl (float): Default time-to-live of an entry, in seconds.
+            max_bytes (int): Upper bound of the total compressed size of the cached pages.
+            flush_every (int): Number of pending access times that triggers writing them.
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.flush_every = flush_every
+        # offer ID -> access time of the hits not written yet
+        self._accessed = {}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                hash TEXT PRIMARY KEY,
+                data BLOB NOT NULL,
+                size INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS entries (
+                offer_id TEXT PRIMARY KEY,
+                hash TEXT NOT NULL REFERENCES blobs(hash),
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                ttl REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries(accessed_at);
+            CREATE INDEX IF NOT EXISTS entries_hash ON entries(hash);
+        """)
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+    def get(self, offer_id: str) -> CacheEntry | None:
+        """ Return the cached entry of an offer, fresh or stale, or None if it is not cached. """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT b.data, e.etag, e.last_modified, e.fetched_at, e.ttl "
+                "FROM entries e JOIN blobs b ON b.hash = e.hash WHERE e.offer_id = ?",
+                (offer_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._accessed[offer_id] = time.time()
+            if len(self._accessed) >= self.flush_every:
+                self._flush_accessed()
+                self._conn.commit()
+        data, etag, last_modified, fetched_at, ttl = row
+        return CacheEntry(offer_id, zlib.decompress(data).decode("utf-8"), etag, last_modified, fetched_at, ttl)
+
+    def put(self, offer_id: str, html: str, etag: str | None = None, last_modified: str | None = None, ttl: float | None = None):
+        """ Store (or replace) the page of an offer, then evict entries if the cache is over size. """
+        raw = html.encode("utf-8")
+        digest = hashlib.sha256(raw).hexdigest()
+        now = time.time()
+        with self._lock:
+            # Before evicting, so the entries read since the last write count as recently used
+            self._flush_accessed()
+            previous = self._conn.execute("SELECT hash FROM entries WHERE offer_id = ?", (offer_id,)).fetchone()
+            if self._conn.execute("SELECT 1 FROM blobs WHERE hash = ?", (digest,)).fetchone() is None:
+                data = zlib.compress(raw, 6)
+                self._conn.execute("INSERT INTO blobs (hash, data, size) VALUES (?, ?, ?)", (digest, data, len(data)))
+                self._total_bytes += len(data)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (offer_id, hash, etag, last_modified, fetched_at, accessed_at, ttl) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (offer_id, digest, etag, last_modified, now, now, self.ttl if ttl is None else ttl)
+            )
+            if previous is not None and previous[0] != digest:
+                self._release_blob(previous[0])
+            self._evict()
+            self._conn.commit()
+
+    def refresh(self, offer_id: str):
+        """ Mark an entry as just fetched, e.g. after the server answered 304 Not Modified. """
+        now = time.time()
+        with self._lock:
+            self._flush_accessed()
+            self._conn.execute("UPDATE entries SET fetched_at = ?, accessed_at = ? WHERE offer_id = ?", (now, now, offer_id))
+            self._conn.commit()
+
+    def size(self) -> int:
+        """ Total compressed size of the cached pages, in bytes. """
+        return self._total_bytes
+
+    def _flush_accessed(self):
+        """ Write the pending access times, to be committed by the caller. """
+        if self._accessed:
+            self._conn.executemany(
+                "UPDATE entries SET accessed_at = ? WHERE offer_id = ?",
+                [(accessed_at, offer_id) for offer_id, accessed_at in self._accessed.items()]
+            )
+            self._accessed.clear()
+
+    def _release_blob(self, digest: str):
+        """ Delete a body once no entry references it anymore. """
+        if self._conn.execute("SELECT 1 FROM entries WHERE hash = ? LIMIT 1", (digest,)).fetchone() is not None:
+            return
+        row = self._conn.execute("SELECT size FROM blobs WHERE hash = ?", (digest,)).fetchone()
+        if row is not None:
+            self._conn.execute("DELETE FROM blobs WHERE hash = ?", (digest,))
+            self._total_bytes -= row[0]
+
+    def _evict(self):
+        """ Drop least recently used entries until the cache fits in `max_bytes`. """
+        if self._total_bytes <= self.max_bytes:
+            return
+        lru = self._conn.execute("SELECT offer_id, hash FROM entries ORDER BY accessed_at").fetchall()
+        for offer_id, digest in lru:
+            self._conn.execute("DELETE FROM entries WHERE offer_id = ?", (offer_id,))
+            self._release_blob(digest)
+            if self._total_bytes <= self.max_bytes:
+                break
+
+    def close(self):
+        with self._lock:
+            self._flush_accessed()
+            self._conn.commit()
+            self._conn.close()
@@ -0,0 +1,189 @@
+import asyncio
+import itertools
+import threading
+import time
+import requests
+
+DEFAULT_USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:89.0) Gecko/20100101 Firefox/89.0',
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.107 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.1.1 Safari/605.1.15'
+]
+
+def load_proxies(path: str) -> list:
+    """ Read proxy URLs from a text file, one per line, `#` comments allowed. """
+    with open(path, encoding="utf-8") as f:
+        return [line.split("#", 1)[0].strip() for line in f if line.split("#", 1)[0].strip()]
+
+class Identity:
+    """ One browsing identity: a session with its own cookie jar, User-Agent and optional proxy. """
+
+    def __init__(self, name: str, session: requests.Session, user_agent: str, proxy: str | None = None):
+        self.name = name
+        self.session = session
+        self.user_agent = user_agent
+        self.proxy = proxy
+        session.headers['User-Agent'] = user_agent
+        if proxy:
+            session.proxies.update({'http': proxy, 'https': proxy})
+        self.successes = 0
+        self.blocks = 0
+        self.consecutive_blocks = 0
+        # Smoothed success ratio: 1.0 is healthy, dropping towards 0 as blocks pile up
+        self.health = 1.0
+        self.last_used = 0.0
+        self.resting_until = 0.0
+        self.in_use = False
+
+    def is_available(self, now: float) -> bool:
+        return not self.in_use and now >= self.resting_until
+
+    def stats(self) -> dict:
+        attempts = self.successes + self.blocks
+        return {
+            "name": self.name, "proxy": self.proxy, "successes": self.successes, "blocks": self.blocks,
+            "block_rate": self.blocks / attempts if attempts else 0.0, "health": round(self.health, 3),
+            "resting_for": max(0.0, self.resting_until - time.monotonic()),
+        }
+
+class IdentityPool:
+    """
+    A pool of browsing identities, so a flagged cookie jar or User-Agent only affects the
+    requests made with it.
+
+    An identity is lent out for one request at a time. Among the available ones, the least
+    recently used is picked, with unhealthy identities (a low smoothed success ratio) treated
+    as if they had been used more recently. A blocked identity loses its cookies and rests for
+    `rest` seconds, doubled after each consecutive block up to `max_rest`, while the other
+    identities keep the crawl going.
+    """
+
+    def __init__(
+        self,
+        size: int = 4,
+        user_agents: list | None = None,
+        proxies: list | None = None,
+        rest: float = 120.0,
+        max_rest: float = 1800.0,
+        health_penalty: float = 60.0,
+        session_factory=requests.Session
+    ):
+        """
+        Args:
+            size (int): Number of identities.
+            user_agents (list): User-Agents to spread over the identities, round robin.
+            proxies (list): Proxy URLs to spread over the identities, round robin. None for no proxy.
+            rest (float): Seconds an identity rests after its first block.
+            max_rest (float): Upper bound of the rest after consecutive blocks.
+            health_penalty (float): Seconds of "recent use" added to a fully unhealthy identity
+                when picking the next one.
+            session_factory (callable): Creates the sessions, e.g. `WebCrawler._new_session`
+                for browser-like default headers.
+        """
+        self.rest = rest
+        self.max_rest = max_rest
+        self.health_penalty = health_penalty
+        user_agents = itertools.cycle(user_agents or DEFAULT_USER_AGENTS)
+        proxies = itertools.cycle(proxies) if proxies else itertools.repeat(None)
+        self.identities = [
+            Identity(f"identity-{i}", session_factory(), next(user_agents), next(proxies))
+            for i in range(size)
+        ]
+        # Reentrant, as `acquire` waits on it around `try_acquire`
+        self._available = threading.Condition(threading.RLock())
+        # (loop, asyncio.Event) of the coroutines waiting in `acquire_async`, set by `release`
+        self._async_waiters = set()
+
+    def _pick(self, now: float) -> Identity | None:
+        candidates = [identity for identity in self.identities if identity.is_available(now)]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda identity: identity.last_used + (1.0 - identity.health) * self.health_penalty)
+
+    def _next_wake_up(self, now: float) -> float | None:
+        """ Seconds until a resting identity becomes available, None if all the others are in use. """
+        resting = [identity.resting_until for identity in self.identities if not identity.in_use]
+        return max(0.0, min(resting) - now) if resting else None
+
+    def try_acquire(self) -> tuple:
+        """ Borrow an identity without waiting.
+
+        Returns:
+            tuple: `(identity, wait)`. `identity` is None when none is available; `wait` is then
+                the time until one stops resting, or None if they are all in use.
+        """
+        with self._available:
+            now = time.monotonic()
+            identity = self._pick(now)
+            if identity is None:
+                return None, self._next_wake_up(now)
+            identity.in_use = True
+            identity.last_used = now
+            return identity, 0.0
+
+    def acquire(self) -> Identity:
+        """ Borrow an identity, waiting for one to be returned or to finish resting. """
+        with self._available:
+            while True:
+                identity, wait = self.try_acquire()
+                if identity is not None:
+                    return identity
+                self._available.wait(wait)
+
+    async def acquire_async(self) -> Identity:
+        """ Same as `acquire`, waiting on an `asyncio.Event` instead of blocking the thread. """
+        loop = asyncio.get_running_loop()
+        while True:
+            # Registered under the lock, so a release between the attempt and the wait is not missed
+            with self._available:
+                identity, wait = self.try_acquire()
+                if identity is not None:
+                    return identity
+                waiter = (loop, asyncio.Event())
+                self._async_waiters.add(waiter)
+            try:
+                await asyncio.wait_for(waiter[1].wait(), wait)
+            except asyncio.TimeoutError:
+                pass  # an identity finished resting
+            finally:
+                with self._available:
+                    self._async_waiters.discard(waiter)
+
+    def release(self, identity: Identity, blocked: bool | None):
+        """ Return a borrowed identity with the outcome of its request.
+
+        Args:
+            identity (Identity): The identity to return.
+            blocked (bool): True if the request was refused (403, 429 or a block page), False if
+                it succeeded, None if it failed for another reason (e.g. a server error or a
+                network error), which does not affect health.
+        """
+        with self._available:
+            identity.in_use = False
+            if blocked:
+                identity.blocks += 1
+                identity.consecutive_blocks += 1
+                identity.health *= 0.5
+                rest = min(self.max_rest, self.rest * 2 ** (identity.consecutive_blocks - 1))
+                identity.resting_until = time.monotonic() + rest
+                # The jar may carry the flag that got us blocked: start over with fresh cookies
+                identity.session.cookies.clear()
+                print(f"{identity.name} was blocked, resting for {rest:.0f}s.")
+            elif blocked is False:
+                identity.successes += 1
+                identity.consecutive_blocks = 0
+                identity.health += (1.0 - identity.health) * 0.1
+            self._available.notify()
+            # Releases come from worker threads: wake the coroutines on their own loops
+            for loop, event in self._async_waiters:
+                loop.call_soon_threadsafe(event.set)
+
+    def stats(self) -> list:
+        with self._available:
+            return [identity.stats() for identity in self.identities]
+
+    def close(self):
+        for identity in self.identities:
+            identity.session.close()
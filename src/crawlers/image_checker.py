@@ -0,0 +1,332 @@
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from metrics import IMAGE_CHECK, metrics
+
+try:
+    from PIL import Image
+except ImportError:  # optional, thumbnails are stored at full size without it
+    Image = None
+
+PHOTOS_KEY = "Photos"
+
+class ImageInfo:
+    """ The outcome of checking one image URL. """
+
+    __slots__ = ("url", "ok", "status", "content_type", "size", "digest")
+
+    def __init__(self, url: str, ok: bool, status: int | None = None, content_type: str | None = None,
+                 size: int | None = None, digest: str | None = None):
+        self.url = url
+        self.ok = ok
+        self.status = status
+        self.content_type = content_type
+        self.size = size
+        # SHA-256 of the first bytes of the image, when the checker reads them
+        self.digest = digest
+
+    @property
+    def dead(self) -> bool:
+        """ Whether the image is definitely unusable: gone (404/410), or answered with something
+        that is not an image. Unreachable, throttled (429) and failing (5xx) images are not. """
+        if self.status in (404, 410):
+            return True
+        return self.status is not None and 200 <= self.status < 300 and not self.ok
+
+    def __repr__(self):
+        return f"ImageInfo({self.url!r}, ok={self.ok}, status={self.status})"
+
+class ThumbnailStore:
+    """
+    Downloads images into a content-addressed directory, with bounded concurrency.
+
+    Files are named after the SHA-256 of the image bytes (`ab/abcdef....jpg`), so an image
+    shared by many products, or served under several URLs, is stored once. With Pillow
+    installed, images are shrunk to fit `size`; otherwise they are stored as downloaded.
+    """
+
+    def __init__(self, directory: str = "thumbnails", max_workers: int = 4, size: tuple = (200, 200), timeout: float = 20):
+        """
+        Args:
+            directory (str): Root of the store.
+            max_workers (int): Number of concurrent downloads.
+            size (tuple): Bounding box of the thumbnails, in pixels.
+            timeout (float): Timeout of a single download, in seconds.
+        """
+        self.directory = directory
+        self.max_workers = max_workers
+        self.size = size
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._paths = {}  # URL -> Future of the stored path
+        self._session = None
+        self._executor = None
+
+    def _ensure_started(self):
+        if self._executor is None:
+            self._session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.max_workers)
+            self._session.mount("https://", adapter)
+            self._session.mount("http://", adapter)
+            self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="thumbnail")
+
+    def path_for(self, digest: str, extension: str = ".jpg") -> str:
+        return os.path.join(self.directory, digest[:2], digest + extension)
+
+    def _download(self, url: str) -> str | None:
+        """Downloads one image and stores its thumbnail, unless the same content is stored already."""
+        try:
+            response = self._session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            print(f"Could not download image {url}: {e}")
+            return None
+        data = response.content
+        metrics.inc("bytes_received", len(data))
+        path = self.path_for(hashlib.sha256(data).hexdigest())
+        if os.path.exists(path):
+            return path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        if Image is not None:
+            try:
+                with Image.open(io.BytesIO(data)) as image:
+                    image.thumbnail(self.size)
+                    image.convert("RGB").save(tmp_path, "JPEG", quality=85)
+            except OSError:
+                # Not an image Pillow can read: keep the original bytes
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+        else:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+        os.replace(tmp_path, path)
+        return path
+
+    def submit(self, url: str) -> Future:
+        """ Starts storing the thumbnail of an image, once per URL.
+
+        Returns:
+            Future: Resolves to the path of the stored file, or None if the download failed.
+        """
+        with self._lock:
+            future = self._paths.get(url)
+            if future is None:
+                self._ensure_started()
+                future = self._paths[url] = self._executor.submit(self._download, url)
+        return future
+
+    def close(self, wait: bool = True):
+        """ Stop the downloads, letting the submitted ones finish first when `wait` is set. """
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=not wait)
+            self._session.close()
+            self._executor = None
+            self._session = None
+
+class ImageChecker:
+    """
+    Checks product image URLs as a separate, concurrent stage, and deduplicates them.
+
+    Like `DescriptionFetcher`, checks share one keep-alive connection pool on their own
+    threads, a URL already being checked is joined instead of checked twice, and results are
+    kept in an LRU cache keyed by URL, so an image shared by many SKUs or products is checked
+    once per crawl. Images go to a CDN, not to the offer pages' host, so the stage neither
+    waits for nor counts against the crawler's rate limiting.
+
+    A check is a HEAD request, or a ranged GET of the first `hash_bytes` bytes when
+    deduplicating by content: two URLs whose first bytes hash the same and whose sizes are
+    equal are treated as the same image. Only definitely dead images are dropped; an image
+    whose check timed out or was throttled is kept, and checked again for the next product.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 16,
+        cache_size: int = 65536,
+        timeout: float = 10,
+        hash_bytes: int = 0,
+        thumbnails: ThumbnailStore | None = None
+    ):
+        """
+        Args:
+            max_workers (int): Number of concurrent checks (and pooled connections).
+            cache_size (int): Number of check results kept in memory.
+            timeout (float): Timeout of a single check, in seconds.
+            hash_bytes (int): Read and hash this many leading bytes of each image to
+                deduplicate them by content. 0 deduplicates by URL only, with HEAD requests.
+            thumbnails (ThumbnailStore): Also store a thumbnail of every valid image.
+        """
+        self.max_workers = max_workers
+        self.cache_size = cache_size
+        self.timeout = timeout
+        self.hash_bytes = hash_bytes
+        self.thumbnails = thumbnails
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._in_flight = {}
+        # Session and threads are created on first use, so an unused checker costs nothing
+        self._session = None
+        self._executor = None
+
+    def _ensure_started(self):
+        if self._executor is None:
+            self._session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.max_workers)
+            self._session.mount("https://", adapter)
+            self._session.mount("http://", adapter)
+            self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="image")
+
+    def _head(self, url: str) -> ImageInfo | None:
+        """HEAD check. Returns None when the server does not support HEAD."""
+        response = self._session.head(url, timeout=self.timeout, allow_redirects=True)
+        if response.status_code in (405, 501):
+            return None
+        size = response.headers.get("Content-Length")
+        return ImageInfo(
+            url, self._is_image(response), response.status_code,
+            response.headers.get("Content-Type"), int(size) if size and size.isdigit() else None
+        )
+
+    def _ranged_get(self, url: str) -> ImageInfo:
+        """Ranged GET of the leading bytes, hashed to deduplicate by content."""
+        probe = max(self.hash_bytes, 1)
+        with self._session.get(url, timeout=self.timeout, headers={"Range": f"bytes=0-{probe - 1}"}, stream=True) as response:
+            # Servers ignoring Range answer 200 with the whole image: only read what we need
+            head = response.raw.read(probe, decode_content=True) if response.ok else b""
+            metrics.inc("bytes_received", len(head))
+            total = response.headers.get("Content-Range", "").rpartition("/")[2] or response.headers.get("Content-Length")
+            return ImageInfo(
+                url, self._is_image(response), response.status_code, response.headers.get("Content-Type"),
+                int(total) if total and total.isdigit() else None,
+                hashlib.sha256(head).hexdigest() if head and self.hash_bytes else None
+            )
+
+    @staticmethod
+    def _is_image(response: requests.Response) -> bool:
+        content_type = response.headers.get("Content-Type", "")
+        return response.ok and (not content_type or content_type.startswith("image/"))
+
+    def _check(self, url: str) -> ImageInfo:
+        """Checks one image URL."""
+        try:
+            with metrics.timer(IMAGE_CHECK):
+                info = self._head(url) if not self.hash_bytes else None
+                if info is None:
+                    info = self._ranged_get(url)
+        except requests.RequestException as e:
+            print(f"Could not check image {url}: {e}")
+            return ImageInfo(url, False)
+        metrics.inc("image_checks")
+        if info.dead:
+            metrics.inc("dead_images")
+        elif info.ok and self.thumbnails is not None:
+            self.thumbnails.submit(url)
+        return info
+
+    def _done(self, url: str, future: Future):
+        with self._lock:
+            self._in_flight.pop(url, None)
+            # Only definitive answers are cached: network errors, 429s and 5xx are retried by the next product
+            if not future.cancelled() and future.exception() is None and (future.result().ok or future.result().dead):
+                self._cache[url] = future.result()
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+    def submit(self, url: str) -> Future:
+        """
+        Starts checking an image URL in the background.
+
+        Returns:
+            Future: Resolves to the `ImageInfo` of the URL.
+        """
+        with self._lock:
+            if url in self._cache:
+                self._cache.move_to_end(url)
+                future = Future()
+                future.set_result(self._cache[url])
+                return future
+            future = self._in_flight.get(url)
+            if future is not None:
+                return future
+            self._ensure_started()
+            future = self._executor.submit(self._check, url)
+            self._in_flight[url] = future
+        future.add_done_callback(lambda f: self._done(url, f))
+        return future
+
+    def check(self, url: str) -> ImageInfo:
+        """Checks an image URL, blocking until the result is available."""
+        return self.submit(url).result()
+
+    def clean_photos(self, photos: str) -> str:
+        """ Drop the dead and duplicate images from a comma-separated `Photos` value, keeping the
+        order. Images whose check was inconclusive are kept. """
+        urls = [url.strip() for url in photos.split(",") if url.strip()]
+        for url in urls:
+            self.submit(url)
+        kept, seen = [], set()
+        for url in urls:
+            info = self.check(url)
+            # Leading bytes alone are shared by many images (e.g. a common JPEG header)
+            key = (info.digest, info.size) if info.digest and info.size is not None else url
+            if not info.dead and key not in seen:
+                seen.add(key)
+                kept.append(url)
+        return ", ".join(kept)
+
+    def check_images(self, parsed_pages, lookahead: int = 16):
+        """
+        Pipeline stage cleaning the `Photos` of parsed pages.
+
+        Images of the next `lookahead` pages are checked concurrently while earlier pages are
+        handed on, so the stage only waits when the image host is behind.
+
+        Args:
+            parsed_pages (iterable): `(key, variants)` pairs, as yielded by `PageParser.parse_many`.
+            lookahead (int): Number of pages whose images are checked ahead.
+
+        Yields:
+            tuple: The same `(key, variants)` pairs, in order, with `Photos` cleaned.
+        """
+        window = deque()
+        for key, variants in parsed_pages:
+            for photos in {record.get(PHOTOS_KEY) for record in self._records(variants)}:
+                for url in (photos or "").split(","):
+                    if url.strip():
+                        self.submit(url.strip())
+            window.append((key, variants))
+            if len(window) > lookahead:
+                yield self._clean(*window.popleft())
+        while window:
+            yield self._clean(*window.popleft())
+
+    @staticmethod
+    def _records(variants) -> list:
+        """ The dicts holding the photos: the shared fields of a `VariantBatch`. """
+        shared = getattr(variants, "shared", None)
+        return [shared] if shared is not None else variants
+
+    def _clean(self, key, variants) -> tuple:
+        cleaned = {}
+        for record in self._records(variants):
+            photos = record.get(PHOTOS_KEY)
+            if photos:
+                if photos not in cleaned:
+                    cleaned[photos] = self.clean_photos(photos)
+                record[PHOTOS_KEY] = cleaned[photos]
+        return key, variants
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._session.close()
+            self._executor = None
+            self._session = None
+        if self.thumbnails is not None:
+            self.thumbnails.close()
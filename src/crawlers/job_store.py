@@ -0,0 +1,241 @@
+import contextlib
+import itertools
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+PENDING = "pending"
+FETCHED = "fetched"
+PARSED = "parsed"
+WRITTEN = "written"
+BLOCKED = "blocked"
+FAILED = "failed"
+STATUSES = (PENDING, FETCHED, PARSED, WRITTEN, BLOCKED, FAILED)
+
+# Statuses ending a job's claim: the job is done, or has to be tried again later.
+_RELEASING = (WRITTEN, BLOCKED, FAILED)
+
+def default_worker_id() -> str:
+    """ Identifies this process among the workers sharing a job store. """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class JobStore:
+    """
+    A durable queue of crawl jobs, one per offer ID, backed by SQLite in WAL mode.
+
+    Each job records its status (pending -> fetched -> parsed -> written, or blocked / failed),
+    its number of attempts and when it was created and last updated. Workers claim jobs in a
+    write transaction, so several threads or processes sharing the database never get the same
+    job. A claim is a lease: if its worker dies, the job can be claimed again once `lease`
+    seconds have passed. Jobs that are not written yet are claimable until they have been
+    attempted `max_attempts` times, so a new run resumes an interrupted crawl and retries its
+    failures, without redoing the written offers.
+    """
+
+    def __init__(self, path: str = "jobs.sqlite3", lease: float = 600, max_attempts: int = 3):
+        """
+        Args:
+            path (str): The path to the SQLite database file.
+            lease (float): Seconds after which a claimed, unfinished job can be claimed again.
+            max_attempts (int): Number of claims after which a job is no longer handed out.
+        """
+        self.path = path
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        # Other processes may hold the write lock for a moment: wait instead of failing
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                offer_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                claimed_by TEXT,
+                claimed_at REAL,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status);
+        """)
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """ A write transaction. BEGIN IMMEDIATE takes the database write lock up front, so no
+        other process can write between our reads and writes. """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def add(self, offer_ids, batch_size: int = 1000) -> int:
+        """ Add jobs for new offer IDs, consuming `offer_ids` lazily. Known offers are left as they are.
+
+        Returns:
+            int: The number of jobs added.
+        """
+        added = 0
+        offer_ids = iter(offer_ids)
+        while True:
+            batch = list(itertools.islice(offer_ids, batch_size))
+            if not batch:
+                return added
+            now = time.time()
+            with self._transaction() as conn:
+                cursor = conn.executemany(
+                    "INSERT OR IGNORE INTO jobs (offer_id, created_at, updated_at) VALUES (?, ?, ?)",
+                    [(offer_id, now, now) for offer_id in batch]
+                )
+                added += cursor.rowcount
+
+    def claim(self, worker_id: str, limit: int = 1, touched_before: float | None = None) -> list:
+        """ Claim up to `limit` jobs that are not written yet, have attempts left and are not leased.
+
+        Args:
+            worker_id (str): Identifies the claiming worker.
+            limit (int): Maximum number of jobs to claim.
+            touched_before (float): Only retry jobs last updated before this time. Jobs never
+                attempted are always claimable.
+
+        Returns:
+            list: The claimed offer IDs, oldest jobs first. Empty when nothing is claimable.
+        """
+        now = time.time()
+        touched_before = now if touched_before is None else touched_before
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT offer_id FROM jobs "
+                "WHERE status != ? AND attempts < ? AND (claimed_by IS NULL OR claimed_at < ?) "
+                "AND (attempts = 0 OR updated_at < ?) "
+                "ORDER BY created_at, offer_id LIMIT ?",
+                (WRITTEN, self.max_attempts, now - self.lease, touched_before, limit)
+            ).fetchall()
+            offer_ids = [row[0] for row in rows]
+            conn.executemany(
+                "UPDATE jobs SET claimed_by = ?, claimed_at = ?, attempts = attempts + 1, updated_at = ? "
+                "WHERE offer_id = ?",
+                [(worker_id, now, now, offer_id) for offer_id in offer_ids]
+            )
+        return offer_ids
+
+    def claimed(self, worker_id: str, batch_size: int = 16):
+        """ Iterate over jobs claimed for `worker_id`, `batch_size` at a time, until none is left.
+
+        Jobs are claimed lazily, as the iteration goes, so workers sharing the store split the
+        work between them instead of one worker claiming everything up front. A job that fails
+        during the iteration is not handed out again by it: it is retried on the next run.
+        """
+        started = time.time()
+        while True:
+            offer_ids = self.claim(worker_id, batch_size, touched_before=started)
+            if not offer_ids:
+                return
+            yield from offer_ids
+
+    def mark(self, offer_id: str, status: str, error: str | None = None):
+        """ Record the progress of a job. Written, blocked and failed jobs are released. """
+        self.mark_many([offer_id], status, error)
+
+    def mark_many(self, offer_ids, status: str, error: str | None = None):
+        """ Record the same progress for many jobs in one transaction. """
+        if status not in STATUSES:
+            raise ValueError(f"Unknown job status '{status}'.")
+        now = time.time()
+        if status in _RELEASING:
+            query = "UPDATE jobs SET status = ?, error = ?, updated_at = ?, claimed_by = NULL, claimed_at = NULL WHERE offer_id = ?"
+        else:
+            query = "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE offer_id = ?"
+        with self._transaction() as conn:
+            conn.executemany(query, [(status, error, now, offer_id) for offer_id in offer_ids])
+
+    def release(self, worker_id: str) -> int:
+        """ Hand back the unfinished jobs claimed by a worker, e.g. when it stops early.
+
+        Returns:
+            int: The number of jobs released.
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET claimed_by = NULL, claimed_at = NULL, updated_at = ? WHERE claimed_by = ?",
+                (time.time(), worker_id)
+            )
+        return cursor.rowcount
+
+    def retry_failed(self) -> int:
+        """ Give blocked and failed jobs a fresh set of attempts.
+
+        Returns:
+            int: The number of jobs requeued.
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET attempts = 0, updated_at = ? WHERE status IN (?, ?)",
+                (time.time(), BLOCKED, FAILED)
+            )
+        return cursor.rowcount
+
+    def renew(self, offer_ids):
+        """ Extend the leases of claimed jobs, e.g. while their results wait to be saved. """
+        now = time.time()
+        with self._transaction() as conn:
+            conn.executemany(
+                "UPDATE jobs SET claimed_at = ? WHERE offer_id = ? AND claimed_by IS NOT NULL",
+                [(now, offer_id) for offer_id in offer_ids]
+            )
+
+    def renew_claims(self, worker_id: str) -> int:
+        """ Extend the leases of every job a worker holds, e.g. periodically while it is alive.
+
+        Returns:
+            int: The number of jobs renewed.
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute("UPDATE jobs SET claimed_at = ? WHERE claimed_by = ?", (time.time(), worker_id))
+        return cursor.rowcount
+
+    def claimable(self) -> int:
+        """ Number of jobs `claim` could hand out now. """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status != ? AND attempts < ? AND (claimed_by IS NULL OR claimed_at < ?)",
+                (WRITTEN, self.max_attempts, time.time() - self.lease)
+            ).fetchone()
+        return row[0]
+
+    def in_progress(self) -> int:
+        """ Number of jobs currently claimed by a worker whose lease has not expired. """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE claimed_by IS NOT NULL AND claimed_at >= ?",
+                (time.time() - self.lease,)
+            ).fetchone()
+        return row[0]
+
+    def counts(self) -> dict:
+        """ Number of jobs per status. """
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update(rows)
+        return counts
+
+    def get(self, offer_id: str) -> dict | None:
+        """ The record of one job, or None if the offer is unknown. """
+        with self._lock:
+            cursor = self._conn.execute("SELECT * FROM jobs WHERE offer_id = ?", (offer_id,))
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        return dict(zip([column[0] for column in cursor.description], row))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
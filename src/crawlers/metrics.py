@@ -0,0 +1,205 @@
+import bisect
+import json
+import os
+import threading
+import time
+
+# Stage names, shared by the crawler, the parser and the pipeline.
+FETCH = "fetch"
+BLOCK_CHECK = "block_check"
+INIT_DATA_EXTRACT = "init_data_extract"
+DESCRIPTION_FETCH = "description_fetch"
+VARIANT_BUILD = "variant_build"
+ROW_WRITE = "row_write"
+IMAGE_CHECK = "image_check"
+
+# Upper bounds (seconds) of the latency histogram buckets, as in Prometheus client libraries.
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Histogram:
+    def __init__(self, buckets: tuple = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, data: dict):
+        for i, count in enumerate(data["counts"]):
+            self.counts[i] += count
+        self.sum += data["sum"]
+        self.count += data["count"]
+
+    def to_dict(self) -> dict:
+        return {"counts": list(self.counts), "sum": self.sum, "count": self.count}
+
+class _Timer:
+    __slots__ = ("_metrics", "_stage", "_start")
+
+    def __init__(self, metrics, stage: str):
+        self._metrics = metrics
+        self._stage = stage
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._metrics.observe(self._stage, time.perf_counter() - self._start)
+        return False
+
+class _NullTimer:
+    """ What `Metrics.timer` returns when disabled: entering and leaving it does nothing. """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+class Metrics:
+    """
+    Latency histograms per stage and counters, exported as Prometheus text or JSON.
+
+    Instrumented code calls `timer(stage)`, `observe` and `inc` unconditionally. While the
+    registry is disabled (the default) they return immediately, without taking a lock or
+    reading the clock, so instrumentation costs next to nothing unless it is switched on.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+
+    def timer(self, stage: str):
+        """ Context manager recording the time spent in its block into the histogram of `stage`. """
+        return _Timer(self, stage) if self.enabled else _NULL_TIMER
+
+    def observe(self, stage: str, seconds: float):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, counter: str, amount: float = 1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[counter] = self._counters.get(counter, 0) + amount
+
+    def snapshot(self, reset: bool = False) -> dict:
+        """ The raw histograms and counters, e.g. to send them from a worker process to `merge`. """
+        with self._lock:
+            data = {
+                "histograms": {stage: histogram.to_dict() for stage, histogram in self._histograms.items()},
+                "counters": dict(self._counters),
+            }
+            if reset:
+                self._histograms.clear()
+                self._counters.clear()
+        return data
+
+    def merge(self, data: dict):
+        """ Add a `snapshot` taken elsewhere (e.g. in a parser process) to this registry. """
+        with self._lock:
+            for stage, histogram in data["histograms"].items():
+                self._histograms.setdefault(stage, Histogram()).merge(histogram)
+            for counter, value in data["counters"].items():
+                self._counters[counter] = self._counters.get(counter, 0) + value
+
+    def summary(self) -> dict:
+        """ Per-stage count / mean / sum, the counters, and the derived block and cache hit rates.
+        The block rate is the share of requests sent, answered or not, that were blocked. """
+        data = self.snapshot()
+        counters = data["counters"]
+        stages = {
+            stage: {
+                "count": histogram["count"], "sum_seconds": round(histogram["sum"], 6),
+                "mean_seconds": round(histogram["sum"] / histogram["count"], 6) if histogram["count"] else 0.0,
+            }
+            for stage, histogram in data["histograms"].items()
+        }
+        requests = counters.get("requests", 0)
+        lookups = counters.get("cache_hits", 0) + counters.get("cache_misses", 0)
+        return {
+            "stages": stages,
+            "counters": counters,
+            "block_rate": counters.get("blocks", 0) / requests if requests else 0.0,
+            "cache_hit_rate": counters.get("cache_hits", 0) / lookups if lookups else 0.0,
+        }
+
+    def to_prometheus(self, prefix: str = "crawler") -> str:
+        """ The metrics in the Prometheus text exposition format. """
+        data = self.snapshot()
+        lines = [f"# TYPE {prefix}_stage_seconds histogram"]
+        for stage, histogram in sorted(data["histograms"].items()):
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ("+Inf",), histogram["counts"]):
+                cumulative += count
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {histogram["sum"]}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {histogram["count"]}')
+        for counter, value in sorted(data["counters"].items()):
+            lines.append(f"# TYPE {prefix}_{counter}_total counter")
+            lines.append(f"{prefix}_{counter}_total {value}")
+        summary = self.summary()
+        for gauge in ("block_rate", "cache_hit_rate"):
+            lines.append(f"# TYPE {prefix}_{gauge} gauge")
+            lines.append(f"{prefix}_{gauge} {summary[gauge]}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int = 9108, host: str = "127.0.0.1") -> "ThreadingHTTPServer":
+        """ Serve `to_prometheus` on `GET /metrics` from a background thread. """
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                data = metrics.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+        return server
+
+    def dump_json(self, path: str):
+        """ Write `summary` to a JSON file, atomically. """
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(dict(self.summary(), time=time.time()), f, indent=1)
+        os.replace(tmp_path, path)
+
+    def dump_periodically(self, path: str, interval: float = 10.0) -> threading.Event:
+        """ Dump the summary to `path` every `interval` seconds, until the returned event is set. """
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                self.dump_json(path)
+
+        threading.Thread(target=run, name="metrics-dump", daemon=True).start()
+        return stop
+
+# The registry the crawler, parser and pipeline report to. Disabled until `enabled` is set.
+metrics = Metrics()
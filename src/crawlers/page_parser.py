@@ -1,8 +1,67 @@
 # data_parser.py
+import hashlib
 import json
+import os
+import queue
 import re
-import requests
-from bs4 import BeautifulSoup
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from description_fetcher import DESCRIPTION_URL_KEY, DescriptionFetcher
+from metrics import INIT_DATA_EXTRACT, VARIANT_BUILD, metrics
+from variant_batch import VariantBatch
+
+try:
+    import orjson
+except ImportError:  # optional, only speeds up decoding of __INIT_DATA
+    orjson = None
+
+_INIT_DATA_MARKER = "window.__INIT_DATA"
+# What follows the marker where the object is assigned, unlike e.g. `__INIT_DATA_EXTRA` or a comment
+_INIT_DATA_ASSIGNMENT = re.compile(r"\s*=\s*\{")
+_INIT_DATA_ASSIGNMENT_BYTES = re.compile(rb"\s*=\s*\{")
+_json_decoder = json.JSONDecoder()
+
+# Fields that differ between the SKUs of a product, everything else is shared by them.
+SKU_FIELDS = (
+    "SKU", "Color", "Stock", "(Colombia) Price in US",
+    "Package gross weight", "Package length", "Package width", "Package height",
+)
+
+# Key under which `PageParser(fingerprint=True)` leaves the fingerprint of the offer's data.
+OFFER_FINGERPRINT_KEY = "_offer_fingerprint"
+
+# Modules the variants are built from: two pages hashing the same over them yield the same rows.
+FINGERPRINT_COMPONENTS = (
+    "@ali/tdmod-od-pc-offer-title", "@ali/tdmod-od-gyp-pc-offer-title",
+    "@ali/tdmod-pc-od-main-pic", "@ali/tdmod-od-gyp-pc-main-pic",
+    "@ali/tdmod-od-pc-attribute-new", "@ali/tdmod-od-pc-offer-cross",
+    "@ali/tdmod-gyp-pc-sku-selection", "@ali/tdmod-pc-od-dsc-order",
+    "@ali/tdmod-od-pc-offer-price", "@ali/tdmod-od-pc-offer-description",
+)
+
+# Parser instance of a parse_many worker process, set up by `_init_worker`.
+_worker_parser = None
+
+def _init_worker(parser, metrics_enabled: bool = False):
+    global _worker_parser
+    _worker_parser = parser
+    metrics.enabled = metrics_enabled
+
+def _terminate_pool(pool: ProcessPoolExecutor):
+    """ Shuts a process pool down without waiting for its workers, stopping the busy ones. """
+    # The executor has no public way to stop a running task before Python 3.14
+    workers = list((pool._processes or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for worker in workers:
+        worker.terminate()
+
+def _parse_in_worker(html_content: str) -> tuple:
+    """ Parses one page, returning the variants with the metrics recorded meanwhile, if enabled. """
+    variants = _worker_parser.parse(html_content)
+    return variants, metrics.snapshot(reset=True) if metrics.enabled else None
 
 class PageParser:
     """
@@ -10,9 +69,98 @@ class PageParser:
     Instantiate this class once and use the `parse` method for multiple HTML documents.
     """
 
-    def _extract_init_data(self, soup: BeautifulSoup) -> dict:
-        """Extracts the 'window.__INIT_DATA' JSON object from the HTML."""
-        script_tag = soup.find("script", string=re.compile("window.__INIT_DATA"))
+    def __init__(
+        self,
+        fetch_description: bool = True,
+        description_fetcher: DescriptionFetcher | None = None,
+        compact: bool = False,
+        fingerprint: bool = False
+    ):
+        """
+        Args:
+            fetch_description (bool): Fetch each product's description while parsing. When
+                False, variants carry the description URL instead, to be resolved later by
+                `DescriptionFetcher.fill_descriptions` or simply dropped when the
+                `Description` column is not needed.
+            description_fetcher (DescriptionFetcher): Shared pooled, cached fetcher used for
+                the descriptions. One is created if not given.
+            compact (bool): Return each page's variants as a `VariantBatch`, storing the
+                product-level fields once instead of copying them into a dict per SKU.
+            fingerprint (bool): Add a hash of the modules the variants are built from to the
+                product-level fields, under `OFFER_FINGERPRINT_KEY`, so an incremental crawl can
+                tell an unchanged offer before describing and writing it.
+        """
+        self.fetch_description = fetch_description
+        self.compact = compact
+        self.fingerprint = fingerprint
+        self.description_fetcher = description_fetcher or DescriptionFetcher()
+
+    def _extract_init_data(self, html_content: str | bytes) -> dict:
+        """
+        Extracts the 'window.__INIT_DATA' JSON object from the HTML.
+
+        The JSON blob is located and decoded straight from the raw page. Building the whole
+        BeautifulSoup tree is only done as a fallback when the fast scan fails.
+        """
+        data = self._scan_init_data(html_content)
+        if data is not None:
+            return data
+        from bs4 import BeautifulSoup  # imported on this slow path only, it costs more than most parses
+        return self._extract_init_data_from_soup(BeautifulSoup(html_content, 'lxml'))
+
+    def _scan_init_data(self, html_content: str | bytes) -> dict | None:
+        """
+        Fast path of `_extract_init_data`: finds the assignment and decodes the JSON object in place.
+
+        Every mention of the marker is tried until one assigns an object literal, within its
+        script, that holds the page modules.
+
+        Returns:
+            dict: The decoded data, or None if it could not be located or decoded this way.
+        """
+        if isinstance(html_content, bytes):
+            marker, assignment, script_end = _INIT_DATA_MARKER.encode(), _INIT_DATA_ASSIGNMENT_BYTES, b"</script>"
+        else:
+            marker, assignment, script_end = _INIT_DATA_MARKER, _INIT_DATA_ASSIGNMENT, "</script>"
+
+        marker_pos = html_content.find(marker)
+        while marker_pos >= 0:
+            after = marker_pos + len(marker)
+            data = self._decode_assignment(html_content, after, assignment, script_end)
+            if data is not None and isinstance(data.get("data"), dict):
+                return data
+            marker_pos = html_content.find(marker, after)
+        return None
+
+    def _decode_assignment(self, html_content: str | bytes, pos: int, assignment: re.Pattern, script_end) -> dict | None:
+        """ Decodes the object assigned at `pos`, if the object starts there and before the end of the script. """
+        match = assignment.match(html_content, pos)
+        if match is None:
+            return None
+        start = match.end() - 1
+        end = html_content.find(script_end, start)
+        if end < 0:
+            return None
+        # Only the script body is sliced (and decoded, for bytes), never the whole page
+        blob = html_content[start:end]
+        if isinstance(blob, bytes):
+            blob = blob.decode("utf-8", errors="replace")
+
+        if orjson is not None:
+            try:
+                data = orjson.loads(blob.rstrip().rstrip(";"))
+                return data if isinstance(data, dict) else None
+            except orjson.JSONDecodeError:
+                pass  # e.g. more statements follow the assignment
+        try:
+            data, _ = _json_decoder.raw_decode(blob)
+        except json.JSONDecodeError:
+            return None
+        return data if isinstance(data, dict) else None
+
+    def _extract_init_data_from_soup(self, soup: "BeautifulSoup") -> dict:
+        """Extracts the 'window.__INIT_DATA' JSON object from a parsed document."""
+        script_tag = soup.find("script", string=re.compile(r"window\.__INIT_DATA\s*="))
         if not script_tag:
             print("Could not find __INIT_DATA script tag.")
             return {}
@@ -28,54 +176,72 @@ class PageParser:
             print("Failed to parse JSON data.")
             return {}
 
-    def _find_module_data(self, all_data_modules: dict, component_type: str) -> dict:
-        """Finds module data by componentType, as module IDs can be dynamic."""
-        for key in all_data_modules:
-            module = all_data_modules[key]
-            if isinstance(module, dict) and module.get("componentType") == component_type:
-                return module.get("data", {})
-        return {}
+    def _index_modules(self, all_data_modules: dict) -> dict:
+        """
+        Indexes module data by componentType, as module IDs can be dynamic.
+
+        Built once per page so every lookup afterwards is a dict access instead of a scan
+        over all modules. The first module of a given componentType wins.
+        """
+        modules = {}
+        for module in all_data_modules.values():
+            if isinstance(module, dict):
+                modules.setdefault(module.get("componentType"), module.get("data", {}))
+        return modules
+
+    def _find_module_data(self, modules: dict, component_type: str) -> dict:
+        """Finds module data by componentType in an index built by `_index_modules`."""
+        return modules.get(component_type, {})
+
+    def _index_by_sku(self, records: list) -> dict:
+        """Maps skuId to its record, keeping the first record of each SKU."""
+        by_sku = {}
+        for record in records:
+            by_sku.setdefault(record.get("skuId"), record)
+        return by_sku
+
+    def _fingerprint(self, modules: dict, global_data: dict) -> str:
+        """Hashes the modules listed in `FINGERPRINT_COMPONENTS`, ignoring the rest of the page."""
+        relevant = [modules.get(component_type) for component_type in FINGERPRINT_COMPONENTS]
+        relevant.append(global_data.get("tempModel", {}).get("offerTitle"))
+        blob = json.dumps(relevant, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def _get_description_url(self, modules: dict) -> str | None:
+        """Finds the URL of the detailed product description."""
+        description_data = self._find_module_data(modules, "@ali/tdmod-od-pc-offer-description")
+        return description_data.get('detailUrl')
 
-    def _get_description(self, data: dict) -> str:
+    def _get_description(self, modules: dict) -> str:
         """Fetches and cleans the detailed product description."""
-        description_data = self._find_module_data(data.get("data", {}), "@ali/tdmod-od-pc-offer-description")
-        desc_url = description_data.get('detailUrl')
-        if not desc_url:
-            return "Description not found."
-            
-        try:
-            desc_response = requests.get("https:" + desc_url, timeout=10).text
-            desc_html_raw = re.search(r'{"content":"(.*)"}', desc_response)
-            if desc_html_raw:
-                # Clean up escaped characters
-                return desc_html_raw.group(1).replace('\\"', '"').replace('\\/', '/')
-        except requests.RequestException as e:
-            print(f"Could not fetch description: {e}")
-        return "Could not fetch description."
+        return self.description_fetcher.fetch(self._get_description_url(modules))
 
     def parse(self, html_content: str) -> list:
         """
         Main parsing method to extract all product variants from a given HTML content.
 
         Args:
-            html_content (str): The HTML content of the product page.
+            html_content (str | bytes): The HTML content of the product page.
 
         Returns:
-            list: A list of dictionaries, where each dictionary is a product variant.
+            list: A list of dictionaries, where each dictionary is a product variant,
+                or a `VariantBatch` of them in compact mode.
         """
         if not html_content:
             print("HTML content is empty. Skipping parse.")
             return []
 
-        soup = BeautifulSoup(html_content, 'lxml')
-        data = self._extract_init_data(soup)
+        with metrics.timer(INIT_DATA_EXTRACT):
+            data = self._extract_init_data(html_content)
 
         if not data:
             print("Could not extract initial data. Skipping parse.")
             return []
 
         # --- Extract common data ---
-        all_data_modules = data.get("data", {})
+        # Timed without the description fetch below, which has its own stage
+        build_started = time.perf_counter() if metrics.enabled else None
+        all_data_modules = self._index_modules(data.get("data", {}))
         global_data = data.get("globalData", {})
         
         title_data = self._find_module_data(all_data_modules, "@ali/tdmod-od-pc-offer-title") or \
@@ -93,18 +259,26 @@ class PageParser:
         brand = attributes.get("品牌", "N/A")
         composition = attributes.get("成分及含量") or attributes.get("主要用途")
         upc = attributes.get("商品条形码", "Not Available")
-        description = self._get_description(data)
         
         base_product = {
             "Title": title, "Photos": photos_str, "Universal product code": upc,
-            "Description": description, "Brand": brand, "Composition": composition,
+            "Brand": brand, "Composition": composition,
             "(Colombia) Listing type": "Classic", "Warranty type": "No warranty",
             "Gender": "Gender neutral", "Package weight unit": "g",
             "Package length, width and height unit": "cm",
         }
+        if self.fingerprint:
+            base_product[OFFER_FINGERPRINT_KEY] = self._fingerprint(all_data_modules, global_data)
+        if self.fetch_description:
+            if build_started is not None:
+                metrics.observe(VARIANT_BUILD, time.perf_counter() - build_started)
+            base_product["Description"] = self._get_description(all_data_modules)
+            build_started = time.perf_counter() if metrics.enabled else None
+        else:
+            base_product[DESCRIPTION_URL_KEY] = self._get_description_url(all_data_modules)
         
         # --- SKU-specific data ---
-        all_variants = []
+        all_variants = VariantBatch(base_product, SKU_FIELDS) if self.compact else []
         sku_selection_data = self._find_module_data(all_data_modules, "@ali/tdmod-gyp-pc-sku-selection") or \
                              self._find_module_data(all_data_modules, "@ali/tdmod-pc-od-dsc-order")
         
@@ -112,23 +286,23 @@ class PageParser:
         if sku_selection_data and 'modelSelectionInfo' in sku_selection_data:
             price_data = self._find_module_data(all_data_modules, "@ali/tdmod-od-pc-offer-price")
             all_sku_details = price_data.get('finalPriceModel', {}).get('tradeWithoutPromotion', {}).get('skuMap', [])
+            details_by_sku = self._index_by_sku(all_sku_details)
+            packages_by_sku = self._index_by_sku(cross_border_data.get('pieceWeightScale', {}).get('pieceWeightScaleInfo') or [])
             
             for sku_item in sku_selection_data.get('modelSelectionInfo', {}).get('data', []):
                 sku_props = {prop['name']: prop['value'] for prop in sku_item.get('props', [])}
                 sku_id = sku_item.get('skuId')
-                details = next((s for s in all_sku_details if s.get("skuId") == sku_id), {})
+                details = details_by_sku.get(sku_id, {})
                 
                 pkg_info = {}
-                if cross_border_data.get('pieceWeightScale', {}).get('pieceWeightScaleInfo'):
-                    pkg_item = next((p for p in cross_border_data['pieceWeightScale']['pieceWeightScaleInfo'] if p.get("skuId") == sku_id), None)
-                    if pkg_item:
-                         pkg_info = {
-                            'weight': int(float(pkg_item.get('weight', 100))), 'length': int(float(pkg_item.get('length', 10))),
-                            'width': int(float(pkg_item.get('width', 10))), 'height': int(float(pkg_item.get('height', 10))),
-                        }
-
-                variant = base_product.copy()
-                variant.update({
+                pkg_item = packages_by_sku.get(sku_id)
+                if pkg_item:
+                    pkg_info = {
+                        'weight': int(float(pkg_item.get('weight', 100))), 'length': int(float(pkg_item.get('length', 10))),
+                        'width': int(float(pkg_item.get('width', 10))), 'height': int(float(pkg_item.get('height', 10))),
+                    }
+
+                sku_fields = {
                     "SKU": sku_item.get('name', 'N/A'),
                     "Color": sku_props.get('颜色', 'N/A'),
                     "Stock": int(details.get("canBookCount", 0)),
@@ -137,7 +311,150 @@ class PageParser:
                     "Package length": pkg_info.get('length', 10),
                     "Package width": pkg_info.get('width', 10),
                     "Package height": pkg_info.get('height', 10),
-                })
-                all_variants.append(variant)
+                }
+                if self.compact:
+                    all_variants.append(sku_fields)
+                else:
+                    variant = base_product.copy()
+                    variant.update(sku_fields)
+                    all_variants.append(variant)
 
+        if build_started is not None:
+            metrics.observe(VARIANT_BUILD, time.perf_counter() - build_started)
         return all_variants
+
+    def parse_many(self, html_pages, processes: int | None = None, timeout: float = 60.0):
+        """
+        Parses many pages in parallel on a pool of worker processes.
+
+        Pages are pulled lazily on a feeder thread, and only while fewer than `processes` of
+        them are pending, so `html_pages` may be a generator over a large crawl that blocks
+        on its upstream: results keep being collected meanwhile. A page that hangs for more
+        than `timeout` seconds, or whose worker dies, is reported as failed; the pool is then
+        restarted and the other in-flight pages are resubmitted. When a worker dies with
+        several pages in flight, those are rerun one at a time to tell which one killed it.
+
+        Args:
+            html_pages (iterable): The HTML contents of the product pages.
+            processes (int): Number of worker processes. Defaults to the number of CPUs.
+            timeout (float): Maximum time (seconds) a single page may take to parse.
+
+        Yields:
+            tuple: `(index, variants)` in completion order, where `index` is the position of
+                the page in `html_pages` and `variants` is the list returned by `parse`
+                (empty if the page failed).
+        """
+        processes = processes or os.cpu_count() or 1
+        events = queue.Queue()
+        slots = threading.Semaphore(processes)
+        closed = threading.Event()
+
+        def feed():
+            try:
+                pages = enumerate(html_pages)
+                while True:
+                    while not slots.acquire(timeout=0.1):
+                        if closed.is_set():
+                            return
+                    item = next(pages, None)
+                    if item is None or closed.is_set():
+                        break
+                    events.put(("page", *item))
+                events.put(("end", None))
+            except BaseException as error:
+                events.put(("end", error))
+
+        waiting = deque()  # pages pulled but not submitted yet
+        suspects = deque()  # pages in flight when a worker died, rerun one at a time
+        in_flight = {}  # index -> (pool generation, html, submitted at)
+        generation = 0
+        pool = self._start_pool(processes)
+
+        def submit(index, html_content):
+            in_flight[index] = (generation, html_content, time.monotonic())
+            future = pool.submit(_parse_in_worker, html_content)
+            future.add_done_callback(lambda f, i=index, g=generation: events.put(("done", i, g, f)))
+
+        def finish(index):
+            del in_flight[index]
+            slots.release()
+
+        feeder = threading.Thread(target=feed, name="parse-feeder", daemon=True)
+        feeder.start()
+        try:
+            exhausted = False
+            while True:
+                if suspects:
+                    if not in_flight:
+                        submit(*suspects.popleft())
+                else:
+                    while waiting and len(in_flight) < processes:
+                        submit(*waiting.popleft())
+                if exhausted and not (in_flight or waiting or suspects):
+                    break
+
+                wait = None
+                if in_flight:
+                    deadline = min(submitted for _, _, submitted in in_flight.values()) + timeout
+                    wait = max(0.0, deadline - time.monotonic())
+                try:
+                    event = events.get(timeout=wait)
+                except queue.Empty:
+                    now = time.monotonic()
+                    for index in [i for i, (_, _, submitted) in in_flight.items() if now - submitted >= timeout]:
+                        print(f"Parsing page {index} timed out.")
+                        finish(index)
+                        yield index, []
+                    # Stuck workers cannot be cancelled one by one: restart the pool
+                    _terminate_pool(pool)
+                    generation += 1
+                    pool = self._start_pool(processes)
+                    for index, (_, html_content, _) in list(in_flight.items()):
+                        submit(index, html_content)
+                    continue
+
+                kind = event[0]
+                if kind == "page":
+                    waiting.append(event[1:])
+                    continue
+                if kind == "end":
+                    if event[1] is not None:
+                        raise event[1]
+                    exhausted = True
+                    continue
+
+                _, index, result_generation, future = event
+                # Ignore late results from a pool that has been restarted
+                if index not in in_flight or in_flight[index][0] != result_generation:
+                    continue
+                error = future.exception()
+                if isinstance(error, BrokenProcessPool):
+                    # Every page in flight fails with the pool: only one running alone is to blame
+                    if len(in_flight) == 1:
+                        print(f"The worker parsing page {index} died.")
+                        finish(index)
+                        yield index, []
+                    else:
+                        suspects.extend((i, html_content) for i, (_, html_content, _) in sorted(in_flight.items()))
+                        in_flight.clear()
+                    _terminate_pool(pool)
+                    generation += 1
+                    pool = self._start_pool(processes)
+                    continue
+
+                finish(index)
+                if error is not None:
+                    print(f"An error occurred during parsing of page {index}: {error}")
+                    result = []
+                else:
+                    result, worker_metrics = future.result()
+                    if worker_metrics is not None:
+                        metrics.merge(worker_metrics)
+                yield index, result
+        finally:
+            closed.set()
+            _terminate_pool(pool)
+
+    def _start_pool(self, processes: int) -> ProcessPoolExecutor:
+        """ Starts a pool of `parse_many` workers, each holding a copy of this parser. """
+        return ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(self, metrics.enabled))
@@ -0,0 +1,29 @@
+import re
+from urllib.parse import urlsplit
+from platforms import Platform
+
+_OFFER_URL = re.compile(r"/offer/(\d+)\.html")
+
+class Platform1688(Platform):
+    """ 1688.com product pages, whose data is read from the `window.__INIT_DATA` modules. """
+
+    key = "1688"
+    referer = "https://www.1688.com/"
+    block_markers = ("unusual traffic", "detected unusual traffic")
+
+    def build_url(self, offer_id: str) -> str:
+        return f"https://detail.1688.com/offer/{offer_id}.html"
+
+    def offer_id(self, url_or_id: str) -> str:
+        if "://" not in url_or_id:
+            return url_or_id
+        url = urlsplit(url_or_id)
+        host = (url.hostname or "").lower()
+        match = _OFFER_URL.search(url.path)
+        if match is None or not (host == "1688.com" or host.endswith(".1688.com")):
+            raise ValueError(f"'{url_or_id}' is not a 1688 offer page.")
+        return match.group(1)
+
+    def parser_class(self):
+        from page_parser import PageParser
+        return PageParser
@@ -0,0 +1,99 @@
+import importlib
+import threading
+from abc import ABC, abstractmethod
+from urllib.parse import urlsplit
+
+class Platform(ABC):
+    """
+    A marketplace the crawler can collect offers from.
+
+    The fetch engine (sessions, identities, rate limiting, the HTML cache), the variant model
+    and the writers are shared by every platform. A platform only tells how to build the page
+    URL of an offer and which parser reads its pages, plus how to recognize its block pages.
+    Subclass it in a module of its own and register that module in `registry`.
+    """
+
+    # Registry key, e.g. "1688"
+    key = None
+    # Referer sent with page requests, as if navigating from the site's home page
+    referer = None
+    # Page contents meaning the request was refused by anti-scraping, even with a 200 status
+    block_markers = ()
+
+    @abstractmethod
+    def build_url(self, offer_id: str) -> str:
+        """ The URL of an offer's page. """
+
+    def offer_id(self, url_or_id: str) -> str:
+        """ The offer ID of a page URL. Anything that is not a URL is taken as an ID already,
+        a URL that is not an offer page of this platform raises ValueError. """
+        return url_or_id
+
+    @abstractmethod
+    def parser_class(self):
+        """ The parser class of the platform's pages, imported only when first needed. """
+
+    def create_parser(self, **kwargs):
+        """ A parser for the platform's pages, taking the options of `PageParser`. """
+        return self.parser_class()(**kwargs)
+
+    def is_block_page(self, html: str) -> bool:
+        return any(marker in html for marker in self.block_markers)
+
+class PlatformRegistry:
+    """
+    Platform plugins by key and by host, imported lazily.
+
+    Plugins are registered as `"module:attribute"` references together with the hosts they
+    serve, so dispatching on a URL does not import anything and a run only pays the import
+    cost of the platform it uses.
+    """
+
+    def __init__(self):
+        self._specs = {}  # key -> "module:attribute"
+        self._hosts = {}  # host -> key
+        self._loaded = {}  # key -> Platform instance
+        self._lock = threading.Lock()
+
+    def register(self, key: str, spec: str, hosts=()):
+        """
+        Args:
+            key (str): The platform key, e.g. "1688".
+            spec (str): Where the `Platform` subclass lives, as "module:attribute".
+            hosts (iterable): Host names of the platform's pages, to dispatch URLs on.
+        """
+        self._specs[key] = spec
+        self._loaded.pop(key, None)
+        for host in hosts:
+            self._hosts[host.lower()] = key
+
+    def keys(self) -> list:
+        return list(self._specs)
+
+    def get(self, key: str) -> Platform:
+        """ The platform registered under `key`, importing its module on first use. """
+        with self._lock:
+            platform = self._loaded.get(key)
+            if platform is None:
+                spec = self._specs.get(key)
+                if spec is None:
+                    raise ValueError(f"Unknown platform '{key}'. Known platforms: {', '.join(self._specs)}.")
+                module_name, _, attribute = spec.partition(":")
+                platform = self._loaded[key] = getattr(importlib.import_module(module_name), attribute)()
+        return platform
+
+    def key_for_url(self, url: str) -> str | None:
+        """ The key of the platform serving `url`, matching its host or any parent domain. """
+        host = (urlsplit(url).hostname or "").lower()
+        while host:
+            key = self._hosts.get(host)
+            if key is not None:
+                return key
+            host = host.partition(".")[2]
+        return None
+
+# The platforms known to the crawler. Register a new one with its module and hosts.
+registry = PlatformRegistry()
+registry.register("1688", "platform_1688:Platform1688", hosts=("1688.com",))
+
+DEFAULT_PLATFORM = "1688"
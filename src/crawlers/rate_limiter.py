@@ -0,0 +1,189 @@
+import asyncio
+import random
+import threading
+import time
+
+class TokenBucket:
+    """
+    A classic token bucket. Tokens refill continuously at `rate` per second up to `capacity`.
+
+    `reserve` never blocks: it takes a token immediately and returns how long the caller has
+    to wait before the token becomes valid, so the same bucket serves sync and async callers.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def reserve(self, now: float | None = None) -> float:
+        """ Take one token and return the number of seconds to wait before using it. """
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    def set_rate(self, rate: float, now: float | None = None):
+        """ Change the refill rate, settling the tokens accrued at the old rate first. """
+        self._refill(time.monotonic() if now is None else now)
+        self.rate = rate
+
+
+class RateLimiter:
+    """
+    Interface of the crawler's rate limiters. The base class applies no limit at all.
+
+    Crawlers call `acquire` (or `acquire_async`) before each request and report the outcome
+    with `record_success` / `record_block` afterwards.
+    """
+
+    def reserve(self, host: str, session_key=None) -> float:
+        """ Reserve a request slot and return the number of seconds to wait for it. """
+        return 0.0
+
+    def acquire(self, host: str, session_key=None):
+        """ Block the calling thread until a request to `host` is allowed. """
+        wait = self.reserve(host, session_key)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, host: str, session_key=None):
+        """ Suspend the calling coroutine until a request to `host` is allowed. """
+        wait = self.reserve(host, session_key)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def record_success(self, host: str):
+        pass
+
+    def record_block(self, host: str):
+        pass
+
+    def current_rate(self, host: str) -> float | None:
+        """ Current allowed requests per second for `host`, or None if unlimited. """
+        return None
+
+    def stats(self) -> dict:
+        return {}
+
+
+class AdaptiveRateLimiter(RateLimiter):
+    """
+    Token-bucket limits per host and per session, with AIMD adaptation of the host rate.
+
+    Every block (a 429/5xx response, an anti-scraping page, a timeout or a dropped connection)
+    multiplies the host's rate by `backoff_factor`. After `recovery_streak` consecutive
+    successes the rate grows again by `recovery_step` requests per second, up to `max_rate`.
+    """
+
+    def __init__(
+        self,
+        host_rate: float = 0.3,
+        session_rate: float | None = None,
+        burst: float = 1.0,
+        min_rate: float = 0.02,
+        max_rate: float = 2.0,
+        backoff_factor: float = 0.5,
+        recovery_step: float = 0.05,
+        recovery_streak: int = 10,
+        jitter: float = 0.2
+    ):
+        """
+        Args:
+            host_rate (float): Initial requests per second allowed to each host.
+            session_rate (float): Requests per second allowed to each session, or None for no
+                per-session limit.
+            burst (float): Bucket capacity, i.e. how many requests may be sent back to back.
+            min_rate (float): Lower bound of the adapted host rate.
+            max_rate (float): Upper bound of the adapted host rate.
+            backoff_factor (float): Multiplier applied to the host rate on every block.
+            recovery_step (float): Requests per second added after a streak of successes.
+            recovery_streak (int): Number of consecutive successes needed to speed up.
+            jitter (float): Extra random delay, as a fraction of the request interval, added
+                to every wait so the traffic does not look machine-timed.
+        """
+        self.host_rate = host_rate
+        self.session_rate = session_rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.backoff_factor = backoff_factor
+        self.recovery_step = recovery_step
+        self.recovery_streak = recovery_streak
+        self.jitter = jitter
+        self._lock = threading.Lock()
+        self._host_buckets = {}
+        self._session_buckets = {}
+        self._streaks = {}
+        self._counters = {}
+
+    def _host_bucket(self, host: str) -> TokenBucket:
+        bucket = self._host_buckets.get(host)
+        if bucket is None:
+            bucket = self._host_buckets[host] = TokenBucket(self.host_rate, self.burst)
+            self._streaks[host] = 0
+            self._counters[host] = {"successes": 0, "blocks": 0}
+        return bucket
+
+    def reserve(self, host: str, session_key=None) -> float:
+        with self._lock:
+            now = time.monotonic()
+            bucket = self._host_bucket(host)
+            wait = bucket.reserve(now)
+            if self.session_rate is not None and session_key is not None:
+                session_bucket = self._session_buckets.get(session_key)
+                if session_bucket is None:
+                    session_bucket = self._session_buckets[session_key] = TokenBucket(self.session_rate, self.burst)
+                wait = max(wait, session_bucket.reserve(now))
+            rate = bucket.rate
+        if self.jitter:
+            wait += random.uniform(0, self.jitter / rate)
+        return wait
+
+    def record_success(self, host: str):
+        with self._lock:
+            bucket = self._host_bucket(host)
+            self._counters[host]["successes"] += 1
+            self._streaks[host] += 1
+            if self._streaks[host] >= self.recovery_streak and bucket.rate < self.max_rate:
+                self._streaks[host] = 0
+                bucket.set_rate(min(self.max_rate, bucket.rate + self.recovery_step))
+
+    def record_block(self, host: str):
+        with self._lock:
+            bucket = self._host_bucket(host)
+            self._counters[host]["blocks"] += 1
+            self._streaks[host] = 0
+            bucket.set_rate(max(self.min_rate, bucket.rate * self.backoff_factor))
+            rate = bucket.rate
+        print(f"Blocked by {host}, slowing down to {rate:.3f} requests/s.")
+
+    def current_rate(self, host: str) -> float | None:
+        with self._lock:
+            return self._host_bucket(host).rate
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: Per host, the current rate (requests/s), success and block counts and the
+                observed block rate.
+        """
+        with self._lock:
+            report = {}
+            for host, bucket in self._host_buckets.items():
+                counters = self._counters[host]
+                total = counters["successes"] + counters["blocks"]
+                report[host] = {
+                    "rate": bucket.rate,
+                    "successes": counters["successes"],
+                    "blocks": counters["blocks"],
+                    "block_rate": counters["blocks"] / total if total else 0.0,
+                }
+            return report
@@ -1,26 +1,41 @@
+import sys
 from crawler_1688 import WebCrawler
+from html_cache import HtmlCache
+from job_store import BLOCKED, FAILED, FETCHED, PARSED, WRITTEN, JobStore, default_worker_id
 from page_parser import PageParser
 
 if __name__ == "__main__":
     offer_ids = ["871505026881", "885695622817"]
-    scraper = WebCrawler()
+    # Pass --offline to replay pages from the cache without any network access
+    offline = "--offline" in sys.argv
+    scraper = WebCrawler(cache=HtmlCache("html_cache.sqlite3"), offline=offline)
     parser = PageParser()
-    for offer_id in offer_ids:
+    # Progress is checkpointed: rerunning skips the offers already done and retries the failures
+    jobs = JobStore("jobs.sqlite3")
+    jobs.add(offer_ids)
+    for offer_id in jobs.claimed(default_worker_id()):
         print(f"\n--- Processing Product ID: {offer_id} ---")
         
         html_content = scraper.fetch_html(offer_id)
         if not html_content:
             print(f"Skipping product {offer_id} due to fetch error.")
+            jobs.mark(offer_id, BLOCKED if offer_id in scraper.blocked else FAILED, "fetch failed")
             continue
+        jobs.mark(offer_id, FETCHED)
             
         try:
             product_variants = parser.parse(html_content)
             if not product_variants:
                 print(f"No variants found or parsed for product {offer_id}.")
+                jobs.mark(offer_id, FAILED, "no variants")
                 continue
         except Exception as e:
             print(f"An error occurred during parsing for product {offer_id}: {e}")
+            jobs.mark(offer_id, FAILED, str(e))
             continue
+        jobs.mark(offer_id, PARSED)
 
         print(f"Found {len(product_variants)} variants")
-        print(product_variants)
\ No newline at end of file
+        print(product_variants)
+        jobs.mark(offer_id, WRITTEN)
+    print(f"Jobs: {jobs.counts()}")
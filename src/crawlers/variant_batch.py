@@ -0,0 +1,89 @@
+from collections.abc import Mapping, Sequence
+
+class VariantBatch(Sequence):
+    """
+    The variants of one product, stored as a struct of arrays.
+
+    Fields common to all SKUs of the product (title, photos, description...) are kept once in
+    `shared`, and per-SKU fields in one list per field in `columns`. Compared to one dict per
+    variant, a SKU then costs a few list slots instead of a whole dict referencing every
+    shared value again.
+
+    The batch still behaves like the list of variant dicts `PageParser.parse` used to return:
+    it has a length, can be iterated and indexed, and yields read-only `Variant` views.
+    """
+
+    __slots__ = ("shared", "columns", "_length")
+
+    def __init__(self, shared: dict, fields):
+        """
+        Args:
+            shared (dict): Field name -> value, common to every variant of the product.
+            fields (iterable): Names of the per-SKU fields.
+        """
+        self.shared = shared
+        self.columns = {field: [] for field in fields}
+        self._length = 0
+
+    @classmethod
+    def from_columns(cls, shared: dict, columns: dict) -> "VariantBatch":
+        """ Rebuild a batch from its `shared` fields and `columns`, e.g. after sending them as JSON. """
+        batch = cls(shared, ())
+        batch.columns = {field: list(values) for field, values in columns.items()}
+        batch._length = len(next(iter(batch.columns.values()), ()))
+        return batch
+
+    def append(self, values: dict):
+        """ Add one variant, given its per-SKU fields. Missing fields are set to None. """
+        for field, column in self.columns.items():
+            column.append(values.get(field))
+        self._length += 1
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [Variant(self, i) for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("variant index out of range")
+        return Variant(self, index)
+
+    def __iter__(self):
+        for index in range(self._length):
+            yield Variant(self, index)
+
+    def to_dicts(self) -> list:
+        """ Expand the batch into one independent dict per variant. """
+        names = list(self.columns)
+        return [{**self.shared, **dict(zip(names, values))} for values in zip(*self.columns.values())]
+
+    def __repr__(self):
+        return f"VariantBatch({self.to_dicts()!r})"
+
+class Variant(Mapping):
+    """ Read-only view of one variant of a `VariantBatch`, usable like the variant dict. """
+
+    __slots__ = ("_batch", "_index")
+
+    def __init__(self, batch: VariantBatch, index: int):
+        self._batch = batch
+        self._index = index
+
+    def __getitem__(self, key):
+        column = self._batch.columns.get(key)
+        if column is not None:
+            return column[self._index]
+        return self._batch.shared[key]
+
+    def __iter__(self):
+        yield from self._batch.shared
+        yield from self._batch.columns
+
+    def __len__(self) -> int:
+        return len(self._batch.shared) + len(self._batch.columns)
+
+    def __repr__(self):
+        return repr(dict(self))
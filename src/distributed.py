@@ -0,0 +1,286 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(SRC_DIR, "crawlers"))
+sys.path.insert(0, os.path.join(SRC_DIR, "excel_processor"))
+
+import requests
+from crawler_1688 import WebCrawler
+from html_cache import HtmlCache
+from identity_pool import IdentityPool, load_proxies
+from job_store import BLOCKED, FAILED, PARSED, WRITTEN, JobStore, default_worker_id
+from page_parser import PageParser
+from platforms import DEFAULT_PLATFORM
+from product_table import StreamingProductTable
+from variant_batch import VariantBatch
+
+DEFAULT_TEMPLATE = os.path.join(SRC_DIR, "..", "Costumes.xlsx")
+
+def encode_variants(variants) -> dict:
+    """ The JSON form of a page's variants: a `VariantBatch` is sent as its columns, not per variant. """
+    if isinstance(variants, VariantBatch):
+        return {"shared": variants.shared, "columns": variants.columns}
+    return {"rows": list(variants)}
+
+def decode_variants(data: dict):
+    if "rows" in data:
+        return data["rows"]
+    return VariantBatch.from_columns(data["shared"], data["columns"])
+
+class Coordinator:
+    """
+    Hands out offer IDs to crawl workers over HTTP and merges their results into one workbook.
+
+    Jobs live in a `JobStore`, so a restarted coordinator resumes where it stopped. Workers,
+    possibly on other machines, claim batches with `POST /claim` and report each offer with
+    `POST /result`. The parsed variants are appended to a single `StreamingProductTable`, which
+    is saved once every job is done or out of attempts. A job whose worker disappears is handed
+    to another worker when its lease expires, and blocked or failed jobs are retried by the
+    next worker asking for work.
+    """
+
+    def __init__(
+        self,
+        output_path: str,
+        job_store: JobStore,
+        template_path: str = DEFAULT_TEMPLATE,
+        host: str = "127.0.0.1",
+        port: int = 8765,
+        linger: float = 5.0
+    ):
+        """
+        Args:
+            output_path (str): Where to save the merged workbook.
+            job_store (JobStore): The jobs to hand out. Add the offer IDs to it beforehand.
+            template_path (str): The marketplace template workbook to fill.
+            host (str): Interface to listen on, e.g. "0.0.0.0" to accept remote workers.
+            port (int): Port to listen on, 0 for any free port.
+            linger (float): Seconds to keep answering "done" to workers after the last job.
+        """
+        self.output_path = output_path
+        self.job_store = job_store
+        self.linger = linger
+        self.table = StreamingProductTable(template_path)
+        self._table_lock = threading.Lock()
+        self._received = {}  # offer ID -> None, in the order the results arrived
+        self.written = 0
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler_class(self):
+        coordinator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if self.path == "/claim":
+                    reply = coordinator.claim(body["worker"], body.get("limit", 1))
+                elif self.path == "/result":
+                    reply = coordinator.report(body)
+                else:
+                    self.send_error(404)
+                    return
+                data = json.dumps(reply).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass  # one line per request would drown the progress output
+
+        return Handler
+
+    def is_done(self) -> bool:
+        """ Whether no job is claimable nor held by a worker anymore. """
+        # Received jobs stay claimed (their lease renewed by `run`) until the workbook is saved
+        with self._table_lock:
+            received = len(self._received)
+        return self.job_store.claimable() == 0 and self.job_store.in_progress() <= received
+
+    def claim(self, worker_id: str, limit: int) -> dict:
+        offer_ids = self.job_store.claim(worker_id, limit)
+        return {"offer_ids": offer_ids, "done": not offer_ids and self.is_done()}
+
+    def report(self, result: dict) -> dict:
+        """ Record the outcome of one offer, appending its variants to the output table. """
+        offer_id, status = result["offer_id"], result["status"]
+        variants = decode_variants(result["variants"]) if status == PARSED else None
+        with self._table_lock:
+            if offer_id in self._received:
+                # A late report from a worker whose lease had expired: the offer is already in
+                # the table, a failure must not release it to be crawled again
+                return {"ok": True}
+            if status != PARSED:
+                self.job_store.mark(offer_id, status, result.get("error"))
+                print(f"Worker {result['worker']}: product {offer_id} {status}.")
+                return {"ok": True}
+            self.written += self.table.append_rows(variants)
+            self._received[offer_id] = None
+            self.job_store.mark(offer_id, PARSED)
+        print(f"Worker {result['worker']}: wrote {len(variants)} variants of product {offer_id}.")
+        return {"ok": True}
+
+    def run(self, poll_interval: float = 1.0) -> int:
+        """ Serve workers until every job is finished, then save the workbook.
+
+        Returns:
+            int: The number of variant rows written.
+        """
+        thread = threading.Thread(target=self.server.serve_forever, name="coordinator", daemon=True)
+        thread.start()
+        print(f"Coordinator listening on {self.url}")
+        try:
+            renewed_at = time.monotonic()
+            while not self.is_done():
+                time.sleep(poll_interval)
+                if time.monotonic() - renewed_at > self.job_store.lease / 3:
+                    # Results are only final once saved: keep them from being handed out again
+                    with self._table_lock:
+                        self.job_store.renew(list(self._received))
+                    renewed_at = time.monotonic()
+            with self._table_lock:
+                self.table.save(self.output_path)
+                self.job_store.mark_many(list(self._received), WRITTEN)
+            print(f"Wrote {self.written} variant rows to '{self.output_path}'. Jobs: {self.job_store.counts()}")
+            # Keep answering "done" for a moment, so idle workers learn they can stop
+            time.sleep(self.linger)
+        finally:
+            self.server.shutdown()
+            self.server.server_close()
+            self.table.close()
+        return self.written
+
+def run_worker(
+    coordinator_url: str,
+    crawler: WebCrawler | None = None,
+    parser: PageParser | None = None,
+    worker_id: str | None = None,
+    batch_size: int = 8,
+    poll_interval: float = 2.0,
+    report_attempts: int = 3
+) -> int:
+    """
+    Crawl the offers handed out by a `Coordinator` until it has no work left.
+
+    Each worker runs its own `WebCrawler` (and so its own rate limiting, from its own IP) and
+    `PageParser`, and sends the parsed variants back to the coordinator. A result that cannot
+    be sent after `report_attempts` tries stops the worker: its jobs go to other workers once
+    their leases expire.
+
+    Returns:
+        int: The number of offers this worker reported as parsed.
+    """
+    crawler = crawler or WebCrawler()
+    parser = parser or crawler.platform.create_parser(compact=True)
+    worker_id = worker_id or default_worker_id()
+    session = requests.Session()
+
+    def post(path: str, payload: dict) -> dict:
+        response = session.post(coordinator_url + path, json=payload, timeout=60)
+        response.raise_for_status()
+        return response.json()
+
+    def report(result: dict) -> bool:
+        """ Send the result of one offer, retrying on errors. Returns whether it was received. """
+        for attempt in range(1, report_attempts + 1):
+            try:
+                post("/result", result)
+                return True
+            except requests.RequestException as e:
+                print(f"Could not report product {result['offer_id']} (attempt {attempt} of {report_attempts}): {e!r}")
+                if attempt < report_attempts:
+                    time.sleep(poll_interval)
+        return False
+
+    parsed = 0
+    try:
+        while True:
+            try:
+                reply = post("/claim", {"worker": worker_id, "limit": batch_size})
+            except requests.ConnectionError:
+                print(f"Coordinator {coordinator_url} is gone, stopping.")
+                break
+            if reply["done"]:
+                break
+            if not reply["offer_ids"]:
+                # Other workers hold the remaining jobs: wait for failures to retry
+                time.sleep(poll_interval)
+                continue
+            for offer_id in reply["offer_ids"]:
+                result = {"worker": worker_id, "offer_id": offer_id}
+                html = crawler.fetch_html(offer_id)
+                if html is None:
+                    result.update(status=BLOCKED if offer_id in crawler.blocked else FAILED, error="fetch failed")
+                else:
+                    try:
+                        variants = parser.parse(html)
+                    except Exception as e:
+                        variants, result["error"] = None, str(e)
+                    if variants:
+                        result.update(status=PARSED, variants=encode_variants(variants))
+                    else:
+                        result.update(status=FAILED, error=result.get("error", "no variants"))
+                if not report(result):
+                    print(f"Coordinator {coordinator_url} is unreachable, stopping.")
+                    return parsed
+                if result["status"] == PARSED:
+                    parsed += 1
+    finally:
+        session.close()
+        parser.description_fetcher.close()
+    return parsed
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Distributed crawl: one coordinator, many workers.")
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+
+    coordinator_parser = commands.add_parser("coordinator", help="Hand out offer IDs and write the merged workbook.")
+    coordinator_parser.add_argument("offer_ids", help="File with one offer ID per line, or - for stdin.")
+    coordinator_parser.add_argument("output", help="Path of the workbook to write.")
+    coordinator_parser.add_argument("--template", default=DEFAULT_TEMPLATE, help="Marketplace template workbook.")
+    coordinator_parser.add_argument("--jobs", default="jobs.sqlite3", help="Path of the job database.")
+    coordinator_parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on (0.0.0.0 for remote workers).")
+    coordinator_parser.add_argument("--port", type=int, default=8765, help="Port to listen on.")
+
+    worker_parser = commands.add_parser("worker", help="Crawl offers handed out by a coordinator.")
+    worker_parser.add_argument("url", help="Coordinator URL, e.g. http://10.0.0.5:8765")
+    worker_parser.add_argument("--platform", default=DEFAULT_PLATFORM, help="Platform the offer IDs belong to.")
+    worker_parser.add_argument("--batch-size", type=int, default=8, help="Offers claimed at once.")
+    worker_parser.add_argument("--cache", default=None, help="Path of the HTML cache database.")
+    worker_parser.add_argument("--identities", type=int, default=0, help="Spread requests over this many sessions (cookies, User-Agent, proxy).")
+    worker_parser.add_argument("--proxies", default=None, help="File with one proxy URL per line, assigned to the identities.")
+    args = arg_parser.parse_args(argv)
+
+    if args.command == "coordinator":
+        from pipeline import read_offer_ids
+        job_store = JobStore(args.jobs)
+        job_store.add(read_offer_ids(args.offer_ids))
+        Coordinator(args.output, job_store, args.template, args.host, args.port).run()
+        job_store.close()
+    else:
+        identity_pool = None
+        if args.identities:
+            proxies = load_proxies(args.proxies) if args.proxies else None
+            identity_pool = IdentityPool(args.identities, proxies=proxies, session_factory=WebCrawler._new_session)
+        crawler = WebCrawler(
+            cache=HtmlCache(args.cache) if args.cache else None, identity_pool=identity_pool, platform=args.platform
+        )
+        parsed = run_worker(args.url, crawler=crawler, batch_size=args.batch_size)
+        if crawler.cache is not None:
+            crawler.cache.close()
+        print(f"Parsed {parsed} offers.")
+
+if __name__ == "__main__":
+    main()
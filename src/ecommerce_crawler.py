@@ -0,0 +1,162 @@
+import argparse
+import json
+import os
+import sys
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(SRC_DIR, "crawlers"))
+sys.path.insert(0, os.path.join(SRC_DIR, "excel_processor"))
+
+# Only the standard library is imported up front: requests, bs4, lxml and openpyxl are imported
+# by the commands that use them, so short jobs (splitting a workbook, checking one offer) do not
+# pay for the others. `benchmarks/suite.py --only startup` checks this.
+from platforms import DEFAULT_PLATFORM, registry as platform_registry
+
+DEFAULT_TEMPLATE = os.path.join(SRC_DIR, "..", "Costumes.xlsx")
+
+def read_variants(path: str):
+    """ Lazily read variant dicts from a JSON lines file, or stdin for "-". """
+    f = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+def crawl(args):
+    """ The whole pipeline, see `pipeline.main`. """
+    from pipeline import main as crawl_main
+    crawl_main(args.args, prog="ecommerce-crawler crawl")
+
+def parse(args):
+    """ Parse saved pages, or fetch and parse offers, into one JSON line per variant. """
+    # One platform per run: --platform, else the one of the first page URL, else the default
+    key = args.platform
+    if key is None:
+        urls = [source for source in args.sources if "://" in source and not os.path.isfile(source)]
+        key = (platform_registry.key_for_url(urls[0]) if urls else None) or DEFAULT_PLATFORM
+    platform = platform_registry.get(key)
+    parser = platform.create_parser(fetch_description=args.description)
+    crawler = None
+    dataset = out = None
+    if args.dataset:
+        from variant_dataset import VariantDatasetWriter
+        dataset = VariantDatasetWriter(args.dataset)
+    else:
+        out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    parsed = 0
+    try:
+        for source in args.sources:
+            if os.path.isfile(source):
+                with open(source, "rb") as f:
+                    html = f.read()
+            else:
+                if crawler is None:
+                    from crawler_1688 import WebCrawler
+                    from html_cache import HtmlCache
+                    crawler = WebCrawler(
+                        cache=HtmlCache(args.cache) if args.cache else None, offline=args.offline, platform=platform
+                    )
+                try:
+                    offer_id = platform.offer_id(source)
+                except ValueError:
+                    print(f"Skipping '{source}', not an offer page of {platform.key}.", file=sys.stderr)
+                    continue
+                html = crawler.fetch_html(offer_id)
+                if html is None:
+                    print(f"Could not fetch '{source}'.", file=sys.stderr)
+                    continue
+            variants = parser.parse(html)
+            if not variants:
+                print(f"No variants found in '{source}'.", file=sys.stderr)
+            if dataset is not None:
+                dataset.write(source if os.path.isfile(source) else offer_id, variants)
+            else:
+                for variant in variants:
+                    out.write(json.dumps(variant, ensure_ascii=False) + "\n")
+            parsed += 1
+    finally:
+        if dataset is not None:
+            dataset.close()
+        elif out is not sys.stdout:
+            out.close()
+        if crawler is not None and crawler.cache is not None:
+            crawler.cache.close()
+    print(f"Parsed {parsed} of {len(args.sources)} pages.", file=sys.stderr)
+
+def write(args):
+    """ Write variants read from JSON lines, or from a dataset written by `parse --dataset`, into the marketplace template. """
+    from product_table import StreamingProductTable
+    from table_columns import columns
+    table_columns, start_row = columns, 7
+    if args.template_cache:
+        from template_registry import TemplateRegistry
+        schema = TemplateRegistry(args.template_cache).get(args.template)
+        table_columns, start_row = schema.columns, schema.start_row
+    from variant_dataset import VariantDataset, dataset_format
+    table = StreamingProductTable(args.template, start_row=start_row, table_columns=table_columns)
+    dataset = None
+    if args.variants != "-" and dataset_format(args.variants) is not None:
+        dataset = VariantDataset(args.variants)
+        variants = dataset.iter_rows(table.row_mapper)
+    else:
+        variants = read_variants(args.variants)
+    try:
+        if args.validate:
+            from validation import BatchValidator
+            variants = BatchValidator(table_columns).validate(list(variants)).rows
+        written = table.append_rows(variants)
+        table.save(args.output)
+    finally:
+        table.close()
+        if dataset is not None:
+            dataset.close()
+    print(f"Wrote {written} variant rows to '{args.output}'.")
+
+def split(args):
+    """ One workbook per visible sheet, see `test_split.split_excel_skip_hidden`. """
+    from test_split import split_excel_skip_hidden
+    split_excel_skip_hidden(args.workbook, args.output_dir, args.workers)
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(prog="ecommerce-crawler", description="Crawl offers, parse their pages and export them to marketplace workbooks.")
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+
+    # Options are those of pipeline.py, parsed there: `crawl --help` lists them
+    crawl_parser = commands.add_parser("crawl", help="Crawl offers and write their variants to the template.", add_help=False)
+    crawl_parser.set_defaults(run=crawl)
+
+    parse_parser = commands.add_parser("parse", help="Parse offer pages into variants, as JSON lines.")
+    parse_parser.add_argument("sources", nargs="+", help="Saved HTML pages, or offer IDs and page URLs to fetch.")
+    parse_parser.add_argument("-o", "--output", default="-", help="File to write the variants to, - for stdout.")
+    parse_parser.add_argument("--platform", default=None, help=f"Platform of the pages and offer IDs, among {', '.join(platform_registry.keys())}. Detected from the first page URL by default.")
+    parse_parser.add_argument("--dataset", default=None, help="Save the variants to this columnar dataset (.arrow, .parquet or .jsonl) instead.")
+    parse_parser.add_argument("--description", action="store_true", help="Also fetch the product descriptions.")
+    parse_parser.add_argument("--cache", default=None, help="Path of the HTML cache database.")
+    parse_parser.add_argument("--offline", action="store_true", help="Serve pages from the cache only.")
+    parse_parser.set_defaults(run=parse)
+
+    write_parser = commands.add_parser("write", help="Write variants from JSON lines to the template.")
+    write_parser.add_argument("variants", help="JSON lines file of variants or dataset, as written by `parse`, or - for stdin.")
+    write_parser.add_argument("output", help="Path of the workbook to write.")
+    write_parser.add_argument("--template", default=DEFAULT_TEMPLATE, help="Marketplace template workbook.")
+    write_parser.add_argument("--template-cache", default=None, help="Directory caching the layout read from the template.")
+    write_parser.add_argument("--validate", action="store_true", help="Validate and coerce the variants before writing them.")
+    write_parser.set_defaults(run=write)
+
+    split_parser = commands.add_parser("split", help="Split a workbook into one file per visible sheet.")
+    split_parser.add_argument("workbook", help="The .xlsx file to split.")
+    split_parser.add_argument("output_dir", nargs="?", default=".", help="Directory of the split files.")
+    split_parser.add_argument("--workers", type=int, default=None, help="Threads writing the files.")
+    split_parser.set_defaults(run=split)
+
+    args, extra = arg_parser.parse_known_args(argv)
+    if extra and args.run is not crawl:
+        arg_parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    args.args = extra
+    args.run(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+import bisect
+import hashlib
+import json
+import math
+import os
+import re
+import time
+from table_columns import columns
+
+try:
+    import numpy
+except ImportError:  # optional, only speeds up pricing of large batches
+    numpy = None
+
+# Key under which `PageParser` leaves the 1688 price of a SKU, in CNY.
+SOURCE_PRICE_KEY = "(Colombia) Price in US"
+
+# Key the source price is moved to once priced. Private, so the tables ignore it: the source
+# key would otherwise land in the same column as the Colombia price.
+PRICED_SOURCE_KEY = "_source_price"
+
+_PRICE_COLUMN = re.compile(r"^\((.+)\) Price in US\$$")
+
+def price_columns(table_columns: dict = columns) -> dict:
+    """ Country -> name of its price column, e.g. "Brazil" -> "(Brazil) Price in US$". """
+    countries = {}
+    for name in table_columns:
+        match = _PRICE_COLUMN.match(name)
+        if match:
+            countries[match.group(1)] = name
+    return countries
+
+# Rates files read so far: path -> (modification time, rates)
+_rates_cache = {}
+
+def load_rates(path: str, max_age: float | None = 7 * 24 * 3600) -> dict:
+    """
+    Read exchange rates from a local JSON file, cached in memory until the file changes.
+
+    The file looks like `{"base": "USD", "rates": {"CNY": 7.12, ...}, "updated_at": <epoch>}`,
+    each rate being the number of units of the currency worth one unit of `base`.
+
+    Args:
+        path (str): The path to the rates file.
+        max_age (float): Warn when `updated_at` is older than this many seconds. None to never warn.
+
+    Returns:
+        dict: The parsed file.
+    """
+    mtime = os.path.getmtime(path)
+    cached = _rates_cache.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with open(path, encoding="utf-8") as f:
+        rates = json.load(f)
+    updated_at = rates.get("updated_at")
+    if max_age is not None and updated_at is not None and time.time() - updated_at > max_age:
+        print(f"Exchange rates in '{path}' are {(time.time() - updated_at) / 86400:.0f} days old.")
+    _rates_cache[path] = (mtime, rates)
+    return rates
+
+class CountryPricing:
+    """
+    How the price of one country is derived from the converted cost of a SKU.
+
+    The cost in USD is marked up according to tiers (e.g. a larger margin on cheap items),
+    then grossed up so that the marketplace's fees (a fixed amount plus a share of the price)
+    are covered: `price = (cost * (1 + markup) + fixed_fee) / (1 - fee_rate)`.
+    """
+
+    def __init__(self, country: str, markup_tiers: list | None = None, fee_rate: float = 0.0, fixed_fee: float = 0.0):
+        """
+        Args:
+            country (str): The country, as it appears in the price column name.
+            markup_tiers (list): `(minimum cost in USD, markup)` pairs; the markup of the highest
+                tier at or below the cost applies. Defaults to no markup.
+            fee_rate (float): Share of the final price taken by the marketplace, e.g. 0.13.
+            fixed_fee (float): Fee per sale, in USD.
+        """
+        if not 0 <= fee_rate < 1:
+            raise ValueError(f"The fee rate of {country} must be in [0, 1), got {fee_rate}.")
+        self.country = country
+        self.markup_tiers = sorted(markup_tiers or [(0.0, 0.0)])
+        self.fee_rate = fee_rate
+        self.fixed_fee = fixed_fee
+
+    @classmethod
+    def from_dict(cls, country: str, data: dict) -> "CountryPricing":
+        return cls(
+            country, [tuple(tier) for tier in data.get("markup_tiers", [])] or None,
+            data.get("fee_rate", 0.0), data.get("fixed_fee", 0.0)
+        )
+
+    def affine(self) -> list:
+        """ Per tier, `(minimum cost, scale, offset)` such that `price = cost * scale + offset`. """
+        keep = 1.0 - self.fee_rate
+        return [(minimum, (1.0 + markup) / keep, self.fixed_fee / keep) for minimum, markup in self.markup_tiers]
+
+class PricingEngine:
+    """
+    Computes every country's USD price for a whole batch of SKUs at once.
+
+    The price of a country is an affine function of the cost on each markup tier, so a batch
+    is priced with one multiply-add per tier over the column of costs, rounded half up to
+    cents, instead of evaluating the rules SKU by SKU. With numpy installed the column is a
+    numpy array; without, the same arithmetic runs as list comprehensions.
+    """
+
+    def __init__(
+        self,
+        rates: dict,
+        countries: list | None = None,
+        source_currency: str = "CNY",
+        source_key: str = SOURCE_PRICE_KEY,
+        table_columns: dict = columns
+    ):
+        """
+        Args:
+            rates (dict): Exchange rates, as returned by `load_rates`.
+            countries (list): The `CountryPricing` of each country to price. Defaults to every
+                price column of `table_columns`, with no markup nor fees.
+            source_currency (str): The currency of the SKU prices read from the variants.
+            source_key (str): The variant key holding the SKU price.
+            table_columns (dict): The columns of the product table, see `table_columns.columns`.
+        """
+        base = rates.get("base", "USD")
+        usd_per_base = 1.0 if base == "USD" else rates["rates"]["USD"]
+        # One unit of the source currency, in USD
+        self.rate = usd_per_base / rates["rates"][source_currency] if source_currency != base else usd_per_base
+        self.source_key = source_key
+        columns_by_country = price_columns(table_columns)
+        countries = countries or [CountryPricing(country) for country in columns_by_country]
+        self._rules = []
+        for pricing in countries:
+            column = columns_by_country.get(pricing.country)
+            if column is None:
+                raise ValueError(f"No price column for '{pricing.country}' in the product table.")
+            # Scaled to cents, plus a half cent, so flooring the result rounds half up
+            self._rules.append((column, [(minimum, scale * 100, offset * 100 + 0.5) for minimum, scale, offset in pricing.affine()]))
+
+    @property
+    def signature(self) -> str:
+        """ Identifies the rate and rules, e.g. to tell that prices must be recomputed. """
+        return hashlib.sha256(json.dumps([self.rate, self._rules]).encode("utf-8")).hexdigest()[:16]
+
+    @classmethod
+    def from_files(cls, rates_path: str, rules_path: str | None = None, **kwargs) -> "PricingEngine":
+        """ An engine reading its rates from `rates_path` and its country rules from a JSON file
+        like `{"Brazil": {"markup_tiers": [[0, 0.8], [20, 0.5]], "fee_rate": 0.16, "fixed_fee": 1.0}}`. """
+        countries = None
+        if rules_path is not None:
+            with open(rules_path, encoding="utf-8") as f:
+                countries = [CountryPricing.from_dict(country, data) for country, data in json.load(f).items()]
+        return cls(load_rates(rates_path), countries, **kwargs)
+
+    def price_costs(self, costs) -> dict:
+        """ Price a column of SKU costs, in the source currency.
+
+        Returns:
+            dict: Price column name -> list of prices. None where the cost is missing or zero, which
+                leaves the price cell empty: the product is then not listed in that country.
+        """
+        if numpy is not None:
+            return self._price_numpy(costs)
+        return self._price_python(costs)
+
+    def _price_numpy(self, costs) -> dict:
+        usd = numpy.array([numpy.nan if cost is None else cost for cost in costs], dtype=float) * self.rate
+        missing = ~(usd > 0)  # NaN compares false
+        prices = {}
+        for column, tiers in self._rules:
+            if len(tiers) == 1:
+                _, scale, offset = tiers[0]
+                result = usd * scale + offset
+            else:
+                minimums = numpy.array([minimum for minimum, _, _ in tiers])
+                tier = numpy.clip(numpy.searchsorted(minimums, usd, side="right") - 1, 0, len(tiers) - 1)
+                result = usd * numpy.array([scale for _, scale, _ in tiers])[tier] + numpy.array([offset for _, _, offset in tiers])[tier]
+            result = numpy.floor(result) / 100
+            values = result.tolist()
+            if missing.any():
+                values = [None if gap else value for value, gap in zip(values, missing.tolist())]
+            prices[column] = values
+        return prices
+
+    def _price_python(self, costs) -> dict:
+        rate, floor = self.rate, math.floor
+        usd = [cost * rate if cost is not None and cost > 0 else None for cost in costs]
+        prices = {}
+        for column, tiers in self._rules:
+            if len(tiers) == 1:
+                _, scale, offset = tiers[0]
+                prices[column] = [None if cost is None else floor(cost * scale + offset) / 100 for cost in usd]
+                continue
+            minimums = [minimum for minimum, _, _ in tiers]
+            affine = [(scale, offset) for _, scale, offset in tiers]
+            values = []
+            for cost in usd:
+                if cost is None:
+                    values.append(None)
+                    continue
+                scale, offset = affine[max(bisect.bisect_right(minimums, cost) - 1, 0)]
+                values.append(floor(cost * scale + offset) / 100)
+            prices[column] = values
+        return prices
+
+    def apply(self, variants):
+        """ Fill in the price columns of a batch of variants, in place.
+
+        The source price is moved to `PRICED_SOURCE_KEY`, so it is kept (e.g. in datasets) but
+        never written into a price column, even one of a country that is not priced.
+
+        Args:
+            variants: A `VariantBatch` (the prices become per-SKU columns) or a list of variant dicts.
+
+        Returns:
+            The same variants.
+        """
+        batch_columns = getattr(variants, "columns", None)
+        if batch_columns is not None:
+            if self.source_key in batch_columns:
+                costs = batch_columns[PRICED_SOURCE_KEY] = batch_columns.pop(self.source_key)
+                batch_columns.update(self.price_costs(costs))
+            return variants
+        costs = []
+        for variant in variants:
+            cost = variant.pop(self.source_key, None)
+            variant[PRICED_SOURCE_KEY] = cost
+            costs.append(cost)
+        prices = self.price_costs(costs)
+        for column, values in prices.items():
+            for variant, value in zip(variants, values):
+                variant[column] = value
+        return variants
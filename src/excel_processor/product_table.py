@@ -1,4 +1,7 @@
-import openpyxl
+import re
+import shutil
+import tempfile
+import zipfile
 from enum import Enum, auto
 from table_columns import TableColumn, columns
 
@@ -19,18 +22,99 @@ class TableColumn:
         self.data_type = data_type
         self.choices = choices
 
+class RowMapper:
+    """
+    Turns variant dicts into positional row tuples laid out like the `columns` dictionary.
+
+    The column-name -> position mapping is computed once. Keys are matched exactly first, then
+    by a normalized form (case, spacing and a trailing "$" are ignored), so the parser's
+    "(Colombia) Price in US" lands in the "(Colombia) Price in US$" column. Keys that match no
+    column are skipped, with a warning the first time unless they start with "_" (private
+    annotations such as the pending description URL).
+    """
+
+    def __init__(self, table_columns: dict = columns):
+        self.width = max(column.col_index for column in table_columns.values())
+        self._normalized = {self._normalize(name): column.col_index - 1 for name, column in table_columns.items()}
+        self._positions = {name: column.col_index - 1 for name, column in table_columns.items()}
+
+    @staticmethod
+    def _normalize(name: str) -> str:
+        return " ".join(name.lower().split()).rstrip("$").rstrip()
+
+    def position_of(self, key: str) -> int | None:
+        """ The 0-based column position of a variant key, or None if it matches no column. """
+        try:
+            return self._positions[key]
+        except KeyError:
+            position = self._normalized.get(self._normalize(key))
+            if position is None and not key.startswith("_"):
+                print(f"Ignoring '{key}': no such column in the product table.")
+            self._positions[key] = position
+            return position
+
+    def to_row(self, variant: dict) -> list:
+        """ Lay a variant out as a row: one slot per column, None where nothing is written.
+
+        Rows that are already positional (lists or tuples, e.g. from `BatchValidator`) are
+        returned as they are.
+        """
+        if isinstance(variant, (list, tuple)):
+            return variant
+        row = [None] * self.width
+        positions = self._positions
+        for key, value in variant.items():
+            position = positions[key] if key in positions else self.position_of(key)
+            if position is not None:
+                row[position] = value
+        return row
+
+    def to_rows(self, variants):
+        """ Lay many variants out as rows, see `to_row`.
+
+        A `VariantBatch` (anything with `shared` fields and per-variant `columns`) is laid out
+        without building a dict per variant: its shared fields are mapped once into a base row,
+        which is then copied and completed with each variant's own fields.
+
+        Returns:
+            iterator: The rows, in order.
+        """
+        shared = getattr(variants, "shared", None)
+        if shared is None:
+            return map(self.to_row, variants)
+        base = self.to_row(shared)
+        fields = [(self.position_of(key), values) for key, values in variants.columns.items()]
+        fields = [(position, values) for position, values in fields if position is not None]
+        if not fields:
+            return (base.copy() for _ in range(len(variants)))
+        positions = [position for position, _ in fields]
+        return self._complete_rows(base, positions, zip(*[values for _, values in fields]))
+
+    @staticmethod
+    def _complete_rows(base: list, positions: list, records):
+        for record in records:
+            row = base.copy()
+            for position, value in zip(positions, record):
+                row[position] = value
+            yield row
+
 class ProductTable:
     
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, start_row: int = 7, table_columns: dict = columns):
         """ Initialize the ProductTable by loading the workbook and selecting the active sheet.
         
         Args:
             file_path (str): The path to the Excel file.
+            start_row (int): The first data row.
+            table_columns (dict): The column layout, e.g. from a `TemplateSchema`.
         """
-        self.start_row = 7
+        self.start_row = start_row
         self.current_row = self.start_row
+        import openpyxl  # only this table loads the workbook; StreamingProductTable never imports it
         self.workbook = openpyxl.load_workbook(file_path)
         self.sheet = self.workbook.active  # or specify a sheet name: self.workbook['Sheet1']
+        self.columns = table_columns
+        self.row_mapper = RowMapper(table_columns)
     
     def write_cell(self, row: int, column_name: str, value):
         """ Write a value to a specific cell in the product table.
@@ -40,13 +124,59 @@ class ProductTable:
             column_name (str): The name of the column as defined in the `columns` dictionary.
             value: The value to write to the cell.
         """
-        if column_name not in columns:
+        if column_name not in self.columns:
             raise ValueError(f"Column '{column_name}' is not defined in the product table.")
 
-        col = columns[column_name].col_index
+        col = self.columns[column_name].col_index
         cell = self.sheet.cell(row=row, column=col)
         cell.value = value
         
+    def append_rows(self, variants, batch_size: int = 1000) -> int:
+        """ Append variants as rows, in batches of `batch_size` rows.
+
+        Each variant dict is turned into a positional row by the table's `RowMapper`, so the
+        column lookup is done once per key instead of once per cell.
+
+        Args:
+            variants (iterable): Variant dicts, column name -> value, or a `VariantBatch`.
+            batch_size (int): Number of rows mapped and written at once.
+
+        Returns:
+            int: The number of rows written.
+        """
+        cell = self.sheet.cell
+        written = 0
+        batch = []
+        for row in self.row_mapper.to_rows(variants):
+            batch.append(row)
+            if len(batch) < batch_size:
+                continue
+            written += self._write_batch(batch, cell)
+            batch = []
+        if batch:
+            written += self._write_batch(batch, cell)
+        return written
+
+    def append_dataset(self, path: str) -> int:
+        """ Append every row of a dataset written by `variant_dataset.VariantDatasetWriter`,
+        streamed from the memory-mapped file one record batch at a time.
+
+        Returns:
+            int: The number of rows written.
+        """
+        from variant_dataset import VariantDataset
+        with VariantDataset(path) as dataset:
+            return self.append_rows(dataset.iter_rows(self.row_mapper))
+
+    def _write_batch(self, batch: list, cell) -> int:
+        first_row = self.current_row
+        self.current_row += len(batch)
+        for row_number, row in enumerate(batch, first_row):
+            for col, value in enumerate(row, 1):
+                if value is not None:
+                    cell(row=row_number, column=col, value=value)
+        return len(batch)
+
     def save(self, file_path: str):
         """ Save the workbook to the specified file path.
         
@@ -63,4 +193,255 @@ class ProductTable:
         """
         current = self.current_row
         self.current_row += 1
-        return current
\ No newline at end of file
+        return current
+
+# Control characters that are not allowed in XML text.
+_ILLEGAL_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_XML_SPECIAL_CHARS = re.compile(r"[&<>\x00-\x08\x0b\x0c\x0e-\x1f]")
+_ROW_START = re.compile(r'<row\b[^>]*?\br="(\d+)"')
+_CELL = re.compile(r'<c\b[^>]*?\br="([A-Z]+)\d+"[^>]*?(?:/>|>.*?</c>)', re.S)
+_COL = re.compile(r'<col\b([^>]*)/?>')
+_XML_ATTR = re.compile(r'(\w+)="([^"]*)"')
+
+class StreamingProductTable:
+    """
+    A write-only product table that streams rows to disk instead of holding them in a workbook.
+
+    The template is never loaded into openpyxl. On `save`, its zip parts are copied as they are,
+    except the active sheet: its XML is rewritten with the template's header rows (everything
+    before `start_row`), then the appended rows, then the rest of the original sheet (merged
+    cells, data validations, conditional formatting...). Rows are written as inline strings to
+    a temporary file as they are appended, so memory stays constant whatever the row count.
+
+    Formula cells of the template's first data row (e.g. the auto-filled "Number of characters"
+    and "Selling Fee" columns) are repeated on every appended row.
+    """
+
+    def __init__(self, file_path: str, start_row: int = 7, table_columns: dict = columns):
+        """ Initialize the table from a template workbook.
+
+        Args:
+            file_path (str): The path to the Excel template file.
+            start_row (int): The first data row; rows above it are kept as the header.
+            table_columns (dict): The column layout, e.g. from a `TemplateSchema`.
+        """
+        self.template_path = file_path
+        self.start_row = start_row
+        self.current_row = self.start_row
+        self._sheet_part = self._find_active_sheet_part()
+        with zipfile.ZipFile(file_path) as template:
+            sheet_xml = template.read(self._sheet_part).decode("utf-8")
+        self._head, self._row_template, self._tail = self._split_sheet(sheet_xml)
+        self.row_mapper = RowMapper(table_columns)
+        self._slots = self._build_slots(sheet_xml)
+        self._rows = tempfile.TemporaryFile()
+        self._buffer = []
+
+    def _find_active_sheet_part(self) -> str:
+        """ Resolve the zip part name of the workbook's active sheet. """
+        with zipfile.ZipFile(self.template_path) as template:
+            workbook_xml = template.read("xl/workbook.xml").decode("utf-8")
+            rels_xml = template.read("xl/_rels/workbook.xml.rels").decode("utf-8")
+        active = re.search(r'activeTab="(\d+)"', workbook_xml)
+        sheets = re.findall(r'<sheet\b([^>]*)/?>', workbook_xml)
+        sheet_attrs = dict(_XML_ATTR.findall(sheets[int(active.group(1)) if active else 0]))
+        rel_id = sheet_attrs["id"]  # r:id, the namespace prefix is dropped by the pattern
+        for rel in re.findall(r'<Relationship\b([^>]*)/?>', rels_xml):
+            rel_attrs = dict(_XML_ATTR.findall(rel))
+            if rel_attrs.get("Id") == rel_id:
+                target = rel_attrs["Target"]
+                return target.lstrip("/") if target.startswith("/") else "xl/" + target
+        raise ValueError(f"Could not find the active sheet of '{self.template_path}'.")
+
+    def _split_sheet(self, sheet_xml: str) -> tuple:
+        """ Split the sheet XML into the header part, the first data row and the trailing part. """
+        if "<sheetData/>" in sheet_xml or "<sheetData />" in sheet_xml:
+            head, tail = re.split(r"<sheetData\s*/>", sheet_xml, maxsplit=1)
+            return head + "<sheetData>", "", "</sheetData>" + tail
+
+        data_end = sheet_xml.index("</sheetData>")
+        data_start = data_end
+        row_template = ""
+        for match in _ROW_START.finditer(sheet_xml, 0, data_end):
+            if int(match.group(1)) >= self.start_row:
+                data_start = match.start()
+                if int(match.group(1)) == self.start_row:
+                    row_template = sheet_xml[data_start:sheet_xml.index("</row>", data_start) + len("</row>")]
+                break
+        return sheet_xml[:data_start], row_template, sheet_xml[data_end:]
+
+    def _build_slots(self, sheet_xml: str) -> list:
+        """
+        Precompute, for every column in order, how to render a cell of an appended row.
+
+        Returns:
+            list: `(position, cell_prefix, formula_head, formula_tail)` per column. `position`
+                is the slot of the column in a `RowMapper` row (or None if no `columns` entry
+                is written there) and `cell_prefix` the start of its `<c>` tag up to the row
+                number. `formula_head` and `formula_tail` surround the row number in the
+                template formula cell of that column (or None).
+        """
+        col_styles = {}
+        cols = re.search(r"<cols>(.*?)</cols>", sheet_xml, re.S)
+        for col in _COL.findall(cols.group(1) if cols else ""):
+            attrs = dict(_XML_ATTR.findall(col))
+            if "style" in attrs:
+                for index in range(int(attrs["min"]), int(attrs["max"]) + 1):
+                    col_styles[index] = attrs["style"]
+
+        formulas = {}
+        for match in _CELL.finditer(self._row_template):
+            if "<f>" in match.group(0) or "<f " in match.group(0):
+                letter = match.group(1)
+                head, tail = match.group(0).split(f'r="{letter}{self.start_row}"', 1)
+                formulas[letter] = (f'{head}r="{letter}', f'"{tail}')
+
+        last = max([self.row_mapper.width] + [self._column_index(letter) for letter in formulas])
+        slots = []
+        for index in range(1, last + 1):
+            letter = self._column_letter(index)
+            position = index - 1 if index <= self.row_mapper.width else None
+            formula_head, formula_tail = formulas.get(letter, (None, None))
+            if position is None and formula_head is None:
+                continue
+            style = f' s="{col_styles[index]}"' if index in col_styles else ""
+            slots.append((position, f'<c r="{letter}', style, formula_head, formula_tail))
+        return slots
+
+    @staticmethod
+    def _xml_text(value: str) -> str:
+        """ Escape a cell text, dropping characters XML cannot carry. Most texts need nothing. """
+        if _XML_SPECIAL_CHARS.search(value) is None:
+            return value
+        return _ILLEGAL_XML_CHARS.sub("", value).replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+    @staticmethod
+    def _column_index(letter: str) -> int:
+        index = 0
+        for char in letter:
+            index = index * 26 + ord(char) - 64
+        return index
+
+    @staticmethod
+    def _column_letter(index: int) -> str:
+        letters = ""
+        while index:
+            index, remainder = divmod(index - 1, 26)
+            letters = chr(65 + remainder) + letters
+        return letters
+
+    def append_row(self, values: dict) -> int:
+        """ Append one row to the table.
+
+        Args:
+            values (dict): Column name -> value, matched to columns by the table's `RowMapper`.
+                None values are skipped.
+
+        Returns:
+            int: The row number (1-indexed) the values were written to.
+        """
+        return self._append_positional(self.row_mapper.to_row(values))
+
+    def append_rows(self, variants) -> int:
+        """ Append variants as rows.
+
+        Args:
+            variants (iterable): Variant dicts, column name -> value, or a `VariantBatch`.
+
+        Returns:
+            int: The number of rows written.
+        """
+        written = 0
+        for row in self.row_mapper.to_rows(variants):
+            self._append_positional(row)
+            written += 1
+        return written
+
+    def append_dataset(self, path: str) -> int:
+        """ Append every row of a dataset written by `variant_dataset.VariantDatasetWriter`,
+        streamed from the memory-mapped file one record batch at a time.
+
+        Returns:
+            int: The number of rows written.
+        """
+        from variant_dataset import VariantDataset
+        with VariantDataset(path) as dataset:
+            return self.append_rows(dataset.iter_rows(self.row_mapper))
+
+    def _append_positional(self, values: list) -> int:
+        row = self.acquire_new_row()
+        row_ref = str(row)
+        cells = [f'<row r="{row_ref}">']
+        append = cells.append
+        xml_text = self._xml_text
+        # Hot path: one pass over the precomputed slots, no per-cell method calls
+        for position, prefix, style, formula_head, formula_tail in self._slots:
+            value = values[position] if position is not None else None
+            if value is None:
+                if formula_head is not None:
+                    append(formula_head + row_ref + formula_tail)
+                continue
+            kind = type(value)
+            if kind is str:
+                append(f'{prefix}{row_ref}"{style} t="inlineStr"><is><t xml:space="preserve">{xml_text(value)}</t></is></c>')
+            elif kind is int or kind is float:
+                append(f'{prefix}{row_ref}"{style}><v>{value!r}</v></c>')
+            elif kind is bool:
+                append(f'{prefix}{row_ref}"{style} t="b"><v>{int(value)}</v></c>')
+            else:
+                append(f'{prefix}{row_ref}"{style} t="inlineStr"><is><t xml:space="preserve">{xml_text(str(value))}</t></is></c>')
+        append("</row>")
+        self._buffer.append("".join(cells))
+        if len(self._buffer) >= 1000:
+            self._flush()
+        return row
+
+    def _flush(self):
+        self._rows.write("".join(self._buffer).encode("utf-8"))
+        self._buffer.clear()
+
+    def acquire_new_row(self) -> int:
+        """ Acquire the next available row for data entry.
+
+        Returns:
+            int: The next available row number (1-indexed).
+        """
+        current = self.current_row
+        self.current_row += 1
+        return current
+
+    def save(self, file_path: str):
+        """ Assemble the output workbook from the template and the streamed rows.
+
+        Args:
+            file_path (str): The path to save the workbook.
+        """
+        last_row = max(self.current_row - 1, self.start_row - 1)
+        head = re.sub(
+            r'(<dimension ref="[A-Z]+\d+:[A-Z]+)\d+(")', lambda m: f"{m.group(1)}{last_row}{m.group(2)}", self._head, count=1
+        )
+        self._flush()
+        self._rows.flush()
+        with zipfile.ZipFile(self.template_path) as template, \
+                zipfile.ZipFile(file_path, "w", zipfile.ZIP_DEFLATED) as output:
+            for item in template.infolist():
+                if item.filename == "xl/calcChain.xml":
+                    continue  # points at the template's formula cells; Excel rebuilds it
+                if item.filename != self._sheet_part:
+                    data = template.read(item.filename)
+                    if item.filename in ("[Content_Types].xml", "xl/_rels/workbook.xml.rels"):
+                        data = re.sub(rb'<(Override|Relationship)\b[^>]*calcChain[^>]*/>', b"", data)
+                    output.writestr(item, data)
+                    continue
+                sheet_info = zipfile.ZipInfo(item.filename, item.date_time)
+                sheet_info.compress_type = zipfile.ZIP_DEFLATED
+                with output.open(sheet_info, "w", force_zip64=True) as sheet:
+                    sheet.write(head.encode("utf-8"))
+                    self._rows.seek(0)
+                    shutil.copyfileobj(self._rows, sheet, 1024 * 1024)
+                    sheet.write(self._tail.encode("utf-8"))
+        self._rows.seek(0, 2)
+
+    def close(self):
+        """ Discard the streamed rows. """
+        self._rows.close()
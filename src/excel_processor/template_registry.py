@@ -0,0 +1,214 @@
+import hashlib
+import json
+import os
+import re
+from collections import Counter
+from table_columns import TableColumn, columns
+
+# Bump when the extraction below changes, so older cache files are not reused.
+SCHEMA_VERSION = 2
+
+_DATA_TYPES = {"str": str, "int": int, "float": float}
+_REQUIRED_MARK = re.compile(r"\*|\(\*Required\)")
+
+class TemplateSchema:
+    """ The layout of a category template: its columns, as in `table_columns`, and first data row. """
+
+    def __init__(self, template_hash: str, sheet_name: str, start_row: int, columns: dict):
+        self.template_hash = template_hash
+        self.sheet_name = sheet_name
+        self.start_row = start_row
+        self.columns = columns
+
+    def to_dict(self) -> dict:
+        return {
+            "version": SCHEMA_VERSION,
+            "template_hash": self.template_hash,
+            "sheet_name": self.sheet_name,
+            "start_row": self.start_row,
+            "columns": [
+                {
+                    "col_name": column.col_name, "col_index": column.col_index,
+                    "optional": column.optional, "auto_fill": column.auto_fill,
+                    "data_type": column.data_type.__name__, "choices": column.choices,
+                }
+                for column in self.columns.values()
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "TemplateSchema":
+        columns = {}
+        for column in data["columns"]:
+            column = dict(column, data_type=_DATA_TYPES[column["data_type"]])
+            columns[column["col_name"]] = TableColumn(**column)
+        return cls(data["template_hash"], data["sheet_name"], data["start_row"], columns)
+
+class TemplateRegistry:
+    """
+    Reads the layout of category template workbooks once and caches it on disk.
+
+    The first time a template is seen, its active sheet is loaded with openpyxl and the column
+    map is read from the header row (grouped headers such as the per-country prices become
+    "(Colombia) Price in US$"). Choices come from the list data validations, data types from
+    the numeric ones, auto-filled columns are the formula cells of the first data row and the
+    start row is where the data validations begin. What the workbook does not say is taken from
+    the hand-written `columns`, see `read_template_schema`. The result is stored as JSON in `cache_dir`,
+    keyed by the SHA-256 of the template, so later runs only hash the file.
+    """
+
+    def __init__(self, cache_dir: str = ".template_cache"):
+        """
+        Args:
+            cache_dir (str): Directory of the cache files, created on first use.
+        """
+        self.cache_dir = cache_dir
+        self._schemas = {}
+
+    def get(self, template_path: str) -> TemplateSchema:
+        """ The schema of a template, from memory, the cache directory, or read from the workbook. """
+        with open(template_path, "rb") as f:
+            template_hash = hashlib.sha256(f.read()).hexdigest()
+        schema = self._schemas.get(template_hash)
+        if schema is not None:
+            return schema
+
+        cache_path = os.path.join(self.cache_dir, f"{template_hash}.v{SCHEMA_VERSION}.json")
+        try:
+            with open(cache_path, encoding="utf-8") as f:
+                schema = TemplateSchema.from_dict(json.load(f))
+        except (FileNotFoundError, ValueError, KeyError, TypeError) as e:
+            # A truncated or hand-edited cache file, or one of another layout: read the template again
+            if not isinstance(e, FileNotFoundError):
+                print(f"Ignoring invalid template cache '{cache_path}': {e!r}")
+            schema = read_template_schema(template_path, template_hash)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Write then rename, so a concurrent reader never sees a partial file
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(schema.to_dict(), f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, cache_path)
+        self._schemas[template_hash] = schema
+        return schema
+
+def _header_text(value) -> str:
+    """ The column name in a header cell: its first line, without the required mark or hint. """
+    name = _REQUIRED_MARK.sub("", str(value).strip().splitlines()[0]).strip()
+    # "Title: inform product, brand, model..." -> "Title", but keep "Varies in: Size"
+    label, _, hint = name.partition(": ")
+    return label.strip() if len(hint.split()) > 3 else name
+
+def _group_text(value) -> str:
+    """ The name of a group header, e.g. "Mexico \\nFulfillment" -> "Mexico Fulfillment". """
+    return " ".join(str(value).split())
+
+def _find_header_row(sheet) -> int:
+    """ The first row filling at least half of the sheet's columns. """
+    for row in sheet.iter_rows(min_row=1, max_row=min(sheet.max_row, 50)):
+        if sum(cell.value is not None for cell in row) * 2 >= sheet.max_column:
+            return row[0].row
+    raise ValueError(f"Could not find the header row of sheet '{sheet.title}'.")
+
+def _list_choices(workbook, formula: str | None) -> list | None:
+    """ The values allowed by a list data validation: inline ("a,b,c") or a range of another sheet.
+    A range that cannot be resolved, e.g. on a sheet missing from the workbook, raises ValueError. """
+    if not formula:
+        return None
+    if formula.startswith('"'):
+        return [choice.strip() for choice in formula.strip('"').split(",") if choice.strip()]
+    sheet_name, _, cell_range = formula.rpartition("!")
+    sheet_name = sheet_name.strip("'").replace("''", "'")
+    if sheet_name not in workbook.sheetnames:
+        raise ValueError(f"sheet '{sheet_name}' is not in the workbook")
+    choices = []
+    cells = workbook[sheet_name][cell_range.replace("$", "")]
+    for row in cells if isinstance(cells, tuple) else ((cells,),):
+        for cell in row if isinstance(row, tuple) else (row,):
+            if cell.value is not None:
+                choices.append(cell.value)
+    return choices or None
+
+def _is_integral(value) -> bool:
+    try:
+        return float(value).is_integer()
+    except (TypeError, ValueError):
+        return False
+
+def read_template_schema(template_path: str, template_hash: str = "", known_columns: dict = columns) -> TemplateSchema:
+    """ Read the schema of a template workbook's active sheet, see `TemplateRegistry`.
+
+    Templates often leave things out: lists pointing at a sheet missing from the file, required
+    columns without the required mark, formula columns without a type. For the columns also in
+    `known_columns`, the missing choices and types are taken from there, and a column required
+    by either stays required. Unresolved lists are reported.
+    """
+    import openpyxl
+    from openpyxl.utils import range_boundaries
+    workbook = openpyxl.load_workbook(template_path)
+    sheet = workbook.active
+    header_row = _find_header_row(sheet)
+
+    # Group headers are merged across the columns they group, named by the row below
+    groups = {}
+    for merged in sheet.merged_cells.ranges:
+        if merged.min_row == header_row and merged.max_row == header_row and merged.max_col > merged.min_col:
+            group = _group_text(sheet.cell(header_row, merged.min_col).value)
+            for col in range(merged.min_col, merged.max_col + 1):
+                groups[col] = group
+
+    # Data validations give the start row, numeric types and choices of the columns they cover
+    start_rows = Counter()
+    validations = {}
+    for validation in sheet.data_validations.dataValidation:
+        for cell_range in validation.sqref.ranges:
+            min_col, min_row, max_col, _ = range_boundaries(cell_range.coord)
+            start_rows[min_row] += 1
+            for col in range(min_col, max_col + 1):
+                validations.setdefault(col, validation)
+    start_row = start_rows.most_common(1)[0][0] if start_rows else header_row + (2 if groups else 1)
+
+    columns = {}
+    for col in range(1, sheet.max_column + 1):
+        header = sheet.cell(header_row, col).value
+        if col in groups:
+            sub_header = sheet.cell(header_row + 1, col).value
+            if sub_header is None:
+                continue
+            name = f"({groups[col]}) {_header_text(sub_header)}"
+            required = bool(_REQUIRED_MARK.search(str(sub_header)))
+        elif header is not None:
+            name = _header_text(header)
+            required = bool(_REQUIRED_MARK.search(str(header)))
+        else:
+            continue
+
+        first_value = sheet.cell(start_row, col).value
+        auto_fill = isinstance(first_value, str) and first_value.startswith("=")
+        known = known_columns.get(name)
+        data_type, choices = str, None
+        validation = validations.get(col)
+        if validation is None and auto_fill and known is not None:
+            data_type = known.data_type
+        if validation is not None:
+            if validation.type == "list":
+                try:
+                    choices = _list_choices(workbook, validation.formula1)
+                except (ValueError, KeyError) as e:
+                    fallback = "using the known choices" if known is not None else "no choices checked"
+                    print(f"Column '{name}' of '{template_path}': could not read its list {validation.formula1} ({e}), {fallback}.")
+                    choices = known.choices if known is not None else None
+            elif validation.type == "whole":
+                data_type = int
+            elif validation.type == "decimal":
+                # An integral range (e.g. 0 to 99999) is used for counts, otherwise amounts
+                bounded = validation.operator in (None, "between") and validation.formula2 is not None
+                integral = bounded and _is_integral(validation.formula1) and _is_integral(validation.formula2)
+                data_type = int if integral else float
+        if known is not None and not known.optional:
+            required = True
+        columns[name] = TableColumn(
+            col_name=name, col_index=col, optional=not required and not auto_fill,
+            auto_fill=auto_fill, data_type=data_type, choices=choices,
+        )
+    workbook.close()
+    return TemplateSchema(template_hash, sheet.title, start_row, columns)
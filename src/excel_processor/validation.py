@@ -0,0 +1,159 @@
+from product_table import RowMapper
+from table_columns import columns
+
+class RowError:
+    def __init__(self, row: int, col_name: str, value, message: str):
+        self.row = row
+        self.col_name = col_name
+        self.value = value
+        self.message = message
+
+    def __repr__(self):
+        return f"Row {self.row}, column '{self.col_name}': {self.message} (got {self.value!r})"
+
+class ValidationResult:
+    def __init__(self, rows: list, errors: list):
+        self.rows = rows
+        self.errors = errors
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def errors_by_row(self) -> dict:
+        """ Group the errors by the index of the row (within the batch) they were found in. """
+        report = {}
+        for error in self.errors:
+            report.setdefault(error.row, []).append(error)
+        return report
+
+    def summary(self) -> dict:
+        """ Count the errors per column and message, e.g. to print after a batch. """
+        counts = {}
+        for error in self.errors:
+            key = (error.col_name, error.message)
+            counts[key] = counts.get(key, 0) + 1
+        return counts
+
+class _CompiledColumn:
+    """ The checks of one `TableColumn`, applied to a whole column of a batch at once. """
+
+    def __init__(self, column, position: int):
+        self.col_name = column.col_name
+        self.position = position
+        self.data_type = column.data_type
+        self.required = not column.optional and not column.auto_fill
+        # Choices are matched case-insensitively and repaired to their canonical spelling
+        self.choices = {str(choice).lower(): choice for choice in column.choices} if column.choices else None
+
+    def _coerce(self, value):
+        """
+        Returns:
+            tuple: `(coerced value, None)`, or `(None, error message)` if the value is invalid.
+        """
+        if value is None or value == "":
+            return None, "required value is missing" if self.required else None
+
+        data_type = self.data_type
+        kind = type(value)
+        # Fast path: most values already have the declared type
+        if kind is data_type and data_type is not float:
+            cast = value
+        else:
+            try:
+                if data_type is float:
+                    cast = round(float(value), 2)
+                elif data_type is int:
+                    if kind is bool:
+                        raise ValueError
+                    as_float = float(value)
+                    if not as_float.is_integer():
+                        raise ValueError
+                    cast = int(as_float)
+                else:
+                    cast = data_type(value)
+            except (TypeError, ValueError):
+                return None, f"not a valid {data_type.__name__}"
+
+        if self.choices is not None:
+            canonical = self.choices.get(str(cast).lower())
+            if canonical is None:
+                return None, f"not one of {list(self.choices.values())}"
+            cast = canonical
+        return cast, None
+
+    def apply(self, values: list, errors: list) -> list:
+        """ Coerce a whole column, appending a `RowError` per invalid value to `errors`. """
+        kinds = set(map(type, values))
+        if len(kinds) > 2 or (len(kinds) == 2 and type(None) not in kinds):
+            return self._apply_mixed(values, errors)
+
+        # Homogeneous column: coerce each distinct value once, then map the column through
+        # the results. Columns such as Gender or units only have a handful of distinct values.
+        try:
+            distinct = set(values)
+        except TypeError:
+            # Unhashable values (lists, dicts) cannot be shared either
+            return self._apply_mixed(values, errors)
+        coerced = {}
+        failures = {}
+        for value in distinct:
+            cast, message = self._coerce(value)
+            if message is None:
+                coerced[value] = cast
+            else:
+                failures[value] = message
+        if failures:
+            for row, value in enumerate(values):
+                if value in failures:
+                    errors.append(RowError(row, self.col_name, value, failures[value]))
+        get = coerced.get
+        return [get(value, value) for value in values]
+
+    def _apply_mixed(self, values: list, errors: list) -> list:
+        """ Slow path for columns mixing value types or holding unhashable values, coercing every value on its own. """
+        out = []
+        for row, value in enumerate(values):
+            cast, message = self._coerce(value)
+            if message is not None:
+                errors.append(RowError(row, self.col_name, value, message))
+                cast = value
+            out.append(cast)
+        return out
+
+class BatchValidator:
+    """
+    Validation and coercion engine compiled from the `columns` schema.
+
+    A batch is turned into positional rows, transposed, and every column is checked and coerced
+    in a single pass over its values: type casting (with prices rounded to 2 decimals),
+    choice checking and required-field checking. Auto-filled columns are left untouched.
+    """
+
+    def __init__(self, table_columns: dict = columns):
+        self.row_mapper = RowMapper(table_columns)
+        self._columns = [
+            _CompiledColumn(column, column.col_index - 1)
+            for column in table_columns.values() if not column.auto_fill
+        ]
+
+    def validate(self, variants) -> ValidationResult:
+        """ Validate and coerce a batch of variants.
+
+        Args:
+            variants (iterable): Variant dicts (column name -> value), a `VariantBatch` or
+                positional rows.
+
+        Returns:
+            ValidationResult: The coerced positional rows, ready for `append_rows`, and the
+                errors found. Values that cannot be coerced are kept as they were.
+        """
+        rows = list(self.row_mapper.to_rows(variants))
+        if not rows:
+            return ValidationResult([], [])
+        errors = []
+        table = list(map(list, zip(*rows)))
+        for column in self._columns:
+            table[column.position] = column.apply(table[column.position], errors)
+        errors.sort(key=lambda error: error.row)
+        return ValidationResult([list(row) for row in zip(*table)], errors)
@@ -0,0 +1,300 @@
+import json
+import mmap
+import os
+from product_table import RowMapper
+from table_columns import columns
+
+try:
+    import orjson
+except ImportError:  # optional, only speeds up reading and writing JSON lines datasets
+    orjson = None
+
+# Column holding the offer each row comes from, ignored by the tables (private "_" key).
+OFFER_ID_KEY = "_offer_id"
+
+ARROW = "arrow"
+PARQUET = "parquet"
+JSONL = "jsonl"
+FORMATS = (ARROW, PARQUET, JSONL)
+_EXTENSIONS = {".arrow": ARROW, ".feather": ARROW, ".parquet": PARQUET, ".jsonl": JSONL}
+
+_ARROW_MAGIC = b"ARROW1"
+_PARQUET_MAGIC = b"PAR1"
+_TYPE_NAMES = {str: "string", int: "int64", float: "float64"}
+_TYPES = {name: data_type for data_type, name in _TYPE_NAMES.items()}
+
+def _pyarrow():
+    """ pyarrow, imported on first use since it costs more than the rest of a short job, or None. """
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:  # optional, datasets fall back to JSON lines without it
+        return None
+    return pyarrow
+
+def dataset_schema(table_columns: dict = columns) -> list:
+    """ The columns of a dataset: the offer ID, then every column of the table that is not auto-filled.
+
+    Returns:
+        list: `(column name, type name)` pairs, in table order, the type being one of "string",
+            "int64" and "float64".
+    """
+    schema = [(OFFER_ID_KEY, "string")]
+    for column in sorted(table_columns.values(), key=lambda column: column.col_index):
+        if not column.auto_fill:
+            schema.append((column.col_name, _TYPE_NAMES.get(column.data_type, "string")))
+    return schema
+
+def _coerce_column(name: str, data_type: type, values: list) -> list:
+    """ Cast a column to its declared type, so that it fits the typed Arrow column.
+
+    Values that cannot be cast (e.g. a text in a numeric column) are dropped with a warning,
+    use `BatchValidator` beforehand to report them row by row.
+    """
+    if all(value is None or type(value) is data_type for value in values):
+        return values
+    coerced = []
+    invalid = 0
+    for value in values:
+        if value is not None and type(value) is not data_type:
+            try:
+                if value == "":
+                    value = None
+                elif data_type is int:
+                    as_float = float(value)
+                    if not as_float.is_integer():
+                        raise ValueError
+                    value = int(as_float)
+                else:
+                    value = data_type(value)
+            except (TypeError, ValueError):
+                value = None
+                invalid += 1
+        coerced.append(value)
+    if invalid:
+        print(f"Dropped {invalid} value(s) of '{name}': not a valid {data_type.__name__}.")
+    return coerced
+
+def dataset_format(path: str) -> str | None:
+    """ The format of an existing dataset, from its first bytes, or None if it is not a dataset. """
+    with open(path, "rb") as f:
+        head = f.read(64)
+    if head.startswith(_ARROW_MAGIC):
+        return ARROW
+    if head.startswith(_PARQUET_MAGIC):
+        return PARQUET
+    if head.startswith(b'{"schema":'):
+        return JSONL
+    return None
+
+class VariantDatasetWriter:
+    """
+    Persists parsed variants as a columnar dataset, to export them again without re-parsing.
+
+    Variants are laid out on the product table's columns, like the table writers do, and
+    buffered column by column; every `batch_rows` rows the buffer is written as one record
+    batch. With pyarrow installed, the dataset is an Arrow IPC file (memory-mapped when read)
+    or a Parquet file, typed by `dataset_schema`. Without, it is a JSON lines file: a header
+    line with the schema, then one line per record batch mapping each column to its values.
+    """
+
+    def __init__(self, path: str, table_columns: dict = columns, format: str | None = None, batch_rows: int = 8192):
+        """
+        Args:
+            path (str): The dataset file. Written to a temporary file, moved in place on `close`.
+            table_columns (dict): The column layout the variants are read with and the schema
+                is generated from, see `dataset_schema`.
+            format (str): One of `FORMATS`. Defaults to the file extension, Arrow otherwise.
+                Arrow and Parquet fall back to JSON lines when pyarrow is not installed.
+            batch_rows (int): Number of rows per record batch.
+        """
+        format = format or _EXTENSIONS.get(os.path.splitext(path)[1].lower(), ARROW)
+        if format not in FORMATS:
+            raise ValueError(f"Unknown dataset format '{format}', expected one of {', '.join(FORMATS)}.")
+        self.pyarrow = _pyarrow() if format != JSONL else None
+        if format != JSONL and self.pyarrow is None:
+            print(f"pyarrow is not installed, writing '{path}' as JSON lines.")
+            format = JSONL
+        self.path = path
+        self.format = format
+        self.batch_rows = batch_rows
+        self.schema = dataset_schema(table_columns)
+        self.row_mapper = RowMapper(table_columns)
+        # Position of each schema column in the rows laid out by `row_mapper`
+        self._positions = [self.row_mapper.position_of(name) for name, _ in self.schema[1:]]
+        self._buffer = {name: [] for name, _ in self.schema}
+        self._buffered = 0
+        self.rows_written = 0
+        self._tmp_path = f"{path}.tmp"
+        if format == JSONL:
+            self._file = open(self._tmp_path, "wb")
+            self._file.write(self._dumps({"schema": self.schema}) + b"\n")
+        else:
+            pyarrow = self.pyarrow
+            self._arrow_schema = pyarrow.schema(
+                [(name, getattr(pyarrow, type_name)()) for name, type_name in self.schema],
+                metadata={"schema": json.dumps(self.schema)}
+            )
+            if format == PARQUET:
+                self._file = pyarrow.parquet.ParquetWriter(self._tmp_path, self._arrow_schema)
+            else:
+                self._file = pyarrow.ipc.new_file(self._tmp_path, self._arrow_schema)
+
+    @staticmethod
+    def _dumps(data) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(data)
+        return json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+    def write(self, offer_id: str, variants) -> int:
+        """ Add the variants of one offer.
+
+        Args:
+            offer_id (str): The offer the variants come from, kept in the `OFFER_ID_KEY` column.
+            variants (iterable): Variant dicts or a `VariantBatch`, as returned by `PageParser.parse`.
+
+        Returns:
+            int: The number of rows added.
+        """
+        buffers = [self._buffer[name] for name, _ in self.schema[1:]]
+        added = 0
+        for row in self.row_mapper.to_rows(variants):
+            for values, position in zip(buffers, self._positions):
+                values.append(row[position] if position is not None else None)
+            added += 1
+        self._buffer[OFFER_ID_KEY].extend([offer_id] * added)
+        self._buffered += added
+        if self._buffered >= self.batch_rows:
+            self._flush()
+        return added
+
+    def _flush(self):
+        if not self._buffered:
+            return
+        batch = {
+            name: _coerce_column(name, _TYPES[type_name], self._buffer[name])
+            for name, type_name in self.schema
+        }
+        if self.format == JSONL:
+            self._file.write(self._dumps(batch) + b"\n")
+        else:
+            arrays = [self.pyarrow.array(batch[field.name], type=field.type) for field in self._arrow_schema]
+            self._file.write_batch(self.pyarrow.record_batch(arrays, schema=self._arrow_schema))
+        self.rows_written += self._buffered
+        self._buffer = {name: [] for name, _ in self.schema}
+        self._buffered = 0
+
+    def close(self):
+        """ Write the buffered rows and move the finished dataset in place. If that fails, the
+        temporary file is removed instead. """
+        if self._file is None:
+            return
+        try:
+            try:
+                self._flush()
+            finally:
+                self._file.close()
+                self._file = None
+        except BaseException:
+            os.remove(self._tmp_path)
+            raise
+        os.replace(self._tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class VariantDataset:
+    """
+    Reads a dataset written by `VariantDatasetWriter`, one record batch at a time.
+
+    The file is memory-mapped: Arrow batches are read in place without copying the file into
+    memory, and JSON lines batches are decoded straight from the mapping, so rebuilding a
+    large workbook only holds one batch at a time.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.format = dataset_format(path)
+        if self.format is None:
+            raise ValueError(f"'{path}' is not a variant dataset.")
+        self.pyarrow = None
+        if self.format != JSONL:
+            self.pyarrow = _pyarrow()
+            if self.pyarrow is None:
+                raise ValueError(f"Reading the {self.format} dataset '{path}' requires pyarrow.")
+        if self.format == JSONL:
+            self._file = open(path, "rb")
+            self._source = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.schema = [tuple(column) for column in json.loads(self._source.readline())["schema"]]
+            return
+        self._file = None
+        self._source = self.pyarrow.memory_map(path)
+        if self.format == ARROW:
+            self._reader = self.pyarrow.ipc.open_file(self._source)
+            metadata = self._reader.schema.metadata
+        else:
+            self._reader = self.pyarrow.parquet.ParquetFile(self._source)
+            metadata = self._reader.schema_arrow.metadata
+        self.schema = [tuple(column) for column in json.loads(metadata[b"schema"])]
+
+    def iter_batches(self):
+        """
+        Yields:
+            dict: Column name -> list of values, one record batch at a time.
+        """
+        if self.format == JSONL:
+            self._source.seek(0)
+            self._source.readline()  # the schema
+            loads = orjson.loads if orjson is not None else json.loads
+            for line in iter(self._source.readline, b""):
+                yield loads(line)
+        elif self.format == ARROW:
+            for index in range(self._reader.num_record_batches):
+                yield self._reader.get_batch(index).to_pydict()
+        else:
+            for batch in self._reader.iter_batches():
+                yield batch.to_pydict()
+
+    def iter_variants(self):
+        """ Yields the rows as variant dicts, without their empty values, e.g. to validate or price them again. """
+        for batch in self.iter_batches():
+            names = list(batch)
+            for values in zip(*batch.values()):
+                yield {name: value for name, value in zip(names, values) if value is not None}
+
+    def iter_rows(self, row_mapper: RowMapper | None = None):
+        """ Yields the rows laid out for a product table, ready for its `append_rows`.
+
+        Args:
+            row_mapper (RowMapper): The layout of the table. The dataset's columns are matched to
+                it by name, so a dataset can be exported to another template. Defaults to `columns`.
+        """
+        row_mapper = row_mapper or RowMapper()
+        width = row_mapper.width
+        fields = [(row_mapper.position_of(name), name) for name, _ in self.schema]
+        fields = [(position, name) for position, name in fields if position is not None]
+        positions = [position for position, _ in fields]
+        for batch in self.iter_batches():
+            for values in zip(*[batch[name] for _, name in fields]):
+                row = [None] * width
+                for position, value in zip(positions, values):
+                    row[position] = value
+                yield row
+
+    def close(self):
+        if self._source is not None:
+            self._reader = None
+            self._source.close()
+            if self._file is not None:
+                self._file.close()
+            self._source = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,498 @@
+import argparse
+import asyncio
+import itertools
+import os
+import queue
+import sys
+import threading
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(SRC_DIR, "crawlers"))
+sys.path.insert(0, os.path.join(SRC_DIR, "excel_processor"))
+
+from crawler_1688 import AsyncWebCrawler
+from fingerprint_store import CHANGED, NEW, REMOVED, FingerprintStore
+from html_cache import HtmlCache
+from image_checker import ImageChecker, ThumbnailStore
+from identity_pool import IdentityPool, load_proxies
+from job_store import BLOCKED, FAILED, FETCHED, PARSED, WRITTEN, JobStore, default_worker_id
+from metrics import ROW_WRITE, metrics
+from page_parser import OFFER_FINGERPRINT_KEY, PageParser
+from platforms import DEFAULT_PLATFORM, registry as platform_registry
+from pricing import PricingEngine
+from product_table import StreamingProductTable
+from table_columns import columns
+from template_registry import TemplateRegistry
+from validation import BatchValidator
+from variant_dataset import VariantDatasetWriter
+
+DEFAULT_TEMPLATE = os.path.join(SRC_DIR, "..", "Costumes.xlsx")
+
+# Marks the end of a stage's output on its queue.
+_DONE = object()
+
+def read_offer_ids(path: str):
+    """ Lazily read offer IDs from a text file (one per line, `#` comments allowed), or stdin for "-". """
+    f = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        for line in f:
+            offer_id = line.split("#", 1)[0].strip()
+            if offer_id:
+                yield offer_id
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+def _drain(q: queue.Queue):
+    """ Iterate over a stage queue until the upstream stage signals it is done. """
+    return iter(q.get, _DONE)
+
+def _put(q: queue.Queue, item, stop: threading.Event) -> bool:
+    """ Put an item on a stage queue, giving up once `stop` is set: the consumer may be gone.
+
+    Returns:
+        bool: Whether the item was queued.
+    """
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+def _platform_offer_ids(platform, items):
+    """ The offer IDs of input lines, IDs or page URLs, skipping the URLs of other platforms. """
+    for item in items:
+        try:
+            yield platform.offer_id(item)
+        except ValueError:
+            print(f"Skipping '{item}', not an offer page of {platform.key}.")
+
+def _collect(offer_ids, into: set):
+    """ Pass offer IDs through, adding each one to `into`. """
+    for offer_id in offer_ids:
+        into.add(offer_id)
+        yield offer_id
+
+def _free_output_path(output_path: str) -> str:
+    """ `output_path` if it does not exist yet, otherwise the first free `<name>.partN<ext>`. """
+    if not os.path.exists(output_path):
+        return output_path
+    stem, ext = os.path.splitext(output_path)
+    part = 2
+    while os.path.exists(f"{stem}.part{part}{ext}"):
+        part += 1
+    return f"{stem}.part{part}{ext}"
+
+def _offer_fingerprint(variants, salt: str = "") -> str | None:
+    """ The fingerprint `PageParser(fingerprint=True)` left in the product-level fields, combined
+    with `salt`, e.g. the pricing signature so that new rates make every offer change. """
+    shared = getattr(variants, "shared", None)
+    record = shared if shared is not None else (variants[0] if variants else {})
+    fingerprint = record.get(OFFER_FINGERPRINT_KEY)
+    return f"{fingerprint}:{salt}" if fingerprint and salt else fingerprint
+
+def _skip_unchanged(parsed_pages, fingerprints: FingerprintStore, seen_offers: list, unchanged_offers: list, salt: str = ""):
+    """ Drop the offers whose data did not change since the last run, before their descriptions
+    are fetched, listing them in `unchanged_offers`. Every offer still listed goes to `seen_offers`. """
+    for offer_id, variants in parsed_pages:
+        if variants:
+            seen_offers.append(offer_id)
+            if fingerprints.is_unchanged(offer_id, _offer_fingerprint(variants, salt)):
+                print(f"Product {offer_id} is unchanged, skipping it.")
+                unchanged_offers.append(offer_id)
+                continue
+        yield offer_id, variants
+
+class _Stage(threading.Thread):
+    """ A pipeline stage running in its own thread, always closing its output queue.
+
+    A stage that fails records its error in `errors` and sets `stop`, which makes the other
+    stages give up instead of blocking on queues nobody reads any more.
+    """
+
+    def __init__(self, name: str, target, out_q: queue.Queue, stop: threading.Event, errors: list):
+        super().__init__(name=name, daemon=True)
+        self._target = target
+        self.out_q = out_q
+        self.stop = stop
+        self.errors = errors
+
+    def run(self):
+        try:
+            self._target()
+        except BaseException as e:
+            self.errors.append(e)
+            self.stop.set()
+        finally:
+            while True:
+                try:
+                    self.out_q.put(_DONE, timeout=0.1)
+                    break
+                except queue.Full:
+                    if self.stop.is_set():
+                        # The run is failing: drop what is left unread so the consumer wakes up
+                        while not self.out_q.empty():
+                            self.out_q.get_nowait()
+
+def run_pipeline(
+    offer_ids_source,
+    output_path: str,
+    template_path: str = DEFAULT_TEMPLATE,
+    crawler: AsyncWebCrawler | None = None,
+    parser: PageParser | None = None,
+    processes: int | None = None,
+    with_description: bool = True,
+    validate: bool = False,
+    template_registry: TemplateRegistry | None = None,
+    job_store: JobStore | None = None,
+    fingerprints: FingerprintStore | None = None,
+    remove_missing: bool = False,
+    image_checker: ImageChecker | None = None,
+    pricing: PricingEngine | None = None,
+    dataset: VariantDatasetWriter | None = None,
+    checkpoint_every: int = 0,
+    queue_size: int = 64
+) -> int:
+    """
+    Crawl offers, parse them and write the variants into the marketplace template.
+
+    The stages (fetch -> parse -> describe -> write) run concurrently and are connected by
+    bounded queues: a slow stage blocks the ones before it instead of letting work pile up in
+    memory, so the input may be an arbitrarily long stream of offer IDs.
+
+    Args:
+        offer_ids_source: An iterable of offer IDs, or the path of a file listing them.
+        output_path (str): Where to save the filled workbook.
+        template_path (str): The marketplace template workbook to fill.
+        crawler (AsyncWebCrawler): Fetches the pages. A default one is created if not given.
+        parser (PageParser): Parses the pages. It must not fetch descriptions itself, that is
+            the job of the describe stage.
+        processes (int): Parser worker processes, None for one per CPU, 0 to parse in a thread.
+        with_description (bool): Fetch product descriptions for the `Description` column.
+        validate (bool): Check and coerce the variants against the column schema before writing
+            them, reporting the invalid values.
+        template_registry (TemplateRegistry): Read the column layout and start row from the
+            template itself instead of using the hand-written `columns`.
+        job_store (JobStore): Checkpoint the crawl. The offer IDs are added to the store and the
+            run works on the jobs it claims there, recording each one's progress, so a run that
+            dies can be resumed by running it again. The leases of the claimed jobs are renewed
+            until they are saved, so workers sharing the store never write an offer twice.
+            Offers are marked written once the output workbook is saved. An existing workbook
+            is never overwritten: the run saves to the first free `<output>.partN.xlsx`
+            instead, so resuming only adds a part.
+        fingerprints (FingerprintStore): Incremental mode. Offers whose data did not change since
+            the previous run are skipped before the describe and write stages, and the output is
+            a delta workbook holding only the new and changed SKUs, plus the removed ones with no
+            stock. The parser must be created with `fingerprint=True`.
+        remove_missing (bool): In incremental mode, also remove the SKUs of the stored offers
+            missing from the input. Only use it when the input is the whole catalog. Nothing is
+            removed if any offer failed or was blocked, or if the job store already knew some
+            of the offers: a resumed run only covers the offers it claims.
+        image_checker (ImageChecker): Check the product images concurrently, dropping the dead
+            and duplicate ones from `Photos` before writing.
+        pricing (PricingEngine): Compute every country's price from the 1688 price of each SKU.
+        dataset (VariantDatasetWriter): Also persist the variants of every written offer, before
+            validation, to export them again without re-crawling. Not available in incremental
+            mode, where unchanged offers never reach it. The caller closes it once the run is
+            over, failed or not.
+        checkpoint_every (int): With a job store, save the output in parts of this many
+            offers, each marked written once its part is saved, so a resumed run keeps the
+            parts already saved. 0 saves a single workbook at the end.
+        queue_size (int): Capacity of each queue between two stages.
+
+    Returns:
+        int: The number of variant rows written.
+    """
+    if dataset is not None and fingerprints is not None:
+        raise ValueError("A dataset cannot be written in incremental mode: it would miss the unchanged offers.")
+    if isinstance(offer_ids_source, str):
+        offer_ids_source = read_offer_ids(offer_ids_source)
+    crawler = crawler or AsyncWebCrawler()
+    parser = parser or crawler.platform.create_parser(fetch_description=False, compact=True, fingerprint=fingerprints is not None)
+    # Page URLs of the platform are accepted in place of offer IDs
+    offer_ids_source = _platform_offer_ids(crawler.platform, offer_ids_source)
+    remove_missing = remove_missing and fingerprints is not None
+    # Every offer of the input, fetched or not, is still listed: only the others are removed
+    listed_offers = set()
+    if remove_missing:
+        offer_ids_source = _collect(offer_ids_source, listed_offers)
+    worker_id = default_worker_id()
+    if job_store is not None:
+        added = job_store.add(offer_ids_source)
+        offer_ids_source = job_store.claimed(worker_id)
+        store_mark = job_store.mark
+        if remove_missing and added < len(listed_offers):
+            print("Not removing the missing offers: resuming from the job store, this run only covers the offers it claims.")
+            remove_missing = False
+    else:
+        store_mark = lambda offer_id, status, error=None: None
+    failed_offers = []
+
+    def mark(offer_id: str, status: str, error: str | None = None):
+        if status in (BLOCKED, FAILED):
+            failed_offers.append(offer_id)
+        store_mark(offer_id, status, error)
+
+    fetched_q = queue.Queue(maxsize=queue_size)
+    parsed_q = queue.Queue(maxsize=queue_size)
+    # Set when any stage fails, including the write stage on this thread
+    stop = threading.Event()
+    errors = []
+
+    def fetch():
+        async def produce():
+            async for offer_id, html in crawler.fetch_many(offer_ids_source):
+                if html is None:
+                    print(f"Skipping product {offer_id} due to fetch error.")
+                    status = BLOCKED if offer_id in crawler.blocked else FAILED
+                    await asyncio.to_thread(mark, offer_id, status, "fetch failed")
+                    continue
+                await asyncio.to_thread(mark, offer_id, FETCHED)
+                # Blocking put off the event loop, so a full queue pauses fetching only
+                if not await asyncio.to_thread(_put, fetched_q, (offer_id, html), stop):
+                    break
+        asyncio.run(produce())
+
+    def parse():
+        if processes == 0:
+            for offer_id, html in _drain(fetched_q):
+                variants = parser.parse(html)
+                mark(offer_id, PARSED)
+                if not _put(parsed_q, (offer_id, variants), stop):
+                    return
+            return
+        offer_ids = {}
+        def pages():
+            for index, (offer_id, html) in enumerate(_drain(fetched_q)):
+                if stop.is_set():
+                    return
+                offer_ids[index] = offer_id
+                yield html
+        for index, variants in parser.parse_many(pages(), processes):
+            offer_id = offer_ids.pop(index)
+            mark(offer_id, PARSED)
+            if not _put(parsed_q, (offer_id, variants), stop):
+                return
+
+    stages = [_Stage("fetch", fetch, fetched_q, stop, errors), _Stage("parse", parse, parsed_q, stop, errors)]
+
+    parsed_pages = _drain(parsed_q)
+    seen_offers = []
+    # Offers written, or with nothing to write: marked written once the output is saved
+    written_offers = []
+    salt = pricing.signature if pricing is not None else ""
+    if fingerprints is not None:
+        parsed_pages = _skip_unchanged(parsed_pages, fingerprints, seen_offers, written_offers, salt)
+    if with_description:
+        parsed_pages = parser.description_fetcher.fill_descriptions(parsed_pages)
+    if image_checker is not None:
+        parsed_pages = image_checker.check_images(parsed_pages)
+
+    if template_registry is not None:
+        schema = template_registry.get(template_path)
+        table_columns, start_row = schema.columns, schema.start_row
+    else:
+        table_columns, start_row = columns, 7
+    validator = BatchValidator(table_columns) if validate else None
+    table = StreamingProductTable(template_path, start_row=start_row, table_columns=table_columns)
+    written = 0
+    # The deltas of the part being written, and how many of `seen_offers` are committed
+    deltas = []
+    committed_seen = 0
+    parts = 0
+    changes = dict.fromkeys((NEW, CHANGED, REMOVED), 0)
+
+    def save_part():
+        nonlocal committed_seen, parts
+        path = _free_output_path(output_path) if job_store is not None else output_path
+        table.save(path)
+        parts += 1
+        if job_store is not None:
+            job_store.mark_many(written_offers, WRITTEN)
+            print(f"Saved {len(written_offers)} products to '{path}'.")
+        if fingerprints is not None:
+            fingerprints.commit(deltas, seen_offers[committed_seen:])
+            committed_seen = len(seen_offers)
+            for kind in changes:
+                changes[kind] += sum(len(delta.rows(kind)) for delta in deltas)
+        written_offers.clear()
+        deltas.clear()
+
+    def renew_leases():
+        # Jobs stay claimed until their part is saved, however long fetching or saving takes
+        while not stop.wait(job_store.lease / 3):
+            job_store.renew_claims(worker_id)
+
+    # Started once the output table is ready, so a bad template does not leave them running
+    for stage in stages:
+        stage.start()
+    lease_renewer = None
+    if job_store is not None:
+        lease_renewer = threading.Thread(target=renew_leases, name="leases", daemon=True)
+        lease_renewer.start()
+    try:
+        for offer_id, variants in parsed_pages:
+            if not variants:
+                print(f"No variants found or parsed for product {offer_id}.")
+                mark(offer_id, FAILED, "no variants")
+                continue
+            if pricing is not None:
+                pricing.apply(variants)
+            if dataset is not None:
+                dataset.write(offer_id, variants)
+            if fingerprints is not None:
+                delta = fingerprints.diff(offer_id, _offer_fingerprint(variants, salt), variants)
+                deltas.append(delta)
+                variants = delta.rows()
+                if not variants:
+                    written_offers.append(offer_id)
+                    continue
+            if validator is not None:
+                result = validator.validate(variants)
+                for (col_name, message), count in result.summary().items():
+                    print(f"Product {offer_id}: {count} value(s) of '{col_name}' {message}.")
+                variants = result.rows
+            with metrics.timer(ROW_WRITE):
+                written += table.append_rows(variants)
+            written_offers.append(offer_id)
+            print(f"Wrote {len(variants)} variants of product {offer_id}.")
+            if job_store is not None and checkpoint_every and len(written_offers) >= checkpoint_every:
+                save_part()
+                table.close()
+                table = StreamingProductTable(template_path, start_row=start_row, table_columns=table_columns)
+
+        # A failed stage may have ended the stream early: never save a partial output
+        if errors:
+            raise errors[0]
+        for stage in stages:
+            stage.join()
+        if errors:
+            raise errors[0]
+        if remove_missing and failed_offers:
+            print(f"Not removing the missing offers: {len(failed_offers)} offers failed or were blocked.")
+        elif remove_missing:
+            for delta in fingerprints.removed_offers(listed_offers):
+                deltas.append(delta)
+                written += table.append_rows(delta.rows())
+                print(f"Product {delta.offer_id} is no longer listed, removed its {len(delta.changes)} SKUs.")
+        if not parts or written_offers or deltas:
+            save_part()
+        if fingerprints is not None:
+            print(f"Delta: {changes[NEW]} new, {changes[CHANGED]} changed, {changes[REMOVED]} removed SKUs.")
+    finally:
+        # Stops the stages still running if this thread failed
+        stop.set()
+        table.close()
+        if lease_renewer is not None:
+            lease_renewer.join()
+        if job_store is not None:
+            # Jobs left unfinished (e.g. on Ctrl-C) are claimable again right away
+            job_store.release(worker_id)
+    return written
+
+def main(argv=None, prog=None):
+    arg_parser = argparse.ArgumentParser(prog=prog, description="Crawl offers and export their variants to the marketplace template.")
+    arg_parser.add_argument("offer_ids", help="File with one offer ID per line, or - for stdin.")
+    arg_parser.add_argument("output", help="Path of the workbook to write.")
+    arg_parser.add_argument("--template", default=DEFAULT_TEMPLATE, help="Marketplace template workbook.")
+    arg_parser.add_argument("--platform", default=None, help=f"Platform to crawl, among {', '.join(platform_registry.keys())}. Detected from the first page URL by default.")
+    arg_parser.add_argument("--max-per-host", type=int, default=4, help="Concurrent requests per host.")
+    arg_parser.add_argument("--processes", type=int, default=None, help="Parser processes (0 parses in a thread).")
+    arg_parser.add_argument("--no-description", action="store_true", help="Skip fetching product descriptions.")
+    arg_parser.add_argument("--validate", action="store_true", help="Validate and coerce the variants before writing them.")
+    arg_parser.add_argument("--template-cache", default=None, help="Directory caching the layout read from the template.")
+    arg_parser.add_argument("--jobs", default=None, help="Path of the job database, to checkpoint and resume the crawl.")
+    arg_parser.add_argument("--retry-failed", action="store_true", help="Give blocked and failed jobs new attempts.")
+    arg_parser.add_argument("--checkpoint-every", type=int, default=0, help="With --jobs, save the output in parts of this many products, so a resumed run keeps the saved parts.")
+    arg_parser.add_argument("--identities", type=int, default=0, help="Spread requests over this many sessions (cookies, User-Agent, proxy).")
+    arg_parser.add_argument("--proxies", default=None, help="File with one proxy URL per line, assigned to the identities.")
+    arg_parser.add_argument("--cache", default=None, help="Path of the HTML cache database.")
+    arg_parser.add_argument("--offline", action="store_true", help="Serve pages from the cache only.")
+    arg_parser.add_argument("--incremental", default=None, help="Path of the fingerprint database: only write new, changed and removed SKUs.")
+    arg_parser.add_argument("--remove-missing", action="store_true", help="With --incremental, remove the offers missing from this run's list.")
+    arg_parser.add_argument("--check-images", action="store_true", help="Drop dead and duplicate image URLs from Photos.")
+    arg_parser.add_argument("--image-hash-bytes", type=int, default=0, help="With --check-images, also deduplicate images whose first N bytes are identical.")
+    arg_parser.add_argument("--thumbnails", default=None, help="With --check-images, store a thumbnail of each valid image in this directory.")
+    arg_parser.add_argument("--rates", default=None, help="Exchange rates JSON file: compute every country's price in USD.")
+    arg_parser.add_argument("--pricing-rules", default=None, help="With --rates, JSON file of markup tiers and fees per country.")
+    arg_parser.add_argument("--dataset", default=None, help="Also save the variants to this columnar dataset (.arrow, .parquet or .jsonl), to export them again later.")
+    arg_parser.add_argument("--metrics-port", type=int, default=None, help="Serve Prometheus metrics on this port at /metrics.")
+    arg_parser.add_argument("--metrics-json", default=None, help="Periodically dump a metrics summary to this JSON file.")
+    arg_parser.add_argument("--metrics-interval", type=float, default=10.0, help="Seconds between two JSON metrics dumps.")
+    args = arg_parser.parse_args(argv)
+    if args.dataset and args.incremental:
+        arg_parser.error("--dataset cannot be combined with --incremental, which skips the unchanged offers.")
+
+    metrics_server = stop_dumping = None
+    if args.metrics_port is not None or args.metrics_json:
+        metrics.enabled = True
+    if args.metrics_port is not None:
+        metrics_server = metrics.serve(args.metrics_port)
+    if args.metrics_json:
+        stop_dumping = metrics.dump_periodically(args.metrics_json, args.metrics_interval)
+
+    cache = HtmlCache(args.cache) if args.cache else None
+    registry = TemplateRegistry(args.template_cache) if args.template_cache else None
+    job_store = JobStore(args.jobs) if args.jobs else None
+    fingerprints = FingerprintStore(args.incremental) if args.incremental else None
+    pricing = PricingEngine.from_files(args.rates, args.pricing_rules) if args.rates else None
+    image_checker = None
+    if args.check_images:
+        thumbnails = ThumbnailStore(args.thumbnails) if args.thumbnails else None
+        image_checker = ImageChecker(hash_bytes=args.image_hash_bytes, thumbnails=thumbnails)
+    if job_store is not None and args.retry_failed:
+        print(f"Requeued {job_store.retry_failed()} blocked or failed jobs.")
+    identity_pool = None
+    if args.identities:
+        proxies = load_proxies(args.proxies) if args.proxies else None
+        identity_pool = IdentityPool(args.identities, proxies=proxies, session_factory=AsyncWebCrawler._new_session)
+    offer_ids = read_offer_ids(args.offer_ids)
+    platform = args.platform
+    if platform is None:
+        first = next(offer_ids, None)
+        offer_ids = itertools.chain([first] if first is not None else [], offer_ids)
+        platform = (platform_registry.key_for_url(first) if first else None) or DEFAULT_PLATFORM
+    crawler = AsyncWebCrawler(
+        max_per_host=args.max_per_host, cache=cache, offline=args.offline, identity_pool=identity_pool,
+        platform=platform
+    )
+    dataset = VariantDatasetWriter(args.dataset) if args.dataset else None
+    try:
+        written = run_pipeline(
+            offer_ids, args.output, template_path=args.template, crawler=crawler,
+            processes=args.processes, with_description=not args.no_description,
+            validate=args.validate, template_registry=registry, job_store=job_store,
+            fingerprints=fingerprints, remove_missing=args.remove_missing, image_checker=image_checker,
+            pricing=pricing, dataset=dataset, checkpoint_every=args.checkpoint_every
+        )
+    finally:
+        if dataset is not None:
+            # Keeps the offers processed so far, and the temporary file is not left behind
+            dataset.close()
+    if image_checker is not None:
+        # Waits for the thumbnails still downloading
+        image_checker.close()
+    if job_store is None:
+        print(f"Wrote {written} variant rows to '{args.output}'.")
+    else:
+        # Saved to `args.output` or to new parts next to it, as reported along the way
+        print(f"Wrote {written} variant rows.")
+    if job_store is not None:
+        print(f"Jobs: {job_store.counts()}")
+        job_store.close()
+    if fingerprints is not None:
+        fingerprints.close()
+    if cache is not None:
+        cache.close()
+    if dataset is not None:
+        print(f"Saved {dataset.rows_written} variant rows to the dataset '{args.dataset}'.")
+    if stop_dumping is not None:
+        stop_dumping.set()
+        metrics.dump_json(args.metrics_json)
+    if metrics_server is not None:
+        metrics_server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -1,60 +1,168 @@
-import openpyxl
+import os
+import posixpath
+import re
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from html import unescape
 
-def split_excel_skip_hidden(file_path):
+_ATTRIBUTE = re.compile(r'([\w:]+)="([^"]*)"')
+_SHEET = re.compile(r'<sheet\b[^>]*?/>')
+_RELATIONSHIP = re.compile(r'<Relationship\b[^>]*?/>')
+_OVERRIDE = re.compile(r'<Override\b[^>]*?/>')
+_DEFINED_NAME = re.compile(r'<definedName\b([^>]*?)(?<!/)>.*?</definedName>|<definedName\b[^>]*?/>', re.S)
+_VIEW_TAB = re.compile(r'\s(?:activeTab|firstSheet)="\d+"')
+_CALC_CHAIN = "xl/calcChain.xml"
+
+def _attributes(element: str) -> dict:
+    return dict(_ATTRIBUTE.findall(element))
+
+def _sheet_rel_id(sheet: dict) -> str:
+    """ 工作表元素的关系 Id（通常是 r:id 属性，前缀可能不同）。 """
+    return next(value for name, value in sheet.items() if name.endswith(":id"))
+
+def _rels_path(part: str) -> str:
+    """ 某个部件对应的关系文件路径，例如 xl/workbook.xml -> xl/_rels/workbook.xml.rels """
+    folder, name = posixpath.split(part)
+    return posixpath.join(folder, "_rels", name + ".rels")
+
+def _relationships(parts: dict, part: str) -> list:
+    """ 返回部件的 (Id, 目标部件路径, 原始 XML 元素) 列表，外部链接不计入。 """
+    rels = parts.get(_rels_path(part))
+    if rels is None:
+        return []
+    relationships = []
+    for element in _RELATIONSHIP.findall(rels.decode("utf-8")):
+        attributes = _attributes(element)
+        if attributes.get("TargetMode") == "External":
+            continue
+        target = attributes["Target"]
+        if target.startswith("/"):
+            target = target.lstrip("/")
+        else:
+            target = posixpath.normpath(posixpath.join(posixpath.dirname(part), target))
+        relationships.append((attributes["Id"], target, element))
+    return relationships
+
+def _closure(parts: dict, part: str) -> set:
+    """ 某个部件及其（递归）引用的全部部件，例如工作表的绘图、图表和图片。 """
+    found = set()
+    stack = [part]
+    while stack:
+        current = stack.pop()
+        if current in found or current not in parts:
+            continue
+        found.add(current)
+        stack.extend(target for _, target, _ in _relationships(parts, current))
+    return found
+
+def _sheet_workbook(parts: dict, sheets: list, keep: int) -> dict:
+    """
+    生成只包含第 `keep` 个工作表的工作簿的全部部件。
+
+    其他工作表及只被它们引用的部件（绘图、批注等）会被删除，workbook.xml、其关系文件和
+    [Content_Types].xml 会相应改写。共享字符串、样式和主题原样保留。
     """
-    通过加载源文件、删除其他工作表并另存的方式，完整地拆分Excel文件。
-    此版本会检测并自动跳过所有隐藏的工作表。
+    workbook_part = "xl/workbook.xml"
+    sheet_rels = {rel_id: target for rel_id, target, _ in _relationships(parts, workbook_part)}
+    kept_part = sheet_rels[_sheet_rel_id(sheets[keep])]
+    kept = _closure(parts, kept_part)
+    dropped = {_CALC_CHAIN}
+    for index, sheet in enumerate(sheets):
+        if index != keep:
+            dropped |= _closure(parts, sheet_rels[_sheet_rel_id(sheet)]) - kept
+    dropped |= {_rels_path(part) for part in dropped}
+
+    workbook = parts[workbook_part].decode("utf-8")
+    sheet_elements = _SHEET.findall(workbook)
+    kept_element = re.sub(r'\sstate="\w+"', "", sheet_elements[keep])
+    start = workbook.index(sheet_elements[0])
+    end = workbook.index(sheet_elements[-1]) + len(sheet_elements[-1])
+    workbook = workbook[:start] + kept_element + workbook[end:]
+    workbook = _VIEW_TAB.sub("", workbook)
+
+    def defined_name(match):
+        # localSheetId 是工作表的序号：只保留属于保留工作表的局部名称，并改为 0
+        local_sheet = _attributes(match.group(1) or match.group(0)).get("localSheetId")
+        if local_sheet is None:
+            return match.group(0)
+        if int(local_sheet) != keep:
+            return ""
+        return match.group(0).replace(f'localSheetId="{local_sheet}"', 'localSheetId="0"', 1)
+    workbook = _DEFINED_NAME.sub(defined_name, workbook)
+
+    workbook_rels_part = _rels_path(workbook_part)
+    workbook_rels = parts[workbook_rels_part].decode("utf-8")
+    for _, target, element in _relationships(parts, workbook_part):
+        if target in dropped:
+            workbook_rels = workbook_rels.replace(element, "")
+
+    content_types = parts["[Content_Types].xml"].decode("utf-8")
+    for element in _OVERRIDE.findall(content_types):
+        if _attributes(element)["PartName"].lstrip("/") in dropped:
+            content_types = content_types.replace(element, "")
+
+    output = {name: data for name, data in parts.items() if name not in dropped}
+    output[workbook_part] = workbook.encode("utf-8")
+    output[workbook_rels_part] = workbook_rels.encode("utf-8")
+    output["[Content_Types].xml"] = content_types.encode("utf-8")
+    return output
+
+def _write_parts(parts: dict, output_file_name: str):
+    with zipfile.ZipFile(output_file_name, "w", zipfile.ZIP_DEFLATED) as zout:
+        for name, data in parts.items():
+            zout.writestr(name, data)
+
+def split_excel_skip_hidden(file_path, output_dir=".", max_workers=None):
+    """
+    将 Excel 文件的每个可见工作表拆分为单独的文件，并自动跳过所有隐藏的工作表。
+
+    源文件只读取一次：直接在 xlsx 的 zip 部件上操作，共享字符串、样式和主题只读取一次，
+    然后为每个可见工作表生成只包含该工作表的部件，并在线程池中并行写出各个文件
+    （压缩时会释放 GIL）。
 
     参数:
     file_path (str): 要拆分的 .xlsx 文件的路径。
+    output_dir (str): 输出文件所在的目录，文件名为 "<工作表名>.xlsx"。
+    max_workers (int): 并行写出文件的线程数，默认由 ThreadPoolExecutor 决定。
     """
     try:
-        # 步骤 1: 加载工作簿一次，用于分析其所有工作表的状态
+        # 步骤 1: 一次性读取所有 zip 部件，并分析工作表的状态
         print(f"正在分析文件: '{file_path}'...")
-        source_workbook = openpyxl.load_workbook(file_path)
-        
+        with zipfile.ZipFile(file_path) as zin:
+            parts = {info.filename: zin.read(info) for info in zin.infolist()}
+
+        sheets = [_attributes(element) for element in _SHEET.findall(parts["xl/workbook.xml"].decode("utf-8"))]
         visible_sheets_to_process = []
         hidden_sheets_skipped = []
 
         # 遍历所有工作表，将它们分类为“可见”或“隐藏”
-        for sheet_name in source_workbook.sheetnames:
-            sheet = source_workbook[sheet_name]
-            if sheet.sheet_state == 'visible':
-                visible_sheets_to_process.append(sheet_name)
+        for index, sheet in enumerate(sheets):
+            sheet_name = unescape(sheet["name"])
+            if sheet.get("state", "visible") == "visible":
+                visible_sheets_to_process.append((index, sheet_name))
             else:
                 hidden_sheets_skipped.append(sheet_name)
-        
-        source_workbook.close() # 分析完毕，关闭文件以释放内存
 
         # 步骤 2: 向用户报告分析结果
         if not visible_sheets_to_process:
             print("错误：在文件中没有找到任何可见的工作表可供拆分。")
             return
 
-        print(f"在文件中找到可见工作表: {', '.join(visible_sheets_to_process)}")
+        print(f"在文件中找到可见工作表: {', '.join(name for _, name in visible_sheets_to_process)}")
         if hidden_sheets_skipped:
             print(f"将跳过以下隐藏的工作表: {', '.join(hidden_sheets_skipped)}")
         print("-" * 30)
 
-        # 步骤 3: 仅遍历并处理“可见”的工作表列表
-        for sheet_to_keep in visible_sheets_to_process:
-            print(f"正在处理可见工作表: '{sheet_to_keep}'...")
-            
-            # 为每个需要保存的可见工作表，重新加载一次原始文件
-            wb_copy = openpyxl.load_workbook(file_path)
-            
-            # 从这个副本中删除所有其他工作表
-            for sheet_name in list(wb_copy.sheetnames):
-                if sheet_name != sheet_to_keep:
-                    wb_copy.remove(wb_copy[sheet_name])
-            
-            # 现在，副本中只剩下一个我们已知的可见工作表
-            # 定义输出文件名并保存
-            output_file_name = f"{sheet_to_keep}.xlsx"
-            wb_copy.save(output_file_name)
-            wb_copy.close()
-
-            print(f"✔ 已成功创建文件: '{output_file_name}'")
+        # 步骤 3: 并行写出每个可见工作表
+        def process(index, sheet_to_keep):
+            output_file_name = os.path.join(output_dir, f"{sheet_to_keep}.xlsx")
+            _write_parts(_sheet_workbook(parts, sheets, index), output_file_name)
+            return output_file_name
+
+        with ThreadPoolExecutor(max_workers) as executor:
+            futures = [executor.submit(process, index, name) for index, name in visible_sheets_to_process]
+            for future in futures:
+                print(f"✔ 已成功创建文件: '{future.result()}'")
 
         print("-" * 30)
         print("所有可见工作表均已处理完毕。")
@@ -67,5 +175,5 @@ def split_excel_skip_hidden(file_path):
 # --- 使用示例 ---
 if __name__ == "__main__":
     # 将 "example_table.xlsx" 替换为您要拆分的实际文件名
-    input_excel_file = "../example_table.xlsx" 
-    split_excel_skip_hidden(input_excel_file)
\ No newline at end of file
+    input_excel_file = "../example_table.xlsx"
+    split_excel_skip_hidden(input_excel_file)
@@ -0,0 +1,7 @@
+import os
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, os.path.join(SRC_DIR, "crawlers"))
+sys.path.insert(0, os.path.join(SRC_DIR, "excel_processor"))
+sys.path.insert(0, SRC_DIR)
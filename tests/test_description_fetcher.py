@@ -0,0 +1,78 @@
+import pickle
+import threading
+from description_fetcher import DESCRIPTION_FETCH_FAILED, DESCRIPTION_NOT_FOUND, DESCRIPTION_URL_KEY, DescriptionFetcher
+from page_parser import SKU_FIELDS
+from variant_batch import VariantBatch
+
+class StubFetcher(DescriptionFetcher):
+    """ Downloads nothing: describes each URL after itself, once `release` is set, and counts the
+    downloads per URL. URLs containing "broken" fail. """
+
+    def _setup(self):
+        super()._setup()
+        self.downloads = {}
+        self.release = threading.Event()
+        self.release.set()
+
+    def _download(self, desc_url):
+        self.downloads[desc_url] = self.downloads.get(desc_url, 0) + 1
+        self.release.wait(timeout=10)
+        return DESCRIPTION_FETCH_FAILED if "broken" in desc_url else f"<p>{desc_url}</p>"
+
+def test_concurrent_requests_for_a_description_are_joined():
+    fetcher = StubFetcher()
+    fetcher.release.clear()
+    futures = [fetcher.submit("//desc/1") for _ in range(5)]
+    fetcher.release.set()
+
+    assert [future.result(timeout=10) for future in futures] == ["<p>//desc/1</p>"] * 5
+    assert fetcher.downloads == {"//desc/1": 1}
+    fetcher.close()
+
+def test_descriptions_are_cached_least_recently_used_first():
+    fetcher = StubFetcher(cache_size=2)
+    for url in ("//desc/1", "//desc/2", "//desc/1", "//desc/3", "//desc/1", "//desc/2"):
+        fetcher.fetch(url)
+
+    # "//desc/2" was the least recently used when "//desc/3" came in
+    assert fetcher.downloads == {"//desc/1": 1, "//desc/2": 2, "//desc/3": 1}
+    assert fetcher.fetch(None) == DESCRIPTION_NOT_FOUND
+    fetcher.close()
+
+def test_failed_downloads_are_not_cached():
+    fetcher = StubFetcher()
+    assert fetcher.fetch("//broken") == DESCRIPTION_FETCH_FAILED
+    assert fetcher.fetch("//broken") == DESCRIPTION_FETCH_FAILED
+    assert fetcher.downloads == {"//broken": 2}
+    fetcher.close()
+
+def test_fill_descriptions_resolves_the_urls_left_by_the_parser():
+    fetcher = StubFetcher()
+    batch = VariantBatch({"Title": "Batch", DESCRIPTION_URL_KEY: "//desc/2"}, SKU_FIELDS)
+    batch.append({"SKU": "b1"})
+    pages = [
+        ("1", [{"SKU": "a1", DESCRIPTION_URL_KEY: "//desc/1"}, {"SKU": "a2", DESCRIPTION_URL_KEY: "//desc/1"}]),
+        ("2", batch),
+        ("3", [{"SKU": "c1", DESCRIPTION_URL_KEY: None}]),
+    ]
+
+    filled = list(fetcher.fill_descriptions(iter(pages), lookahead=1))
+
+    assert [key for key, _ in filled] == ["1", "2", "3"]
+    assert [v["Description"] for v in filled[0][1]] == ["<p>//desc/1</p>"] * 2
+    assert filled[1][1].shared == {"Title": "Batch", "Description": "<p>//desc/2</p>"}
+    assert filled[2][1] == [{"SKU": "c1", "Description": DESCRIPTION_NOT_FOUND}]
+    assert fetcher.downloads == {"//desc/1": 1, "//desc/2": 1}
+    fetcher.close()
+
+def test_pickled_fetcher_keeps_its_settings_only():
+    fetcher = StubFetcher(max_workers=3, cache_size=5, timeout=2)
+    fetcher.fetch("//desc/1")
+
+    copy = pickle.loads(pickle.dumps(fetcher))
+
+    assert (copy.max_workers, copy.cache_size, copy.timeout) == (3, 5, 2)
+    assert copy.downloads == {} and copy._executor is None
+    assert copy.fetch("//desc/1") == "<p>//desc/1</p>"
+    fetcher.close()
+    copy.close()
@@ -0,0 +1,72 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from crawler_1688 import WebCrawler
+from distributed import Coordinator, encode_variants, run_worker
+from job_store import FAILED, PARSED, JobStore
+from rate_limiter import RateLimiter
+
+def test_late_failure_does_not_release_a_received_offer(tmp_path):
+    job_store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    job_store.add(["1"])
+    coordinator = Coordinator(str(tmp_path / "out.xlsx"), job_store, port=0)
+    assert job_store.claim("a") == ["1"]
+    # The lease of worker "a" expired and "b" parsed the offer first
+    variants = encode_variants([{"Title": "Product 1", "SKU": "1"}])
+    coordinator.report({"worker": "b", "offer_id": "1", "status": PARSED, "variants": variants})
+    coordinator.report({"worker": "a", "offer_id": "1", "status": FAILED, "error": "fetch failed"})
+
+    job = job_store.get("1")
+    assert job["status"] == PARSED and job["claimed_by"] == "a"
+    assert coordinator.written == 1
+    coordinator.server.server_close()
+    coordinator.table.close()
+    job_store.close()
+
+class FlakyCoordinator:
+    """ Hands out one offer, then fails every `/result` request. """
+
+    def __init__(self):
+        self.results = 0
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if self.path == "/result":
+                    fake.results += 1
+                    self.send_error(503)
+                    return
+                data = json.dumps({"offer_ids": ["1"], "done": False}).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+def test_worker_retries_results_then_stops():
+    class Crawler(WebCrawler):
+        def fetch_html(self, offer_id):
+            return "<html></html>"
+
+    class Parser:
+        description_fetcher = type("Fetcher", (), {"close": lambda self: None})()
+
+        def parse(self, html_content):
+            return [{"Title": "Product 1", "SKU": "1"}]
+
+    coordinator = FlakyCoordinator()
+    parsed = run_worker(
+        coordinator.url, crawler=Crawler(rate_limiter=RateLimiter()), parser=Parser(),
+        poll_interval=0, report_attempts=3
+    )
+    assert parsed == 0
+    assert coordinator.results == 3
+    coordinator.server.shutdown()
+    coordinator.server.server_close()
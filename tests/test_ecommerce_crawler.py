@@ -0,0 +1,56 @@
+import json
+import re
+import pytest
+import ecommerce_crawler
+from html_cache import HtmlCache
+from platforms import Platform, PlatformRegistry
+
+class StubParser:
+    def __init__(self, fetch_description: bool = True):
+        self.fetch_description = fetch_description
+
+    def parse(self, html_content):
+        if isinstance(html_content, bytes):
+            html_content = html_content.decode("utf-8")
+        return [{"Title": f"Stub {html_content}", "SKU": "1"}]
+
+class StubPlatform(Platform):
+    key = "stub"
+
+    def build_url(self, offer_id: str) -> str:
+        return f"https://stub.test/item/{offer_id}"
+
+    def offer_id(self, url_or_id: str) -> str:
+        match = re.fullmatch(r"https://stub\.test/item/(\w+)", url_or_id)
+        return match.group(1) if match else url_or_id
+
+    def parser_class(self):
+        return StubParser
+
+@pytest.fixture
+def stub_registry(monkeypatch):
+    registry = PlatformRegistry()
+    registry.register("1688", "platform_1688:Platform1688", hosts=("1688.com",))
+    registry.register("stub", f"{__name__}:StubPlatform", hosts=("stub.test",))
+    monkeypatch.setattr(ecommerce_crawler, "platform_registry", registry)
+    return registry
+
+def parsed_titles(path) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["Title"] for line in f]
+
+def test_parse_uses_the_parser_of_the_page_platform(tmp_path, stub_registry):
+    cache = HtmlCache(str(tmp_path / "cache.sqlite3"))
+    cache.put("7", "cached page")
+    cache.close()
+    output = tmp_path / "variants.jsonl"
+    ecommerce_crawler.main([
+        "parse", "https://stub.test/item/7", "-o", str(output), "--offline", "--cache", str(tmp_path / "cache.sqlite3")
+    ])
+    assert parsed_titles(output) == ["Stub cached page"]
+
+def test_saved_pages_are_parsed_for_the_given_platform(tmp_path, stub_registry):
+    (tmp_path / "page.html").write_text("saved page", encoding="utf-8")
+    output = tmp_path / "variants.jsonl"
+    ecommerce_crawler.main(["parse", str(tmp_path / "page.html"), "-o", str(output), "--platform", "stub"])
+    assert parsed_titles(output) == ["Stub saved page"]
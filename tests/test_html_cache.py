@@ -0,0 +1,141 @@
+import secrets
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from crawler_1688 import WebCrawler
+from html_cache import HtmlCache
+from platforms import Platform
+
+def page(seed: int) -> str:
+    """ A page that hardly compresses, so each one takes about the same room in the cache. """
+    return f"<html>{seed}" + secrets.token_hex(2000) + "</html>"
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = HtmlCache(str(tmp_path / "cache.sqlite3"))
+    yield cache
+    cache.close()
+
+def test_entries_are_fresh_within_their_ttl(cache):
+    cache.put("1", "<html>1</html>")
+    cache.put("2", "<html>2</html>", ttl=0)
+
+    entry = cache.get("1")
+    assert entry.html == "<html>1</html>"
+    assert entry.is_fresh()
+    assert not entry.is_fresh(now=entry.fetched_at + cache.ttl + 1)
+    assert not cache.get("2").is_fresh()
+    assert cache.get("3") is None
+
+def test_least_recently_read_entries_are_evicted_first(cache):
+    cache.put("a", page(1))
+    time.sleep(0.01)
+    cache.put("b", page(2))
+    time.sleep(0.01)
+    # Read after "b" was written, so "b" is now the least recently used
+    assert cache.get("a") is not None
+    cache.max_bytes = cache.size() * 5 // 4
+
+    cache.put("c", page(3))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.size() <= cache.max_bytes
+
+def test_hits_are_written_in_a_batch_when_the_cache_is_closed(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = HtmlCache(path)
+    cache.put("a", page(1))
+    reader = sqlite3.connect(path)
+    def accessed_at():
+        return reader.execute("SELECT accessed_at FROM entries WHERE offer_id = 'a'").fetchone()[0]
+    written = accessed_at()
+
+    time.sleep(0.01)
+    cache.get("a")
+    assert accessed_at() == written
+
+    cache.close()
+    assert accessed_at() > written
+    reader.close()
+
+def test_identical_pages_are_stored_once_and_released_with_their_last_entry(cache):
+    shared, other = page(1), page(2)
+    cache.put("a", shared)
+    one_page = cache.size()
+    cache.put("b", shared)
+    assert cache.size() == one_page
+
+    cache.put("a", other)
+    assert cache.size() > one_page
+    cache.put("b", other)
+    assert cache.get("a").html == cache.get("b").html == other
+    # The shared page is gone with its last entry, only `other` is left
+    alone = HtmlCache(":memory:")
+    alone.put("a", other)
+    assert cache.size() == alone.size()
+    alone.close()
+
+class RevalidatingServer:
+    """ Serves `/item/<id>` with an ETag, answering 304 to requests that send it back. """
+
+    ETAG = '"v1"'
+
+    def __init__(self):
+        self.conditional_requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.headers.get("If-None-Match") == server.ETAG:
+                    server.conditional_requests += 1
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                body = f"<html>{self.path}</html>".encode()
+                self.send_response(200)
+                self.send_header("ETag", server.ETAG)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.http = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.http.server_address[1]}"
+        threading.Thread(target=self.http.serve_forever, daemon=True).start()
+
+class LocalPlatform(Platform):
+    key = "local"
+
+    def __init__(self, url: str):
+        self.url = url
+
+    def build_url(self, offer_id: str) -> str:
+        return f"{self.url}/item/{offer_id}"
+
+    def parser_class(self):
+        raise AssertionError("not parsed in these tests")
+
+def test_stale_entries_are_revalidated_with_their_etag(tmp_path):
+    server = RevalidatingServer()
+    # Every entry is stale at once, so each fetch goes to the server
+    cache = HtmlCache(str(tmp_path / "cache.sqlite3"), ttl=0)
+    crawler = WebCrawler(cache=cache, platform=LocalPlatform(server.url))
+    try:
+        html, cached = crawler._lookup_cache("7")
+        assert html is None and cached is None
+        assert crawler._request(crawler.session, "7") == "<html>/item/7</html>"
+        assert cache.get("7").etag == RevalidatingServer.ETAG
+
+        html, cached = crawler._lookup_cache("7")
+        assert html is None and cached.etag == RevalidatingServer.ETAG
+        assert crawler._request(crawler.session, "7", cached) == "<html>/item/7</html>"
+        assert server.conditional_requests == 1
+        assert cache.get("7").fetched_at > cached.fetched_at
+    finally:
+        server.http.shutdown()
+        cache.close()
@@ -0,0 +1,30 @@
+import asyncio
+import threading
+import time
+from identity_pool import IdentityPool
+
+def test_acquire_async_wakes_up_on_release_without_polling():
+    pool = IdentityPool(size=1)
+    held = pool.acquire()
+    attempts = []
+    try_acquire = pool.try_acquire
+    pool.try_acquire = lambda: attempts.append(None) or try_acquire()
+
+    async def borrow():
+        return await pool.acquire_async()
+
+    threading.Timer(0.5, pool.release, (held, False)).start()
+    started = time.monotonic()
+    assert asyncio.run(borrow()) is held
+    assert 0.4 < time.monotonic() - started < 2
+    # One attempt before waiting, one after the release
+    assert len(attempts) == 2
+    pool.close()
+
+def test_acquire_async_waits_for_a_resting_identity():
+    pool = IdentityPool(size=1, rest=0.3)
+    pool.release(pool.acquire(), True)
+    started = time.monotonic()
+    asyncio.run(pool.acquire_async())
+    assert 0.2 < time.monotonic() - started < 2
+    pool.close()
@@ -0,0 +1,73 @@
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from image_checker import ImageChecker
+
+IMAGE = b"\xff\xd8\xff\xe0" + b"\x00" * 60
+
+class ImageHost:
+    """ Serves `/<status>.jpg` with that status, `/page.jpg` as HTML, and images of any size
+    (`/image-<size>.jpg`) sharing the same leading bytes. Counts the requests per path. """
+
+    def __init__(self):
+        self.requests = {}
+        host = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                name = self.path.partition("?")[0].strip("/").removesuffix(".jpg")
+                host.requests[name] = host.requests.get(name, 0) + 1
+                status, content_type, body = 200, "image/jpeg", IMAGE
+                if name.isdigit():
+                    status, content_type, body = int(name), "text/plain", b"error"
+                elif name == "page":
+                    content_type, body = "text/html", b"<html></html>"
+                elif name.startswith("image-"):
+                    body = IMAGE + b"\x01" * int(name.removeprefix("image-"))
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+@pytest.fixture
+def host():
+    host = ImageHost()
+    yield host
+    host.server.shutdown()
+    host.server.server_close()
+
+def unreachable_url() -> str:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{probe.getsockname()[1]}/image.jpg"
+
+def test_only_definitely_dead_images_are_dropped(host):
+    checker = ImageChecker(hash_bytes=16)
+    urls = [f"{host.url}/{name}.jpg" for name in ("image-1", "404", "410", "page", "429", "503")]
+    urls.append(unreachable_url())
+    kept = checker.clean_photos(", ".join(urls)).split(", ")
+    assert kept == [urls[0], urls[4], urls[5], urls[6]]
+    checker.close()
+
+def test_inconclusive_checks_are_not_cached(host):
+    checker = ImageChecker(hash_bytes=16)
+    for _ in range(2):
+        for name in ("image-1", "404", "503"):
+            checker.check(f"{host.url}/{name}.jpg")
+    assert host.requests == {"image-1": 1, "404": 1, "503": 2}
+    checker.close()
+
+def test_images_sharing_leading_bytes_are_only_merged_with_the_same_size(host):
+    checker = ImageChecker(hash_bytes=16)
+    urls = [f"{host.url}/image-{size}.jpg?copy={copy}" for size in (1, 2) for copy in (1, 2)]
+    assert checker.clean_photos(", ".join(urls)) == f"{urls[0]}, {urls[2]}"
+    checker.close()
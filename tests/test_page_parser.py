@@ -0,0 +1,128 @@
+import json
+import os
+import threading
+import time
+import pytest
+from benchmarks.fixtures import make_init_data, make_offer_page
+from page_parser import PageParser
+
+class FaultyParser(PageParser):
+    """ Parses a page into its own text, except for the pages named "crash" (the worker
+    process dies) and "hang" (the worker never returns). """
+
+    def parse(self, html_content):
+        if html_content == "crash":
+            os._exit(1)
+        if html_content == "hang":
+            time.sleep(600)
+        return [{"page": html_content}]
+
+def test_parse_many_reports_a_page_whose_worker_dies_without_waiting_for_the_timeout():
+    parser = FaultyParser(fetch_description=False)
+    pages = ["a", "crash", "b", "c", "d"]
+
+    started = time.monotonic()
+    results = dict(parser.parse_many(pages, processes=2, timeout=60))
+
+    assert time.monotonic() - started < 30
+    assert results == {0: [{"page": "a"}], 1: [], 2: [{"page": "b"}], 3: [{"page": "c"}], 4: [{"page": "d"}]}
+
+def test_parse_many_gives_up_on_a_hanging_page_and_restarts_the_pool():
+    parser = FaultyParser(fetch_description=False)
+    pages = ["a", "hang", "b", "c"]
+
+    started = time.monotonic()
+    results = dict(parser.parse_many(pages, processes=2, timeout=1))
+
+    assert time.monotonic() - started < 30
+    assert results == {0: [{"page": "a"}], 1: [], 2: [{"page": "b"}], 3: [{"page": "c"}]}
+
+def test_parse_many_yields_results_while_the_next_page_is_not_available_yet():
+    parser = FaultyParser(fetch_description=False)
+    first_result = threading.Event()
+    waited = []
+
+    def pages():
+        yield "a"
+        # An upstream fetch queue that only fills up after the first page has been parsed
+        waited.append(first_result.wait(timeout=10))
+        yield "b"
+
+    results = {}
+    for index, variants in parser.parse_many(pages(), processes=2, timeout=60):
+        results[index] = variants
+        first_result.set()
+
+    assert waited == [True]
+    assert results == {0: [{"page": "a"}], 1: [{"page": "b"}]}
+
+REAL_DATA = make_init_data(3)
+
+def init_script(data: dict) -> str:
+    return "<script>window.__INIT_DATA = " + json.dumps(data, ensure_ascii=False) + ";</script>"
+
+def test_init_data_is_read_from_a_page_of_the_real_layout():
+    parser = PageParser(fetch_description=False)
+    page = make_offer_page(n_skus=3, padding_bytes=10_000)
+
+    assert parser._scan_init_data(page) == REAL_DATA
+    assert parser._scan_init_data(page.encode("utf-8")) == REAL_DATA
+    assert [variant["SKU"] for variant in parser.parse(page)] == ["Color 0&gt;Size 0", "Color 1&gt;Size 1", "Color 2&gt;Size 2"]
+
+@pytest.mark.parametrize("before", [
+    '<script>window.__INIT_DATA_EXTRA = {"data": {"extra": {}}};</script>',
+    '<script>// window.__INIT_DATA is filled in below\nvar config = {"data": {"config": {}}};</script>',
+    '<script>var help = "read window.__INIT_DATA"; var config = {"data": {"config": {}}};</script>',
+    '<script>window.__INIT_DATA = window.__INIT_DATA || null;</script><script>var config = {"data": {"config": {}}};</script>',
+    '<script>window.__INIT_DATA = {"loading": true};</script>',
+])
+def test_init_data_is_read_from_its_assignment_only(before):
+    parser = PageParser(fetch_description=False)
+    page = "<html><head>" + before + "</head><body>" + init_script(REAL_DATA) + "</body></html>"
+
+    assert parser._scan_init_data(page) == REAL_DATA
+    assert parser._scan_init_data(page.encode("utf-8")) == REAL_DATA
+
+def test_an_object_after_the_script_is_not_taken_for_the_init_data():
+    parser = PageParser(fetch_description=False)
+    page = '<script>window.__INIT_DATA = null;</script><script>var config = {"data": {"config": {}}};</script>'
+
+    assert parser._scan_init_data(page) is None
+    assert parser._extract_init_data(page) == {}
+
+def test_init_data_without_modules_falls_back_to_the_soup(monkeypatch):
+    parser = PageParser(fetch_description=False)
+    page = '<script>window.__INIT_DATA = {"globalData": {}};</script>'
+    soup_pages = []
+    monkeypatch.setattr(parser, "_extract_init_data_from_soup", lambda soup: soup_pages.append(soup) or {})
+
+    assert parser._extract_init_data(page) == {}
+    assert len(soup_pages) == 1
+
+def test_sku_details_and_packages_are_matched_by_sku_id():
+    data = make_init_data(3)
+    modules = data["data"]
+    sku_map = modules["price"]["data"]["finalPriceModel"]["tradeWithoutPromotion"]["skuMap"]
+    packages = modules["cross"]["data"]["pieceWeightScale"]["pieceWeightScaleInfo"]
+    # Listed in another order than the SKUs, with a later duplicate that must not win
+    sku_map.reverse()
+    sku_map.append({"skuId": 5000000, "price": "99.99", "canBookCount": "1"})
+    packages[1] = {"skuId": 5000001, "weight": "500.0", "length": "40.0", "width": "30.0", "height": "10.0"}
+    packages.reverse()
+
+    variants = PageParser(fetch_description=False).parse(init_script(data))
+
+    assert [(v["SKU"], v["(Colombia) Price in US"], v["Stock"]) for v in variants] == [
+        ("Color 0&gt;Size 0", 10.0, 100), ("Color 1&gt;Size 1", 11.01, 101), ("Color 2&gt;Size 2", 12.02, 102),
+    ]
+    assert [v["Package gross weight"] for v in variants] == [250, 500, 250]
+    assert variants[1]["Package length"] == 40
+
+def test_first_module_of_a_component_type_is_used():
+    data = make_init_data(1)
+    data["data"]["late_title"] = {"componentType": "@ali/tdmod-od-pc-offer-title", "data": {"title": "Duplicate"}}
+
+    variants = PageParser(fetch_description=False).parse(init_script(data))
+
+    assert variants[0]["Title"] == "Halloween costume cosplay set"
+    assert variants[0]["Brand"] == "ACME"
@@ -0,0 +1,175 @@
+import threading
+import time
+import openpyxl
+import pytest
+from crawler_1688 import AsyncWebCrawler
+from fingerprint_store import FingerprintStore
+from job_store import WRITTEN, JobStore
+from page_parser import OFFER_FINGERPRINT_KEY
+from pipeline import main, run_pipeline
+from rate_limiter import RateLimiter
+from variant_dataset import VariantDatasetWriter
+
+class InstantCrawler(AsyncWebCrawler):
+    """ Serves every offer at once without any request, faster than any parser, except the
+    offers in `failing`, which cannot be fetched. """
+
+    def __init__(self, *args, failing=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.failing = failing
+
+    async def fetch_many(self, offer_ids, max_workers=None):
+        for offer_id in offer_ids:
+            yield offer_id, None if offer_id in self.failing else f"<html>{offer_id}</html>"
+
+class BrokenParser:
+    def parse(self, html_content):
+        raise RuntimeError("parser bug")
+
+def test_failing_parse_stage_is_raised_instead_of_hanging(tmp_path):
+    outcome = {}
+
+    def run():
+        try:
+            run_pipeline(
+                (str(i) for i in range(500)), str(tmp_path / "out.xlsx"),
+                crawler=InstantCrawler(rate_limiter=RateLimiter()), parser=BrokenParser(),
+                processes=0, with_description=False, queue_size=4
+            )
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout=30)
+    assert not thread.is_alive(), "run_pipeline hung after its parse stage failed"
+    assert isinstance(outcome.get("error"), RuntimeError)
+    assert not (tmp_path / "out.xlsx").exists()
+
+def test_failing_fetch_stage_is_raised():
+    class BrokenCrawler(InstantCrawler):
+        async def fetch_many(self, offer_ids, max_workers=None):
+            yield "1", "<html></html>"
+            raise ConnectionResetError("fetch bug")
+
+    with pytest.raises(ConnectionResetError):
+        run_pipeline(
+            ["1", "2"], "unused.xlsx", crawler=BrokenCrawler(rate_limiter=RateLimiter()),
+            parser=type("Parser", (), {"parse": lambda self, html: []})(), processes=0,
+            with_description=False, queue_size=4
+        )
+
+class TitleParser:
+    """ One variant per page, titled after the offer, failing on the offers in `broken`. """
+
+    def __init__(self, broken=()):
+        self.broken = broken
+
+    def parse(self, html_content):
+        offer_id = html_content[len("<html>"):-len("</html>")]
+        if offer_id in self.broken:
+            raise RuntimeError("parser bug")
+        return [{"Title": f"Product {offer_id}", "SKU": offer_id, OFFER_FINGERPRINT_KEY: offer_id}]
+
+def saved_titles(path) -> list:
+    workbook = openpyxl.load_workbook(path, read_only=True)
+    titles = [row[0] for row in workbook.active.iter_rows(min_row=7, max_col=1, values_only=True) if row[0]]
+    workbook.close()
+    return titles
+
+def crawl(offer_ids, output_path, job_store, parser, checkpoint_every=0):
+    return run_pipeline(
+        offer_ids, str(output_path), crawler=InstantCrawler(rate_limiter=RateLimiter()), parser=parser,
+        processes=0, with_description=False, job_store=job_store, checkpoint_every=checkpoint_every
+    )
+
+def test_resumed_run_saves_new_parts_instead_of_overwriting(tmp_path):
+    job_store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    offer_ids = [str(i) for i in range(1, 6)]
+    with pytest.raises(RuntimeError):
+        crawl(offer_ids, tmp_path / "out.xlsx", job_store, TitleParser(broken={"4"}), checkpoint_every=2)
+    # The first checkpoint was saved and its offers are done, the rest is left to resume
+    assert saved_titles(tmp_path / "out.xlsx") == ["Product 1", "Product 2"]
+    assert [job_store.get(offer_id)["status"] == WRITTEN for offer_id in offer_ids] == [True, True, False, False, False]
+
+    assert crawl(offer_ids, tmp_path / "out.xlsx", job_store, TitleParser()) == 3
+    assert saved_titles(tmp_path / "out.xlsx") == ["Product 1", "Product 2"]
+    assert saved_titles(tmp_path / "out.part2.xlsx") == ["Product 3", "Product 4", "Product 5"]
+    assert job_store.counts()[WRITTEN] == 5
+    job_store.close()
+
+def crawl_incremental(tmp_path, offer_ids, failing=(), job_store=None):
+    fingerprints = FingerprintStore(str(tmp_path / "fingerprints.sqlite3"))
+    run_pipeline(
+        offer_ids, str(tmp_path / "delta.xlsx"), crawler=InstantCrawler(rate_limiter=RateLimiter(), failing=failing),
+        parser=TitleParser(), processes=0, with_description=False, job_store=job_store,
+        fingerprints=fingerprints, remove_missing=True
+    )
+    known = {offer_id: fingerprints.offer_fingerprint(offer_id) is not None for offer_id in ("1", "2", "3")}
+    fingerprints.close()
+    return known
+
+def test_remove_missing_only_removes_offers_missing_from_the_input(tmp_path):
+    assert crawl_incremental(tmp_path, ["1", "2", "3"]) == {"1": True, "2": True, "3": True}
+    # A failed fetch neither delists the offer nor lets the others be removed
+    assert crawl_incremental(tmp_path, ["1", "2"], failing={"2"}) == {"1": True, "2": True, "3": True}
+    assert crawl_incremental(tmp_path, ["1", "2"]) == {"1": True, "2": True, "3": False}
+
+def test_remove_missing_is_refused_when_resuming_jobs(tmp_path):
+    crawl_incremental(tmp_path, ["1", "2", "3"])
+    job_store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    job_store.add(["1"])
+    assert crawl_incremental(tmp_path, ["1", "2"], job_store=job_store) == {"1": True, "2": True, "3": True}
+    job_store.close()
+
+def test_dataset_is_refused_in_incremental_mode(tmp_path):
+    fingerprints = FingerprintStore(str(tmp_path / "fingerprints.sqlite3"))
+    with VariantDatasetWriter(str(tmp_path / "variants.jsonl")) as dataset, pytest.raises(ValueError):
+        run_pipeline(
+            ["1"], str(tmp_path / "out.xlsx"), crawler=InstantCrawler(rate_limiter=RateLimiter()),
+            parser=TitleParser(), fingerprints=fingerprints, dataset=dataset
+        )
+    fingerprints.close()
+
+def test_failed_run_still_finishes_the_dataset(tmp_path):
+    (tmp_path / "ids.txt").write_text("1\n2\n")
+    dataset_path = tmp_path / "variants.jsonl"
+    with pytest.raises(FileNotFoundError):
+        main([
+            str(tmp_path / "ids.txt"), str(tmp_path / "out.xlsx"), "--template", str(tmp_path / "missing.xlsx"),
+            "--offline", "--cache", str(tmp_path / "cache.sqlite3"), "--processes", "0", "--no-description",
+            "--dataset", str(dataset_path)
+        ])
+    assert dataset_path.exists()
+    assert not (tmp_path / "variants.jsonl.tmp").exists()
+
+def test_workers_sharing_a_store_never_write_an_offer_twice(tmp_path, monkeypatch):
+    import pipeline
+    from product_table import StreamingProductTable
+    # Both workers run in this process: tell them apart by thread
+    monkeypatch.setattr(pipeline, "default_worker_id", lambda: threading.current_thread().name)
+    saving = threading.Event()
+    save = StreamingProductTable.save
+
+    def slow_save(table, file_path):
+        if threading.current_thread().name == "slow":
+            saving.set()
+            time.sleep(1.5)
+        save(table, file_path)
+
+    monkeypatch.setattr(StreamingProductTable, "save", slow_save)
+    offer_ids = ["1", "2", "3"]
+    slow = threading.Thread(
+        target=crawl, name="slow", daemon=True,
+        args=(offer_ids, tmp_path / "slow.xlsx", JobStore(str(tmp_path / "jobs.sqlite3"), lease=0.3), TitleParser())
+    )
+    slow.start()
+    assert saving.wait(timeout=30)
+    # Without renewals, the slow worker's leases expire during its save
+    time.sleep(0.6)
+    job_store = JobStore(str(tmp_path / "jobs.sqlite3"), lease=0.3)
+    assert crawl(offer_ids, tmp_path / "fast.xlsx", job_store, TitleParser()) == 0
+    slow.join(timeout=30)
+    assert saved_titles(tmp_path / "slow.xlsx") == ["Product 1", "Product 2", "Product 3"]
+    assert saved_titles(tmp_path / "fast.xlsx") == []
+    job_store.close()
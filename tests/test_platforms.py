@@ -0,0 +1,20 @@
+import pytest
+from platforms import Platform, registry
+
+def test_1688_offer_ids():
+    platform = registry.get("1688")
+    assert platform.offer_id("612345") == "612345"
+    assert platform.offer_id("https://detail.1688.com/offer/612345.html?spm=a") == "612345"
+    for url in ("https://item.taobao.com/offer/612345.html", "https://detail.1688.com/page/612345"):
+        with pytest.raises(ValueError):
+            platform.offer_id(url)
+
+def test_platforms_must_build_urls_and_name_their_parser():
+    class Incomplete(Platform):
+        key = "incomplete"
+
+        def build_url(self, offer_id: str) -> str:
+            return f"https://incomplete.test/{offer_id}"
+
+    with pytest.raises(TypeError):
+        Incomplete()
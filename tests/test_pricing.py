@@ -0,0 +1,76 @@
+import openpyxl
+import pytest
+from crawler_1688 import AsyncWebCrawler
+from page_parser import SKU_FIELDS
+from pipeline import run_pipeline
+from pricing import PRICED_SOURCE_KEY, SOURCE_PRICE_KEY, CountryPricing, PricingEngine
+from rate_limiter import RateLimiter
+from table_columns import columns
+from variant_batch import VariantBatch
+
+RATES = {"base": "USD", "rates": {"CNY": 7.0}}
+COLOMBIA = "(Colombia) Price in US$"
+
+class InstantCrawler(AsyncWebCrawler):
+    async def fetch_many(self, offer_ids, max_workers=None):
+        for offer_id in offer_ids:
+            yield offer_id, f"<html>{offer_id}</html>"
+
+class PricedParser:
+    """ One SKU per page, costing 70 CNY, as a `VariantBatch` or as a list of dicts. """
+
+    def __init__(self, compact: bool):
+        self.compact = compact
+
+    def parse(self, html_content):
+        offer_id = html_content[len("<html>"):-len("</html>")]
+        shared = {"Title": f"Product {offer_id}"}
+        sku = {"SKU": offer_id, SOURCE_PRICE_KEY: 70.0}
+        if not self.compact:
+            return [{**shared, **sku}]
+        batch = VariantBatch(shared, SKU_FIELDS)
+        batch.append(sku)
+        return batch
+
+def written_row(tmp_path, parser, pricing, validate=False) -> tuple:
+    output = tmp_path / "out.xlsx"
+    run_pipeline(
+        ["1"], str(output), crawler=InstantCrawler(rate_limiter=RateLimiter()), parser=parser,
+        processes=0, with_description=False, validate=validate, pricing=pricing
+    )
+    workbook = openpyxl.load_workbook(output, read_only=True)
+    row = next(workbook.active.iter_rows(min_row=7, max_row=7, values_only=True))
+    workbook.close()
+    return row
+
+@pytest.mark.parametrize("validate", [False, True])
+@pytest.mark.parametrize("compact", [False, True])
+def test_written_price_cell_holds_the_usd_price(tmp_path, compact, validate):
+    row = written_row(tmp_path, PricedParser(compact), PricingEngine(RATES), validate)
+
+    assert row[columns[COLOMBIA].col_index - 1] == 10.0
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_cost_is_not_written_as_the_price_of_a_country_left_unpriced(tmp_path, compact):
+    row = written_row(tmp_path, PricedParser(compact), PricingEngine(RATES, [CountryPricing("Brazil")]))
+
+    assert row[columns["(Brazil) Price in US$"].col_index - 1] == 10.0
+    assert row[columns[COLOMBIA].col_index - 1] is None
+
+def test_priced_variants_keep_their_cost_under_a_private_key():
+    variants = PricingEngine(RATES, [CountryPricing("Brazil", fee_rate=0.5)]).apply([{SOURCE_PRICE_KEY: 70.0}])
+
+    assert variants == [{PRICED_SOURCE_KEY: 70.0, "(Brazil) Price in US$": 20.0}]
+
+def test_numpy_and_python_prices_match():
+    pytest.importorskip("numpy")
+    engine = PricingEngine(RATES, [
+        CountryPricing("Colombia", [(0, 1.0), (10, 0.6), (50, 0.4)], fee_rate=0.13, fixed_fee=1.0),
+        CountryPricing("Brazil", [(5, 0.8), (20, 0.5)], fee_rate=0.16, fixed_fee=1.2),
+        CountryPricing("Chile", [(0, 0.8)], fee_rate=0.14),
+    ])
+    # Missing, zero and negative costs, costs on the tier bounds and on both sides of them
+    costs = [None, 0, -3.5, 0.01, 34.99, 35.0, 35.01, 69.3, 70.0, 349.99, 350.0, 1234.56, 7.0 * 20]
+    costs += [round(i * 0.37, 2) for i in range(1, 2000)]
+
+    assert engine._price_numpy(costs) == engine._price_python(costs)
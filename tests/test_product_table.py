@@ -0,0 +1,87 @@
+import os
+import openpyxl
+import pytest
+from product_table import ProductTable, RowMapper, StreamingProductTable
+from table_columns import columns
+
+TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Costumes.xlsx")
+
+VARIANTS = [
+    {"Title": "Witch hat & <cape>", "SKU": "1", "Stock": 5, "(Colombia) Price in US$": 12.5, "Color": "Black\x01"},
+    {"Title": "Pirate coat", "SKU": "2", "Stock": 0, "(Colombia) Price in US$": 30.0},
+]
+
+def position(name: str) -> int:
+    return columns[name].col_index - 1
+
+@pytest.fixture(scope="module")
+def template():
+    workbook = openpyxl.load_workbook(TEMPLATE)
+    yield workbook.active
+    workbook.close()
+
+@pytest.fixture(scope="module")
+def streamed(tmp_path_factory, template):
+    output = tmp_path_factory.mktemp("streamed") / "out.xlsx"
+    table = StreamingProductTable(TEMPLATE)
+    assert table.append_rows(VARIANTS) == 2
+    table.save(str(output))
+    table.close()
+    workbook = openpyxl.load_workbook(output)
+    yield workbook.active
+    workbook.close()
+
+def test_streamed_rows_are_written_from_the_start_row(streamed):
+    rows = list(streamed.iter_rows(min_row=7, values_only=True))
+
+    assert len(rows) == 2
+    assert rows[0][position("Title")] == "Witch hat & <cape>"
+    assert rows[0][position("Color")] == "Black"  # control characters cannot be stored
+    assert rows[0][position("Stock")] == 5
+    assert rows[1][position("Stock")] == 0
+    assert [row[position("(Colombia) Price in US$")] for row in rows] == [12.5, 30.0]
+
+def test_template_header_and_sheet_settings_are_kept(streamed, template):
+    header = [list(row) for row in template.iter_rows(max_row=6, values_only=True)]
+    assert [list(row) for row in streamed.iter_rows(max_row=6, values_only=True)] == header
+    assert {str(cells) for cells in streamed.merged_cells.ranges} == {str(cells) for cells in template.merged_cells.ranges}
+    assert len(streamed.data_validations.dataValidation) == len(template.data_validations.dataValidation)
+    assert len(streamed.conditional_formatting) == len(template.conditional_formatting)
+
+def test_formulas_of_the_first_data_row_are_repeated(streamed, template):
+    for column in ("B", "K", "N"):
+        formula = template[f"{column}7"].value
+        assert formula.startswith("=")
+        assert streamed[f"{column}7"].value == streamed[f"{column}8"].value == formula
+
+def test_row_mapper_matches_keys_exactly_then_loosely(capsys):
+    mapper = RowMapper()
+
+    row = mapper.to_row({
+        "Title": "Exact", "(colombia)  price in us": 9.5, "Unknown": 1, "Unknown ": 2, "_private": 3,
+    })
+
+    assert row[position("Title")] == "Exact"
+    assert row[position("(Colombia) Price in US$")] == 9.5
+    assert len(row) == mapper.width and sum(value is not None for value in row) == 2
+    # Warned once per key, never about private annotations
+    assert capsys.readouterr().out.count("Ignoring") == 2
+    mapper.to_row({"Unknown": 1, "_private": 3})
+    assert "Ignoring" not in capsys.readouterr().out
+
+def test_bulk_appended_rows_match_cell_by_cell_writes():
+    # openpyxl refuses control characters instead of dropping them
+    variants = [dict(VARIANTS[0], Color="Black"), VARIANTS[1]]
+    bulk = ProductTable(TEMPLATE)
+    assert bulk.append_rows(variants, batch_size=1) == 2
+    by_cell = ProductTable(TEMPLATE)
+    for variant in variants:
+        row = by_cell.acquire_new_row()
+        for name, value in variant.items():
+            by_cell.write_cell(row, name, value)
+
+    for table in (bulk, by_cell):
+        assert [table.sheet.cell(row=row, column=columns["SKU"].col_index).value for row in (7, 8)] == ["1", "2"]
+    assert [[cell.value for cell in row] for row in bulk.sheet.iter_rows(min_row=7, max_row=8)] == \
+        [[cell.value for cell in row] for row in by_cell.sheet.iter_rows(min_row=7, max_row=8)]
+    assert bulk.current_row == by_cell.current_row == 9
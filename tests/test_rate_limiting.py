@@ -0,0 +1,121 @@
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from crawler_1688 import WebCrawler
+from metrics import metrics
+from rate_limiter import AdaptiveRateLimiter
+
+HOST = "127.0.0.1"
+
+class FakeSite:
+    """ A local offer page server that answers normally, or blocks on demand. """
+
+    def __init__(self):
+        self.mode = "ok"  # "ok", "block" or an error status such as "429"
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status, body = 200, "<html><script>window.__INIT_DATA = {};</script></html>"
+                if site.mode.isdigit():
+                    status, body = int(site.mode), "Go away"
+                elif site.mode == "block":
+                    body = "<html>We have detected unusual traffic from your network.</html>"
+                data = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((HOST, 0), Handler)
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    site = FakeSite()
+    yield site
+    site.close()
+
+def make_crawler(port: int) -> tuple:
+    limiter = AdaptiveRateLimiter(host_rate=1.0, max_rate=1.0, backoff_factor=0.5, recovery_step=0.25, recovery_streak=3, jitter=0)
+    crawler = WebCrawler(rate_limiter=limiter)
+    crawler._build_url = lambda offer_id: f"http://{HOST}:{port}/offer/{offer_id}.html"
+    return crawler, limiter
+
+@pytest.mark.parametrize("mode", ["429", "403", "block"])
+def test_rate_halves_on_block_and_recovers(site, mode):
+    crawler, limiter = make_crawler(site.port)
+    # Requests are sent with `_request`, which reports outcomes without waiting for the limiter
+    assert crawler._request(crawler.session, "1") is not None
+    assert limiter.current_rate(HOST) == 1.0
+
+    site.mode = mode
+    assert crawler._request(crawler.session, "2") is None
+    assert limiter.current_rate(HOST) == 0.5
+    assert crawler._request(crawler.session, "3") is None
+    assert limiter.current_rate(HOST) == 0.25
+    assert "3" in crawler.blocked
+
+    site.mode = "ok"
+    for offer_id in range(3):
+        crawler._request(crawler.session, str(offer_id))
+    assert limiter.current_rate(HOST) == 0.5
+    for offer_id in range(6):
+        crawler._request(crawler.session, str(offer_id))
+    assert limiter.current_rate(HOST) == 1.0
+
+def test_dropped_connections_count_as_blocks():
+    with socket.socket() as probe:
+        probe.bind((HOST, 0))
+        port = probe.getsockname()[1]
+    # Nothing listens on the port any more: every request is refused
+    crawler, limiter = make_crawler(port)
+    assert crawler._request(crawler.session, "1") is None
+    assert limiter.current_rate(HOST) == 0.5
+
+def test_server_errors_slow_down_without_blaming_the_identity(site):
+    crawler, limiter = make_crawler(site.port)
+    site.mode = "503"
+    assert crawler._request(crawler.session, "1") is None
+    assert limiter.current_rate(HOST) == 0.5
+    assert crawler._outcome("1", None) is None
+
+    site.mode = "429"
+    crawler._request(crawler.session, "1")
+    assert crawler._outcome("1", None) is True
+    # An earlier block is forgotten once the offer fails for another reason
+    site.mode = "500"
+    crawler._request(crawler.session, "1")
+    assert crawler._outcome("1", None) is None
+
+def test_block_rate_counts_failed_attempts(site, monkeypatch):
+    monkeypatch.setattr(metrics, "enabled", True)
+    monkeypatch.setattr(metrics, "_counters", {})
+    monkeypatch.setattr(metrics, "_histograms", {})
+    crawler, _ = make_crawler(site.port)
+    crawler._request(crawler.session, "1")
+    site.mode = "block"
+    crawler._request(crawler.session, "2")
+    # Nothing listens on the other port: the request fails without an answer
+    with socket.socket() as probe:
+        probe.bind((HOST, 0))
+        port = probe.getsockname()[1]
+    crawler._build_url = lambda offer_id: f"http://{HOST}:{port}/offer/{offer_id}.html"
+    crawler._request(crawler.session, "3")
+
+    summary = metrics.summary()
+    assert summary["counters"]["requests"] == 3
+    assert summary["counters"]["blocks"] == 2
+    assert summary["block_rate"] == 2 / 3
+    assert f"crawler_block_rate {2 / 3}\n" in metrics.to_prometheus()
+    assert "crawler_requests_total 3\n" in metrics.to_prometheus()
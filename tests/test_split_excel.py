@@ -0,0 +1,67 @@
+import os
+import zipfile
+import openpyxl
+import pytest
+from openpyxl.chart import BarChart, Reference
+from openpyxl.workbook.defined_name import DefinedName
+from test_split import split_excel_skip_hidden
+
+TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Costumes.xlsx")
+
+@pytest.fixture(scope="module")
+def split_outputs(tmp_path_factory):
+    """ Costumes.xlsx plus a hidden sheet and a visible sheet holding a chart, split. """
+    tmp = tmp_path_factory.mktemp("split")
+    workbook = openpyxl.load_workbook(TEMPLATE)
+    costumes = workbook["Costumes"]
+    costumes.defined_names["Titles"] = DefinedName("Titles", attr_text="'Costumes'!$A$7:$A$100")
+    hidden = workbook.create_sheet("Lists")
+    hidden.append(["Premium", "Classic"])
+    hidden.sheet_state = "hidden"
+    hidden.defined_names["Listing"] = DefinedName("Listing", attr_text="'Lists'!$A$1:$B$1")
+    charts = workbook.create_sheet("Charts")
+    for month, sales in enumerate((3, 5, 8), 1):
+        charts.append([month, sales])
+    chart = BarChart()
+    chart.add_data(Reference(charts, min_col=2, min_row=1, max_row=3))
+    charts.add_chart(chart, "D2")
+    workbook.defined_names["Everywhere"] = DefinedName("Everywhere", attr_text="'Costumes'!$A$1")
+    source = tmp / "source.xlsx"
+    workbook.save(source)
+    workbook.close()
+
+    output_dir = tmp / "out"
+    output_dir.mkdir()
+    split_excel_skip_hidden(str(source), str(output_dir))
+    return output_dir
+
+def test_every_visible_sheet_is_written_alone(split_outputs):
+    assert sorted(os.listdir(split_outputs)) == ["Charts.xlsx", "Costumes.xlsx"]
+    for name in ("Charts", "Costumes"):
+        workbook = openpyxl.load_workbook(split_outputs / f"{name}.xlsx")
+        assert workbook.sheetnames == [name]
+        assert workbook.active.sheet_state == "visible"
+        workbook.close()
+
+def test_split_sheet_keeps_its_content_and_names(split_outputs):
+    template = openpyxl.load_workbook(TEMPLATE)
+    workbook = openpyxl.load_workbook(split_outputs / "Costumes.xlsx")
+    sheet, original = workbook.active, template.active
+
+    assert [list(row) for row in sheet.iter_rows(max_row=7, values_only=True)] == \
+        [list(row) for row in original.iter_rows(max_row=7, values_only=True)]
+    assert {str(cells) for cells in sheet.merged_cells.ranges} == {str(cells) for cells in original.merged_cells.ranges}
+    assert len(sheet.data_validations.dataValidation) == len(original.data_validations.dataValidation)
+    # Its own local names and the global ones, not those of the other sheets
+    assert list(sheet.defined_names) == ["Titles"]
+    assert "Everywhere" in workbook.defined_names and "Listing" not in workbook.defined_names
+    workbook.close()
+    template.close()
+
+def test_drawings_go_with_their_sheet_only(split_outputs):
+    workbook = openpyxl.load_workbook(split_outputs / "Charts.xlsx")
+    assert len(workbook.active._charts) == 1
+    assert list(workbook.active.defined_names) == []
+    workbook.close()
+    with zipfile.ZipFile(split_outputs / "Costumes.xlsx") as costumes:
+        assert not [name for name in costumes.namelist() if name.startswith(("xl/charts/", "xl/drawings/"))]
@@ -0,0 +1,30 @@
+import json
+import os
+import pytest
+from table_columns import columns
+from template_registry import TemplateRegistry
+
+TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Costumes.xlsx")
+
+@pytest.mark.parametrize("content", ["{\"version\": 1, \"colu", json.dumps({"version": 1}), "[]"])
+def test_invalid_cache_file_is_replaced(tmp_path, content):
+    cache_dir = str(tmp_path)
+    expected = TemplateRegistry(cache_dir).get(TEMPLATE)
+    [cache_file] = os.listdir(cache_dir)
+    with open(os.path.join(cache_dir, cache_file), "w", encoding="utf-8") as f:
+        f.write(content)
+
+    schema = TemplateRegistry(cache_dir).get(TEMPLATE)
+    assert list(schema.columns) == list(expected.columns)
+    with open(os.path.join(cache_dir, cache_file), encoding="utf-8") as f:
+        assert json.load(f) == expected.to_dict()
+
+def test_schema_of_the_costumes_template_matches_the_known_columns(tmp_path, capsys):
+    schema = TemplateRegistry(str(tmp_path)).get(TEMPLATE)
+    assert schema.start_row == 7
+    for name, column in columns.items():
+        read = schema.columns[name]
+        assert (read.col_index, read.optional, read.auto_fill, read.data_type, read.choices) == \
+            (column.col_index, column.optional, column.auto_fill, column.data_type, column.choices), name
+    # Its lists point at an 'extra info' sheet the file does not have
+    assert "Column 'Gender'" in capsys.readouterr().out
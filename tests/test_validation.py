@@ -0,0 +1,8 @@
+from table_columns import TableColumn
+from validation import BatchValidator
+
+def test_unhashable_values_are_coerced_one_by_one():
+    schema = {"Photos": TableColumn(col_name="Photos", col_index=1, data_type=str)}
+    photos = [["a.jpg", "b.jpg"], ["c.jpg"], None]
+    result = BatchValidator(schema).validate([{"Photos": value} for value in photos])
+    assert [row[0] for row in result.rows] == ["['a.jpg', 'b.jpg']", "['c.jpg']", None]
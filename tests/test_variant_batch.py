@@ -0,0 +1,43 @@
+import json
+import pytest
+from benchmarks.fixtures import make_offer_page
+from page_parser import SKU_FIELDS, PageParser
+from product_table import RowMapper
+from variant_batch import VariantBatch
+
+def make_batch() -> VariantBatch:
+    batch = VariantBatch({"Title": "Witch hat", "Brand": "ACME"}, ("SKU", "Stock"))
+    batch.append({"SKU": "1", "Stock": 5})
+    batch.append({"SKU": "2"})
+    return batch
+
+def test_batch_behaves_like_a_list_of_variant_dicts():
+    batch = make_batch()
+
+    assert len(batch) == 2
+    assert dict(batch[0]) == {"Title": "Witch hat", "Brand": "ACME", "SKU": "1", "Stock": 5}
+    assert batch[-1]["Stock"] is None
+    assert batch[1].get("Color", "N/A") == "N/A"
+    assert [variant["SKU"] for variant in batch[:5]] == ["1", "2"]
+    assert [dict(variant) for variant in batch] == batch.to_dicts()
+    with pytest.raises(IndexError):
+        batch[2]
+
+def test_batch_survives_a_round_trip_through_its_columns():
+    batch = make_batch()
+
+    payload = json.loads(json.dumps({"shared": batch.shared, "columns": batch.columns}))
+    copy = VariantBatch.from_columns(payload["shared"], payload["columns"])
+
+    assert len(copy) == 2
+    assert copy.to_dicts() == batch.to_dicts()
+
+def test_batch_is_laid_out_like_its_dicts():
+    mapper = RowMapper()
+    page = make_offer_page(n_skus=5, padding_bytes=1_000)
+    batch = PageParser(fetch_description=False, compact=True).parse(page)
+    dicts = PageParser(fetch_description=False).parse(page)
+
+    assert isinstance(batch, VariantBatch) and set(batch.columns) == set(SKU_FIELDS)
+    assert batch.to_dicts() == dicts
+    assert list(mapper.to_rows(batch)) == [mapper.to_row(variant) for variant in dicts]
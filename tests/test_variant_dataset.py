@@ -0,0 +1,76 @@
+import pytest
+from product_table import RowMapper
+from variant_batch import VariantBatch
+from variant_dataset import (
+    ARROW, FORMATS, JSONL, OFFER_ID_KEY, PARQUET, VariantDataset, VariantDatasetWriter, _pyarrow, dataset_format,
+)
+
+PRICE = "(Colombia) Price in US$"
+EXTENSIONS = {ARROW: ".arrow", PARQUET: ".parquet", JSONL: ".jsonl"}
+
+def offers() -> list:
+    """ `(offer ID, variants)` of three offers, as dicts or as a `VariantBatch`. """
+    batch = VariantBatch({"Title": "Pirate coat"}, ("SKU", "Stock", PRICE))
+    batch.append({"SKU": "2a", "Stock": 3, PRICE: 30.0})
+    batch.append({"SKU": "2b", "Stock": 0, PRICE: 31.5})
+    return [
+        ("1", [{"Title": "Witch hat", "SKU": "1a", "Color": "Black", "Stock": 5, PRICE: 12.5}]),
+        ("2", batch),
+        ("3", [{"Title": "Cape", "SKU": "3a", "_description_url": "//desc/3"}]),
+    ]
+
+@pytest.mark.parametrize("format", FORMATS)
+def test_dataset_round_trip(tmp_path, format):
+    path = str(tmp_path / f"variants{EXTENSIONS[format]}")
+    with VariantDatasetWriter(path, batch_rows=2) as writer:
+        for offer_id, variants in offers():
+            writer.write(offer_id, variants)
+    assert writer.rows_written == 4
+    # Without pyarrow, every format falls back to JSON lines
+    assert dataset_format(path) == (format if _pyarrow() is not None else JSONL)
+
+    with VariantDataset(path) as dataset:
+        variants = list(dataset.iter_variants())
+        rows = list(dataset.iter_rows())
+
+    expected = [
+        {OFFER_ID_KEY: offer_id, **{key: value for key, value in variant.items() if not key.startswith("_")}}
+        for offer_id, offer_variants in offers() for variant in offer_variants
+    ]
+    assert variants == expected
+    mapper = RowMapper()
+    assert rows == [mapper.to_row(variant) for variant in expected]
+
+def test_values_are_coerced_to_the_column_types(tmp_path, capsys):
+    path = str(tmp_path / "variants.jsonl")
+    with VariantDatasetWriter(path) as writer:
+        writer.write("1", [
+            {"SKU": 101, "Stock": "12", PRICE: "9.5"},
+            {"SKU": "102", "Stock": "1.5", PRICE: ""},
+            {"SKU": "103", "Stock": "many", PRICE: 10},
+        ])
+
+    with VariantDataset(path) as dataset:
+        variants = list(dataset.iter_variants())
+
+    assert [(v["SKU"], v.get("Stock"), v.get(PRICE)) for v in variants] == [
+        ("101", 12, 9.5), ("102", None, None), ("103", None, 10.0),
+    ]
+    assert "Dropped 2 value(s) of 'Stock': not a valid int." in capsys.readouterr().out
+
+def test_arrow_datasets_need_pyarrow_to_be_read(tmp_path):
+    if _pyarrow() is not None:
+        pytest.skip("pyarrow is installed")
+    path = tmp_path / "variants.arrow"
+    path.write_bytes(b"ARROW1\x00\x00")
+
+    with pytest.raises(ValueError, match="requires pyarrow"):
+        VariantDataset(str(path))
+
+def test_unknown_files_are_not_datasets(tmp_path):
+    path = tmp_path / "variants.jsonl"
+    path.write_text('{"Title": "Not a dataset"}\n', encoding="utf-8")
+
+    assert dataset_format(str(path)) is None
+    with pytest.raises(ValueError, match="not a variant dataset"):
+        VariantDataset(str(path))